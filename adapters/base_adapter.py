@@ -3,12 +3,23 @@ import abc
 import os
 import shlex
 import subprocess
-from typing import Optional, Dict, Any, Tuple, Union
+import threading
+import time
+from tempfile import SpooledTemporaryFile
+from typing import Optional, Dict, Any, Tuple, Union, IO, Callable
 
 import yaml
 
+from core.cancellation import CancellationToken, CancelledError, kill_process_group, popen_group_kwargs
+from core.rate_limiter import get_rate_limiter
+from core.resources import get_accounting
+from core.tracer import get_tracer
 from utils.logger import get_logger
 
+# 单个任务输出在内存中缓存的上限, 超过后落盘到临时文件
+DEFAULT_SPOOL_MAX_SIZE = 1024 * 1024
+DEFAULT_TMP_DIR = "./tmp"
+
 
 class BaseAdapter(metaclass=abc.ABCMeta):
     """所有工具适配器的抽象基类"""
@@ -16,15 +27,20 @@ class BaseAdapter(metaclass=abc.ABCMeta):
     def __init__(self,
                  tool_name: str,
                  config: Dict[str, Any] = None,
-                 timeout: int = 600):
+                 timeout: int = 600,
+                 cancel_token: Optional[CancellationToken] = None):
         """
         :param config: 全局配置字典
         :param tool_name: 工具名称（对应配置中的键）
         :param timeout: 默认执行超时时间（秒）
+        :param cancel_token: 取消时结束正在运行的子进程（连同其进程组）, 之后不再启动新的子进程
         """
 
         self._adapter_name = tool_name
         self._config = config
+        self.cancel_token = cancel_token or CancellationToken()
+        # 暂停时不再启动新的子进程; 自行发包的工具通过 reserve_rate 从全局限速中分配速率
+        self.rate_limiter = get_rate_limiter()
 
         self.logger = get_logger(f"Adapter.{self.__class__.__name__}")
         self.timeout = timeout
@@ -55,7 +71,7 @@ class BaseAdapter(metaclass=abc.ABCMeta):
     def _validate_config(self):
         path = self.tool_config['path']
         if not os.path.exists(path):
-            self.logger.error(f"{self._adapter_name} 的可执行文件路径不存在")
+            self.logger.error("%s 的可执行文件路径不存在", self._adapter_name)
             raise FileNotFoundError(f"{self._adapter_name}")
             # return False
         return True
@@ -95,7 +111,7 @@ class BaseAdapter(metaclass=abc.ABCMeta):
 
             # 2. 构建命令
             command = self.build_command(*args, **kwargs)
-            self.logger.debug(f"执行命令: {self._safe_quote_command(command)}")
+            self.logger.debug("执行命令: %s", self._safe_quote_command(command))
 
             # 3. 执行命令
             result = self._run_command(command)
@@ -123,16 +139,21 @@ class BaseAdapter(metaclass=abc.ABCMeta):
 
     def _run_command(self, command: list) -> subprocess.CompletedProcess:
         """执行命令并返回结果"""
+        self.rate_limiter.wait_resumed()
+        self.cancel_token.raise_if_cancelled()
         self._process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             universal_newlines=True,
-            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+            **popen_group_kwargs()
         )
+        process = self._process
+        handle = self.cancel_token.register(lambda: kill_process_group(process))
 
         try:
             stdout, stderr = self._process.communicate(timeout=self.timeout)
+            self.cancel_token.raise_if_cancelled()
 
             if self._process.returncode != 0:
                 raise RuntimeError(
@@ -148,13 +169,103 @@ class BaseAdapter(metaclass=abc.ABCMeta):
             )
 
         finally:
+            self.cancel_token.unregister(handle)
             self._cleanup_process()
 
+    def open_output(self) -> SpooledTemporaryFile:
+        """为单次任务创建独立的输出缓冲
+        输出小于 spool_max_size 时只驻留内存, 超过后自动转存到 tmp_dir 下的唯一临时文件,
+        关闭时临时文件随之删除, 并发任务之间互不覆盖
+        """
+        tmp_dir = self.tool_config.get('tmp_dir', os.path.join(DEFAULT_TMP_DIR, self._adapter_name))
+        os.makedirs(tmp_dir, exist_ok=True)
+        return SpooledTemporaryFile(
+            max_size=self.tool_config.get('spool_max_size', DEFAULT_SPOOL_MAX_SIZE),
+            mode='w+',
+            encoding='utf-8',
+            prefix=f"{self._adapter_name}_",
+            dir=tmp_dir
+        )
+
+    def _stream_command(self,
+                        command: list,
+                        output: IO[str],
+                        on_line: Optional[Callable[[str], None]] = None,
+                        target: Optional[str] = None) -> None:
+        """执行命令, 标准输出经管道逐行写入 output, 不经过固定的中间文件
+        :param on_line: 每读到一行输出时的回调, 用于在结果到达时实时观测
+        :param target: 扫描目标, 用于追踪标签和按目标汇总资源占用
+        """
+        try:
+            with get_tracer().span("subprocess", "adapter", adapter=self._adapter_name, target=target) as span:
+                self._run_streaming(command, output, on_line, target)
+                span.tag(pid=self._process.pid, returncode=self._process.returncode)
+        finally:
+            # 失败、超时或取消时同样回到开头, 调用方可以读取已经输出的部分; 异常原样抛给调用方
+            output.flush()
+            output.seek(0)
+
+    def _run_streaming(self,
+                       command: list,
+                       output: IO[str],
+                       on_line: Optional[Callable[[str], None]] = None,
+                       target: Optional[str] = None) -> None:
+        self.rate_limiter.wait_resumed()
+        self.cancel_token.raise_if_cancelled()
+        started = time.perf_counter()
+        # 子进程放在独立的进程组中, 超时或取消时连同它派生的进程一起结束, 不留下孤儿进程
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            **popen_group_kwargs()
+        )
+        self._process = process
+        handle = self.cancel_token.register(lambda: kill_process_group(process))
+
+        # stderr 单独线程读取, 避免管道写满导致子进程阻塞
+        stderr_chunks = []
+        stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+        stderr_reader.start()
+
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            kill_process_group(process)
+
+        timer = threading.Timer(self.timeout, on_timeout)
+        timer.start()
+        with get_accounting().track_child(f"adapter.{self._adapter_name}", process, target, started) as probe:
+            try:
+                for line in process.stdout:
+                    output.write(line)
+                    probe.on_output(len(line))
+                    if on_line is not None:
+                        on_line(line)
+                # 用 wait4 回收, 同时取得该子进程自己的 CPU 时间和峰值内存
+                returncode = probe.reap()
+            finally:
+                timer.cancel()
+                self.cancel_token.unregister(handle)
+                stderr_reader.join()
+                process.stdout.close()
+                process.stderr.close()
+                probe.on_output(sum(len(chunk) for chunk in stderr_chunks))
+
+        if self.cancel_token.cancelled:
+            raise CancelledError(self.cancel_token.reason)
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(command, self.timeout)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command, stderr="".join(stderr_chunks))
+
     def _cleanup_process(self):
         """清理进程资源"""
         if self._process and self._process.poll() is None:
             self.logger.warning("强制终止运行中的进程...")
-            self._process.kill()
+            kill_process_group(self._process, grace=0)
             self._process.wait()
         self._process = None
 
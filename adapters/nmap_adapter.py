@@ -1,14 +1,25 @@
+import re
 import subprocess
-from typing import Dict
+from typing import Dict, IO, Optional
 
 from adapters.base_adapter import BaseAdapter
+from adapters.rate_controller import AdaptiveRateController
+from core.cancellation import CancellationToken
+
+# 扫描过程中用于速率反馈的输出行
+_LATENCY_PATTERN = re.compile(r"Host is up \((\d+(?:\.\d+)?)s latency\)")
+# "X out of Y dropped probes": 上次增加发送延迟以来发出的 Y 个探测中丢失了 X 个, 丢包率使用 nmap 自己的分母 Y
+_DROP_PATTERN = re.compile(r"Increasing send delay for \S+ from \d+ to \d+ due to (\d+) out of (\d+) dropped probes")
+_GIVE_UP_PATTERN = re.compile(r"giving up on port because retransmission cap hit")
 
 
 class NmapAdapter(BaseAdapter):
-    def __init__(self, config: dict):
-        super().__init__("nmap", config)
+    def __init__(self, config: dict, rate_controller: Optional[AdaptiveRateController] = None,
+                 cancel_token: Optional[CancellationToken] = None):
+        super().__init__("nmap", config, cancel_token=cancel_token)
         self.binary = self.tool_config['path']
         self.timeout = self.tool_config['timeout']
+        self.rate_controller = rate_controller
         if config is not None:
             self.default_params = self._config['params']
 
@@ -26,40 +37,81 @@ class NmapAdapter(BaseAdapter):
 
         return dataList
 
-    def scan(self, target: str, output_path: str, params: dict = None) -> None:
-        """执行Nmap扫描"""
+    def scan(self, target: str, output: IO[str], params: dict = None) -> None:
+        """执行Nmap扫描
+        :param output: 由 open_output() 创建的输出缓冲, 扫描结束后指针位于开头
+        """
         # 合并默认参数和自定义参数
         scan_params = {**self.default_params, **(params or {})}
+        rate = self.rate_controller.params_for(target) if self.rate_controller is not None else None
+
+        # 全局限速开启时按主机预留发包速率, nmap 的 --max-rate 不超过分配到的速率
+        with self.rate_limiter.reserve_rate(target, rate['max_rate'] if rate else None) as max_rate:
+            self._scan(target, output, scan_params, rate, max_rate)
 
+    def _scan(self, target: str, output: IO[str], scan_params: dict, rate: Optional[Dict], max_rate) -> None:
         # 构建命令
         # todo:参数的处理逻辑需要进一步细化
         cmd = [
             self.binary,
             # '-Pn',
             # '-sV',
-            # f"-T{scan_params['timing']}",
-            # f"-p {scan_params['ports']}",
             # f"--script={scan_params['script']}",
             # '-oX', '-',  # 输出到标准输出
-            target,
         ]
+        if scan_params.get('timing'):
+            timing = str(scan_params['timing'])
+            cmd.append(f"-{timing}" if timing.startswith('T') else f"-T{timing}")
+        if scan_params.get('ports'):
+            cmd += ['-p', str(scan_params['ports'])]
+        cmd += self._rate_options(rate, max_rate)
+        cmd.append(target)
+
+        self.logger.info("执行命令: %s", " ".join(cmd))
 
-        print(" ".join(cmd))
+        on_line = (lambda line: self._observe_line(target, line)) if self.rate_controller is not None else None
 
         # 执行扫描
         try:
-            with open(output_path, "w") as f:
-                subprocess.run(
-                    cmd,
-                    stdout=f,
-                    stderr=subprocess.PIPE,
-                    timeout=self.timeout,
-                    text=True,
-                    check=True
-                )
+            self._stream_command(cmd, output, on_line, target=target)
             return
 
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"Nmap扫描失败: {e.stderr}") from e
         except subprocess.TimeoutExpired:
+            if self.rate_controller is not None:
+                self.rate_controller.observe_timeout(target)
             raise RuntimeError("扫描超时，请调整timeout设置")
+        finally:
+            if self.rate_controller is not None:
+                self.rate_controller.finish(target)
+            self._cleanup_process()
+
+    @staticmethod
+    def _rate_options(rate: Optional[Dict], max_rate) -> list:
+        """根据速率控制器的当前设置和限速器分配的速率生成 nmap 的速率参数, 会覆盖 -T 模板中的对应值"""
+        if rate is None:
+            return ['--max-rate', str(max_rate)] if max_rate is not None else []
+        options = [
+            '-v',  # 输出丢包信息, 供速率反馈使用
+            '--max-parallelism', str(rate['max_parallelism']),
+            '--min-rate', str(min(rate['min_rate'], max_rate or rate['min_rate'])),
+            '--max-rate', str(max_rate or rate['max_rate']),
+        ]
+        if 'initial_rtt_timeout' in rate:
+            options += ['--initial-rtt-timeout', f"{int(rate['initial_rtt_timeout'] * 1000)}ms",
+                        '--max-rtt-timeout', f"{int(rate['max_rtt_timeout'] * 1000)}ms"]
+        return options
+
+    def _observe_line(self, target: str, line: str) -> None:
+        """从扫描输出中实时提取 RTT 和丢包信息"""
+        match = _LATENCY_PATTERN.search(line)
+        if match:
+            self.rate_controller.observe_rtt(target, float(match.group(1)))
+            return
+        match = _DROP_PATTERN.search(line)
+        if match:
+            self.rate_controller.observe_probes(target, sent=int(match.group(2)), dropped=int(match.group(1)))
+            return
+        if _GIVE_UP_PATTERN.search(line):
+            self.rate_controller.observe_timeout(target)
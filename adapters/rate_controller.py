@@ -0,0 +1,129 @@
+# adapters/rate_controller.py
+import ipaddress
+import threading
+from typing import Dict, Any, Optional
+
+
+class HostRateState:
+    """单个主机的观测数据与当前速率设置"""
+
+    def __init__(self, parallelism: int, rate: float):
+        self.parallelism = parallelism
+        self.rate = rate
+        self.srtt: Optional[float] = None  # 平滑后的 RTT（秒）
+        self.rttvar: Optional[float] = None
+        self.sent = 0  # 本轮报告丢包时对应的探测数量, 作为丢包率的分母
+        self.dropped = 0  # 本轮观测到的丢包数量
+        self.timeouts = 0  # 本轮超时/放弃重传的次数
+
+
+class AdaptiveRateController:
+    """根据扫描过程中观测到的 RTT 与丢包率调整每个主机的并发度和发包速率
+
+    采用 AIMD 策略: 丢包率低于阈值时线性增加, 超过阈值时按比例回退,
+    使每个主机运行在它能承受的最快速度上. 线程安全, 可在多个扫描线程间共享.
+    """
+
+    # RTT 平滑系数, 与 TCP 的 RTO 估计保持一致
+    RTT_ALPHA = 0.125
+    RTT_BETA = 0.25
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.min_parallelism = config.get('min_parallelism', 10)
+        self.max_parallelism = config.get('max_parallelism', 1000)
+        self.min_rate = config.get('min_rate', 50)
+        self.max_rate = config.get('max_rate', 5000)
+        self.initial_parallelism = config.get('initial_parallelism', 100)
+        self.initial_rate = config.get('initial_rate', 300)
+        self.loss_threshold = config.get('loss_threshold', 0.05)
+        self.increase_step = config.get('increase_step', 0.25)  # 每轮增加的比例
+        self.decrease_factor = config.get('decrease_factor', 0.5)
+
+        self._hosts: Dict[str, HostRateState] = {}
+        self._networks: Dict[str, HostRateState] = {}  # 同一 /24 网段最近的设置, 用于新主机的初始值
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _network_key(host: str) -> str:
+        try:
+            return str(ipaddress.ip_network(f"{host}/24", strict=False))
+        except ValueError:
+            return host
+
+    def _get_state(self, host: str) -> HostRateState:
+        state = self._hosts.get(host)
+        if state is None:
+            peer = self._networks.get(self._network_key(host))
+            if peer is not None:
+                state = HostRateState(peer.parallelism, peer.rate)
+                state.srtt, state.rttvar = peer.srtt, peer.rttvar
+            else:
+                state = HostRateState(self.initial_parallelism, self.initial_rate)
+            self._hosts[host] = state
+        return state
+
+    # region 观测
+    def observe_rtt(self, host: str, rtt: float) -> None:
+        """记录一次 RTT 采样（秒）"""
+        with self._lock:
+            state = self._get_state(host)
+            if state.srtt is None:
+                state.srtt = rtt
+                state.rttvar = rtt / 2
+            else:
+                state.rttvar = (1 - self.RTT_BETA) * state.rttvar + self.RTT_BETA * abs(state.srtt - rtt)
+                state.srtt = (1 - self.RTT_ALPHA) * state.srtt + self.RTT_ALPHA * rtt
+
+    def observe_probes(self, host: str, sent: int = 0, dropped: int = 0) -> None:
+        """记录探测的发送量和丢失量, 两者可以分别来自不同的输出行"""
+        with self._lock:
+            state = self._get_state(host)
+            state.sent += sent
+            state.dropped += dropped
+
+    def observe_timeout(self, host: str) -> None:
+        """记录一次超时（端口放弃重传或整个扫描超时）"""
+        with self._lock:
+            self._get_state(host).timeouts += 1
+
+    # endregion
+
+    def finish(self, host: str) -> None:
+        """一轮扫描结束, 根据本轮观测结果调整该主机的速率设置"""
+        with self._lock:
+            state = self._get_state(host)
+            if state.sent:
+                sample = min(1.0, state.dropped / state.sent)
+            else:
+                # 没有对应的探测数量时, 只要有丢包或超时就按全部丢失处理
+                sample = 1.0 if state.dropped or state.timeouts else 0.0
+
+            if sample > self.loss_threshold or state.timeouts:
+                # 出现丢包: 乘性减小
+                state.parallelism = max(self.min_parallelism, int(state.parallelism * self.decrease_factor))
+                state.rate = max(self.min_rate, state.rate * self.decrease_factor)
+            else:
+                # 链路稳定: 加性增大
+                state.parallelism = min(self.max_parallelism,
+                                        state.parallelism + max(1, int(state.parallelism * self.increase_step)))
+                state.rate = min(self.max_rate, state.rate * (1 + self.increase_step))
+
+            state.sent = state.dropped = state.timeouts = 0
+            self._networks[self._network_key(host)] = state
+
+    def params_for(self, host: str) -> Dict[str, Any]:
+        """返回该主机当前应使用的速率参数"""
+        with self._lock:
+            state = self._get_state(host)
+            params = {
+                'max_parallelism': state.parallelism,
+                'min_rate': int(self.min_rate),
+                'max_rate': int(state.rate),
+            }
+            if state.srtt is not None:
+                # RTO = SRTT + 4 * RTTVAR, 给首个超时留足余量
+                rto = state.srtt + 4 * state.rttvar
+                params['initial_rtt_timeout'] = max(0.05, rto * 2)
+                params['max_rtt_timeout'] = max(0.1, rto * 4)
+            return params
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# benchmarks/fake_nmap.py
+"""不发包的 nmap 替身, 供基准测试和离线调试使用
+
+把录制的 nmap 输出回放到标准输出, 行为由环境变量控制（适配器传入的命令行参数固定, 不便扩展）:
+
+    FAKE_NMAP_RECORDING  录制的输出文件, 默认 benchmarks/data/nmap_sample.txt, 其中的 {target} 替换为扫描目标
+    FAKE_NMAP_PORTS      大于 0 时不回放录制文件, 生成包含该数量开放端口的输出, 用于测试大输出
+    FAKE_NMAP_DELAY      开始输出前等待的秒数, 模拟扫描耗时
+    FAKE_NMAP_LINE_DELAY 每行输出之间等待的秒数, 模拟结果逐步到达
+"""
+import os
+import sys
+import time
+
+_DEFAULT_RECORDING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nmap_sample.txt")
+
+
+def synthetic_output(target: str, ports: int) -> str:
+    lines = [
+        "Starting Nmap 7.94 ( https://nmap.org ) at 2024-01-01 00:00 UTC",
+        f"Nmap scan report for {target}",
+        "Host is up (0.0010s latency).",
+        "PORT      STATE SERVICE",
+    ]
+    lines += [f"{port}/tcp open  service{port % 97}" for port in range(1, ports + 1)]
+    lines += ["", "Nmap done: 1 IP address (1 host up) scanned in 0.10 seconds", ""]
+    return "\n".join(lines)
+
+
+def main():
+    target = sys.argv[-1] if len(sys.argv) > 1 else "127.0.0.1"
+    ports = int(os.environ.get("FAKE_NMAP_PORTS", "0"))
+    delay = float(os.environ.get("FAKE_NMAP_DELAY", "0"))
+    line_delay = float(os.environ.get("FAKE_NMAP_LINE_DELAY", "0"))
+
+    if ports > 0:
+        output = synthetic_output(target, ports)
+    else:
+        with open(os.environ.get("FAKE_NMAP_RECORDING", _DEFAULT_RECORDING), encoding='utf-8') as f:
+            output = f.read().replace("{target}", target)
+
+    if delay:
+        time.sleep(delay)
+    if not line_delay:
+        sys.stdout.write(output)
+        return
+    for line in output.splitlines(keepends=True):
+        sys.stdout.write(line)
+        sys.stdout.flush()
+        time.sleep(line_delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+# benchmarks/run_benchmarks.py
+"""离线基准测试, 不需要网络和真实的 nmap
+
+    python -m benchmarks.run_benchmarks                     # 全部基准, 结果写入 tmp/benchmarks/<时间>.json
+    python -m benchmarks.run_benchmarks --quick             # 缩小规模, 用于快速检查
+    python -m benchmarks.run_benchmarks --only bus --baseline tmp/benchmarks/old.json
+
+测试在临时目录中运行: 复制 config/config.yaml, 把 nmap 路径指向 benchmarks/fake_nmap.py, 不会影响仓库中的配置
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_NMAP = os.path.join(REPO_ROOT, "benchmarks", "fake_nmap.py")
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def measure(func: Callable[[], int], repeat: int) -> Dict:
+    """执行 repeat 次, func 返回本次处理的操作数, 以最快一次计算吞吐"""
+    durations, ops = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = func()
+        durations.append(time.perf_counter() - start)
+    best = min(durations)
+    return {
+        'ops': ops,
+        'repeat': repeat,
+        'best_s': best,
+        'median_s': statistics.median(durations),
+        'ops_per_s': ops / best if best else None,
+        'us_per_op': best / ops * 1e6 if ops else None,
+    }
+
+
+# region 工作目录
+def prepare_workspace(workspace: str) -> None:
+    """生成指向 fake nmap 的配置文件, 并切换到临时目录"""
+    with open(os.path.join(REPO_ROOT, "config", "config.yaml"), encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    if os.name == 'nt':
+        wrapper = os.path.join(workspace, "nmap.bat")
+        with open(wrapper, 'w') as f:
+            f.write(f'@"{sys.executable}" "{FAKE_NMAP}" %*\n')
+    else:
+        wrapper = os.path.join(workspace, "nmap")
+        with open(wrapper, 'w') as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_NMAP}" "$@"\n')
+        os.chmod(wrapper, 0o755)
+
+    config['adapters']['nmap'].update({'path': wrapper, 'tmp_dir': os.path.join(workspace, "tmp", "nmap")})
+    config.setdefault('global', {}).update({'log_level': 'WARNING', 'log_to_file': False})
+    config['modules']['scanner']['port_scanner']['rate_control'] = {'enable': False}
+
+    os.makedirs(os.path.join(workspace, "config"), exist_ok=True)
+    with open(os.path.join(workspace, "config", "config.yaml"), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    os.chdir(workspace)
+# endregion
+
+
+# region 消息总线
+@benchmark("bus.publish_subscribe")
+def bench_bus_roundtrip(scale: float, repeat: int) -> Dict:
+    from core.message_bus import MessageBus
+
+    count = int(100000 * scale)
+
+    def run():
+        bus = MessageBus()
+        bus.create_channel("bench", maxsize=0)
+        message = {'ip': '10.0.0.1', 'port': '80/tcp', 'state': 'open', 'service': 'http'}
+        for _ in range(count):
+            bus.publish("bench", message)
+        for _ in range(count):
+            bus.subscribe("bench", timeout=0)
+        return count
+
+    return measure(run, repeat)
+
+
+@benchmark("bus.fanout_threads")
+def bench_bus_fanout(scale: float, repeat: int) -> Dict:
+    """一个发布线程, 四个具名订阅者线程, 默认容量的 channel, 观察锁竞争和背压"""
+    from core.message_bus import MessageBus
+
+    count = int(20000 * scale)
+    subscribers = 4
+
+    def run():
+        bus = MessageBus()
+        bus.create_channel("bench")
+        for index in range(subscribers):
+            bus.register_subscriber("bench", f"sub{index}")
+
+        def consume(name):
+            for _ in range(count):
+                bus.subscribe("bench", timeout=5, subscriber=name)
+
+        threads = [threading.Thread(target=consume, args=(f"sub{index}",)) for index in range(subscribers)]
+        for thread in threads:
+            thread.start()
+        for index in range(count):
+            bus.publish("bench", {'seq': index})
+        for thread in threads:
+            thread.join()
+        return count * subscribers
+
+    return measure(run, repeat)
+# endregion
+
+
+# region 适配器
+@benchmark("nmap.parse_output.small")
+def bench_parse_small(scale: float, repeat: int) -> Dict:
+    from adapters.nmap_adapter import NmapAdapter
+
+    with open(os.path.join(REPO_ROOT, "benchmarks", "data", "nmap_sample.txt"), encoding='utf-8') as f:
+        output = f.read().replace("{target}", "10.0.0.1")
+    count = int(20000 * scale)
+
+    def run():
+        for _ in range(count):
+            NmapAdapter.parse_output(output)
+        return count
+
+    return measure(run, repeat)
+
+
+@benchmark("nmap.parse_output.large")
+def bench_parse_large(scale: float, repeat: int) -> Dict:
+    from adapters.nmap_adapter import NmapAdapter
+    from benchmarks.fake_nmap import synthetic_output
+
+    ports = 60000
+    output = synthetic_output("10.0.0.1", ports)
+    count = max(1, int(10 * scale))
+
+    def run():
+        for _ in range(count):
+            NmapAdapter.parse_output(output)
+        return count * ports
+
+    return measure(run, repeat)
+
+
+@benchmark("nmap.scan_subprocess")
+def bench_adapter_scan(scale: float, repeat: int) -> Dict:
+    """通过 fake nmap 执行完整的 scan(), 衡量子进程启动、管道读取和输出缓冲的开销"""
+    from adapters.nmap_adapter import NmapAdapter
+
+    count = max(1, int(20 * scale))
+    adapter = NmapAdapter({'params': {'ports': "1-1000"}})
+
+    def run():
+        for _ in range(count):
+            output = adapter.open_output()
+            adapter.scan("10.0.0.1", output)
+            NmapAdapter.parse_output(output.read())
+            output.close()
+        return count
+
+    return measure(run, repeat)
+
+
+@benchmark("nmap.scan_subprocess_large_output")
+def bench_adapter_scan_large(scale: float, repeat: int) -> Dict:
+    from adapters.nmap_adapter import NmapAdapter
+
+    ports = 60000
+    count = max(1, int(5 * scale))
+    adapter = NmapAdapter({'params': {'ports': "1-65535"}})
+
+    def run():
+        os.environ["FAKE_NMAP_PORTS"] = str(ports)
+        try:
+            for _ in range(count):
+                output = adapter.open_output()
+                adapter.scan("10.0.0.1", output)
+                NmapAdapter.parse_output(output.read())
+                output.close()
+        finally:
+            os.environ.pop("FAKE_NMAP_PORTS", None)
+        return count * ports
+
+    return measure(run, repeat)
+# endregion
+
+
+# region 引擎主循环
+def _run_engine(modules_factory: Callable) -> None:
+    from core.engine import PentestEngine
+    from core.state import EngineState
+
+    engine = PentestEngine()
+    engine.modules = modules_factory(engine)
+    for module in engine.modules:
+        module.bind_context(engine.current_context)
+    engine._state.transition(EngineState.RUNNING)
+    engine.run()
+
+
+@benchmark("engine.loop_synthetic")
+def bench_engine_loop(scale: float, repeat: int) -> Dict:
+    """合成的生产者/消费者模块经过引擎主循环和总线传递消息, 衡量每条消息的调度开销"""
+    from benchmarks.synthetic_modules import SyntheticConsumer, SyntheticProducer
+
+    count = int(5000 * scale)
+
+    def run():
+        _run_engine(lambda engine: [
+            SyntheticProducer(engine.message_bus, engine.thread_manager, total=count),
+            SyntheticConsumer(engine.message_bus, engine.thread_manager, expected=count),
+        ])
+        return count
+
+    return measure(run, repeat)
+
+
+@benchmark("engine.port_scan_pipeline")
+def bench_engine_port_scan(scale: float, repeat: int) -> Dict:
+    """真实的 PortScanner + fake nmap, 目标逐个经过 scan_target -> nmap -> scan_results"""
+    from benchmarks.synthetic_modules import SyntheticConsumer
+    from core.state import EngineState
+    from modules.scanner.port_scanner import PortScanner
+
+    targets = max(1, int(10 * scale))
+    ports_per_target = 6  # benchmarks/data/nmap_sample.txt 中的开放端口数
+
+    def run():
+        def build(engine):
+            for index in range(targets):
+                engine.message_bus.publish("scan_target", {'ip': f"10.0.0.{index + 1}"})
+            return [
+                PortScanner("scanner", "port_scanner", ["scan_target"], engine.message_bus, engine.thread_manager),
+                # PortScanner 会一直等待新的目标, 收齐结果后直接结束引擎
+                SyntheticConsumer(engine.message_bus, engine.thread_manager, expected=targets * ports_per_target,
+                                  on_complete=lambda: engine._state.transition(EngineState.COMPLETED)),
+            ]
+
+        _run_engine(build)
+        return targets
+
+    return measure(run, repeat)
+# endregion
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(results: Dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"\n与基线 {baseline_path} 对比 (ops/s, >1 表示变快):")
+    for name, result in results.items():
+        old = baseline.get(name, {}).get('ops_per_s')
+        if old and result.get('ops_per_s'):
+            print(f"  {name:40s} {result['ops_per_s'] / old:6.2f}x")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="离线基准测试")
+    parser.add_argument("--only", action="append", default=[], help="只运行名称以该前缀开头的基准, 可重复")
+    parser.add_argument("--quick", action="store_true", help="缩小规模快速运行")
+    parser.add_argument("--scale", type=float, default=1.0, help="规模系数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个基准的重复次数, 取最快一次")
+    parser.add_argument("--out", help="结果 JSON 路径, 默认 tmp/benchmarks/<时间>.json")
+    parser.add_argument("--baseline", help="用于对比的历史结果 JSON")
+    args = parser.parse_args(argv)
+
+    scale = args.scale * (0.1 if args.quick else 1.0)
+    repeat = 1 if args.quick else args.repeat
+    out = os.path.abspath(args.out or os.path.join(REPO_ROOT, "tmp", "benchmarks", time.strftime("%Y%m%d-%H%M%S") + ".json"))
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    sys.path.insert(0, REPO_ROOT)
+    cwd = os.getcwd()
+    workspace = tempfile.mkdtemp(prefix="pentest_bench_")
+    results = {}
+    try:
+        prepare_workspace(workspace)
+        for name, func in BENCHMARKS.items():
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            result = func(scale, repeat)
+            results[name] = result
+            print(f"{name:40s} {result['ops_per_s']:14.1f} ops/s  {result['us_per_op']:12.2f} us/op")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'revision': _git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'scale': scale,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"结果已写入 {out}")
+
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/synthetic_modules.py
+from typing import Callable, Optional
+
+from core.message_bus import MessageBus
+from core.state import ModuleState
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+
+
+class SyntheticProducer(BaseModule):
+    """不需要输入, 每个执行周期向 channel 发布 batch 条消息, 共发布 total 条后结束"""
+
+    def __init__(self, message_bus: MessageBus, thread_manager: ThreadManager,
+                 channel: str = "scan_results", total: int = 1000, batch: int = 1, name: str = "synthetic_producer"):
+        super().__init__("benchmark", name, [], message_bus, thread_manager)
+        self.channel = channel
+        self.total = total
+        self.batch = batch
+        self.sent = 0
+
+    def waitMessage(self) -> bool:
+        return True
+
+    def execute(self) -> bool:
+        for _ in range(min(self.batch, self.total - self.sent)):
+            self.publish_message(self.channel, {
+                'ip': f"10.{self.sent >> 16 & 255}.{self.sent >> 8 & 255}.{self.sent & 255}",
+                'port': f"{80 + self.sent % 1000}/tcp",
+                'state': 'open',
+                'service': 'http'
+            })
+            self.sent += 1
+        return True
+
+    def waitOutput(self) -> bool:
+        if self.sent >= self.total:
+            self.state.transition(ModuleState.COMPLETED)
+            return False
+        return True
+
+    def cleanup(self) -> None:
+        pass
+
+
+class SyntheticConsumer(BaseModule):
+    """订阅 channels, 收到 expected 条消息后结束; work 为每条消息额外消耗的 CPU 循环次数
+
+    on_complete 在收齐消息时调用, 用于在其他模块仍在等待输入时结束整个引擎
+    """
+
+    def __init__(self, message_bus: MessageBus, thread_manager: ThreadManager,
+                 channels=("scan_results",), expected: int = 1000, work: int = 0, name: str = "synthetic_consumer",
+                 on_complete: Optional[Callable[[], None]] = None):
+        super().__init__("benchmark", name, list(channels), message_bus, thread_manager)
+        self.expected = expected
+        self.work = work
+        self.received = 0
+        self.on_complete = on_complete
+
+    def execute(self) -> bool:
+        for _ in range(self.work):
+            pass
+        self.received += 1
+        return True
+
+    def waitOutput(self) -> bool:
+        if self.received >= self.expected:
+            self.state.transition(ModuleState.COMPLETED)
+            if self.on_complete is not None:
+                self.on_complete()
+            return False
+        return True
+
+    def cleanup(self) -> None:
+        pass
@@ -0,0 +1,107 @@
+# core/cancellation.py
+"""协作式取消
+
+引擎持有一个 CancellationToken, 经 ThreadManager 传给所有模块, 模块再传给适配器:
+- 长时间运行的循环定期检查 token.cancelled, 或用 token.wait(timeout) 代替 time.sleep
+- 子进程、事件循环等无法轮询的资源通过 token.register(callback) 在取消时立即释放
+"""
+import os
+import signal
+import subprocess
+import threading
+from typing import Callable, Dict, Optional
+
+from utils.logger import get_logger
+
+
+class CancelledError(Exception):
+    """操作因引擎取消而中止"""
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: Dict[int, Callable[[], None]] = {}
+        self._next_handle = 0
+        self._lock = threading.Lock()
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "") -> bool:
+        """触发取消并依次执行已注册的回调, 重复调用无效, 返回本次是否触发"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        get_logger("Cancellation").info("取消: %s", reason or "未说明原因")
+        for callback in callbacks:
+            self._invoke(callback)
+        return True
+
+    @staticmethod
+    def _invoke(callback: Callable[[], None]) -> None:
+        try:
+            callback()
+        except Exception as e:
+            get_logger("Cancellation").warning("取消回调执行失败: %s", e)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待取消, 返回是否已取消; 可以代替 time.sleep 使等待在取消时立即结束"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise CancelledError(self.reason)
+
+    def register(self, callback: Callable[[], None]) -> int:
+        """注册取消时执行的回调, 已经取消时立即执行; 返回用于 unregister 的句柄"""
+        with self._lock:
+            if not self._event.is_set():
+                handle = self._next_handle
+                self._next_handle += 1
+                self._callbacks[handle] = callback
+                return handle
+        self._invoke(callback)
+        return -1
+
+    def unregister(self, handle: int) -> None:
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+
+# region 子进程
+def popen_group_kwargs() -> Dict:
+    """让子进程成为新进程组的组长, 取消时可以连同它派生的子进程一起结束"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def kill_process_group(process: subprocess.Popen, grace: float = 2.0) -> None:
+    """先 SIGTERM 整个进程组, grace 秒后仍未退出再 SIGKILL; Windows 上结束进程本身"""
+    if process.poll() is not None:
+        return
+    if os.name == 'nt':
+        process.kill()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        return
+
+    def escalate():
+        if process.poll() is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    timer = threading.Timer(grace, escalate)
+    timer.daemon = True
+    timer.start()
+# endregion
@@ -0,0 +1,307 @@
+# core/context.py
+import bisect
+import threading
+from collections.abc import Set as AbstractSet
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from utils.logger import get_logger
+
+
+class ContextSnapshot(Mapping):
+    """某个版本的只读上下文
+
+    快照只持有当时的字典引用, 获取时不复制; 写入方总是生成新字典, 所以持有快照不会阻塞写入,
+    快照内容也不会再变化。值本身不会被复制, 读取方不应原地修改取到的列表/字典
+    """
+
+    __slots__ = ("_data", "version")
+
+    def __init__(self, data: Dict[str, Any], version: int):
+        self._data = data
+        self.version = version
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self):
+        return f"ContextSnapshot(version={self.version}, keys={list(self._data)})"
+
+
+class _SetLog:
+    """只追加的元素日志, 多个版本的 GrowingSet 共享同一份日志"""
+
+    __slots__ = ("items", "positions")
+
+    def __init__(self):
+        self.items: List[Hashable] = []
+        self.positions: Dict[Hashable, int] = {}
+
+
+class GrowingSet(AbstractSet):
+    """add_items 写入的集合: 只读视图, 由共享日志和长度组成
+
+    新版本只在日志末尾追加新元素, 写入耗时与新增元素数成正比, 不再复制整个集合;
+    旧版本的长度不变, 后来追加的元素对它不可见, 所以快照中的值同样不会变化
+    """
+
+    __slots__ = ("_log", "_size")
+
+    def __init__(self, log: _SetLog, size: int):
+        self._log = log
+        self._size = size
+
+    @classmethod
+    def _from_iterable(cls, iterable: Iterable) -> frozenset:
+        # 并集/交集等运算的结果是普通的 frozenset
+        return frozenset(iterable)
+
+    def __contains__(self, item) -> bool:
+        return self._log.positions.get(item, self._size) < self._size
+
+    def __iter__(self) -> Iterator:
+        items = self._log.items
+        for index in range(self._size):
+            yield items[index]
+
+    def __len__(self) -> int:
+        return self._size
+
+    __hash__ = AbstractSet._hash
+
+    def __repr__(self):
+        return f"GrowingSet({list(self)!r})"
+
+    def added(self, items: Iterable) -> "GrowingSet":
+        """返回加入 items 后的新版本; 只有最新版本可以原地追加, 否则先复制出一份新日志"""
+        log = self._log
+        if len(log.items) != self._size:
+            log = _SetLog()
+            for item in self:
+                log.positions[item] = len(log.items)
+                log.items.append(item)
+        for item in items:
+            if item not in log.positions:
+                log.positions[item] = len(log.items)
+                log.items.append(item)
+        return GrowingSet(log, len(log.items))
+
+    @classmethod
+    def of(cls, items: Iterable = ()) -> "GrowingSet":
+        return cls(_SetLog(), 0).added(items)
+
+
+class _MapLog:
+    """只追加的 (key, value) 日志, 每个 key 记录它每次被写入的位置"""
+
+    __slots__ = ("entries", "positions", "keys", "first")
+
+    def __init__(self):
+        self.entries: List[Tuple[Hashable, Any]] = []
+        self.positions: Dict[Hashable, List[int]] = {}
+        self.keys: List[Hashable] = []  # 按第一次写入的顺序
+        self.first: List[int] = []  # keys 中每个 key 第一次写入的位置, 递增
+
+
+class GrowingMap(Mapping):
+    """merge 写入的字典: 只读视图, 由共享日志和长度组成
+
+    每次合并只追加被写入的条目, 读取某个 key 时在它的写入位置中二分查找本版本可见的最后一次;
+    被覆盖的旧值累积到与 key 的数量相当时整理一次日志, 均摊下来写入仍与条目数成正比
+    """
+
+    __slots__ = ("_log", "_size")
+
+    def __init__(self, log: _MapLog, size: int):
+        self._log = log
+        self._size = size
+
+    def __getitem__(self, key):
+        positions = self._log.positions.get(key)
+        if positions:
+            index = bisect.bisect_left(positions, self._size) - 1
+            if index >= 0:
+                return self._log.entries[positions[index]][1]
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        positions = self._log.positions.get(key)
+        return bool(positions) and positions[0] < self._size
+
+    def __iter__(self) -> Iterator:
+        keys = self._log.keys
+        for index in range(len(self)):
+            yield keys[index]
+
+    def __len__(self) -> int:
+        return bisect.bisect_left(self._log.first, self._size)
+
+    def __repr__(self):
+        return f"GrowingMap({dict(self)!r})"
+
+    def merged(self, mapping: Mapping) -> "GrowingMap":
+        """返回合并 mapping 后的新版本; 不是最新版本或旧值过多时先整理出一份新日志"""
+        log = self._log
+        if len(log.entries) != self._size or len(log.entries) > 2 * len(log.keys) + 64:
+            log = _MapLog()
+            self._append(log, self.items())
+        self._append(log, mapping.items())
+        return GrowingMap(log, len(log.entries))
+
+    @staticmethod
+    def _append(log: _MapLog, items: Iterable[Tuple[Hashable, Any]]) -> None:
+        for key, value in items:
+            position = len(log.entries)
+            positions = log.positions.get(key)
+            if positions is None:
+                positions = log.positions[key] = []
+                log.keys.append(key)
+                log.first.append(position)
+            log.entries.append((key, value))
+            positions.append(position)
+
+    @classmethod
+    def of(cls, mapping: Mapping = None) -> "GrowingMap":
+        return cls(_MapLog(), 0).merged(mapping or {})
+
+
+class SharedContext:
+    """线程安全、带版本号的全局上下文
+
+    写操作在锁内生成新的顶层字典并整体替换（写时复制）, 版本号加一;
+    读操作直接拿当前字典的引用, 不加锁。写入完成后在锁外通知订阅者
+    """
+
+    def __init__(self, initial: Optional[Dict[str, Any]] = None):
+        self._data: Dict[str, Any] = dict(initial or {})
+        self._version = 0
+        self._key_versions: Dict[str, int] = {key: 0 for key in self._data}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._watchers: List[Tuple[Callable, Optional[Set[str]]]] = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # region 读取
+    def snapshot(self) -> ContextSnapshot:
+        # 字典和版本号一起替换, 先取版本号再取字典可能错位, 所以在锁内成对读取
+        with self._lock:
+            return ContextSnapshot(self._data, self._version)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def key_version(self, key: str) -> int:
+        """key 最近一次被修改时的全局版本号, 不存在时返回 -1"""
+        return self._key_versions.get(key, -1)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+    # endregion
+
+    # region 写入
+    def _commit(self, changes: Dict[str, Any], removed: Iterable[str] = ()) -> ContextSnapshot:
+        """在锁内调用: 生成新字典并替换, 返回新快照"""
+        data = dict(self._data)
+        data.update(changes)
+        for key in removed:
+            data.pop(key, None)
+        self._version += 1
+        for key in changes:
+            self._key_versions[key] = self._version
+        for key in removed:
+            self._key_versions.pop(key, None)
+        self._data = data
+        self._changed.notify_all()
+        return ContextSnapshot(data, self._version)
+
+    def update(self, new_data: Dict[str, Any]) -> int:
+        """原子地写入多个 key, 返回新的版本号"""
+        if not new_data:
+            return self._version
+        with self._lock:
+            snapshot = self._commit(dict(new_data))
+        self._notify(set(new_data), snapshot)
+        return snapshot.version
+
+    def set(self, key: str, value: Any) -> int:
+        return self.update({key: value})
+
+    def delete(self, key: str) -> int:
+        with self._lock:
+            if key not in self._data:
+                return self._version
+            snapshot = self._commit({}, (key,))
+        self._notify({key}, snapshot)
+        return snapshot.version
+
+    def update_key(self, key: str, func: Callable[[Any], Any], default: Any = None) -> Any:
+        """对单个 key 做原子的读-改-写: value = func(旧值), func 必须返回新对象而不是原地修改旧值"""
+        with self._lock:
+            value = func(self._data.get(key, default))
+            snapshot = self._commit({key: value})
+        self._notify({key}, snapshot)
+        return value
+
+    def add_items(self, key: str, items: Iterable) -> GrowingSet:
+        """把 items 并入 key 对应的集合（以只读的 GrowingSet 保存）, 例如发现的主机; 耗时与新增元素数成正比"""
+        items = list(items)
+        return self.update_key(key, lambda old: old.added(items) if isinstance(old, GrowingSet)
+                               else GrowingSet.of(old or ()).added(items))
+
+    def merge(self, key: str, mapping: Mapping) -> GrowingMap:
+        """把 mapping 合并进 key 对应的字典（以只读的 GrowingMap 保存）, 例如 {主机: 凭据}; 耗时与合并的条目数成正比"""
+        mapping = dict(mapping)
+        return self.update_key(key, lambda old: old.merged(mapping) if isinstance(old, GrowingMap)
+                               else GrowingMap.of(old).merged(mapping))
+
+    def compare_and_set(self, key: str, expected_version: int, value: Any) -> bool:
+        """key 自 expected_version 以来没有被修改过时才写入, 用于乐观并发控制"""
+        with self._lock:
+            if self._key_versions.get(key, -1) != expected_version:
+                return False
+            snapshot = self._commit({key: value})
+        self._notify({key}, snapshot)
+        return True
+    # endregion
+
+    # region 变更通知
+    def watch(self, callback: Callable[[Set[str], ContextSnapshot], None],
+              keys: Optional[Iterable[str]] = None) -> Callable:
+        """注册变更回调 callback(变更的key集合, 新快照), keys 为空时关注所有 key
+
+        回调在写入方线程中、锁外同步执行, 应当尽快返回; 返回值可传给 unwatch 取消订阅
+        """
+        with self._lock:
+            self._watchers.append((callback, set(keys) if keys else None))
+        return callback
+
+    def unwatch(self, callback: Callable) -> None:
+        with self._lock:
+            self._watchers = [(cb, keys) for cb, keys in self._watchers if cb is not callback]
+
+    def wait_for_change(self, version: int, timeout: Optional[float] = None) -> ContextSnapshot:
+        """阻塞直到版本号大于 version 或超时, 返回最新快照"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._version > version, timeout)
+            return ContextSnapshot(self._data, self._version)
+
+    def _notify(self, changed: Set[str], snapshot: ContextSnapshot) -> None:
+        for callback, keys in list(self._watchers):
+            if keys is not None and not (keys & changed):
+                continue
+            try:
+                callback(changed, snapshot)
+            except Exception as e:
+                get_logger("Context").exception("上下文变更回调失败: %s", e)
+    # endregion
@@ -0,0 +1,83 @@
+# core/control.py
+"""运行中引擎的本地控制接口
+
+引擎启动时按 --control 或 config.yaml 的 control.listen 监听本地 socket, 协议与协调进程相同, 每行一个 JSON:
+
+    python -m core.control unix:///tmp/pentest.sock pause
+    python -m core.control unix:///tmp/pentest.sock resume
+    python -m core.control unix:///tmp/pentest.sock status
+
+支持的操作: pause、resume、status、cancel; 控制接口没有认证, TCP 只允许监听本机回环地址
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+
+from core.coordinator import CoordinatorClient
+from core.line_protocol import create_server
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        engine = self.server.engine
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'pause':
+                    engine.pause(request.get('reason') or "控制接口")
+                elif op == 'resume':
+                    engine.resume()
+                elif op == 'cancel':
+                    engine.cancel(request.get('reason') or "控制接口")
+                elif op != 'status':
+                    raise ValueError(f"未知操作: {op}")
+                response = {'ok': True, **engine.status()}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+
+class ControlServer:
+    """在 Unix socket 或本机 TCP 端口上接收控制命令, 命令直接调用引擎的 pause/resume/cancel/status"""
+
+    def __init__(self, engine, address: str):
+        self.address = address
+        # 控制接口没有认证, 不允许监听回环以外的地址
+        self._server, self._path = create_server(address, _RequestHandler)
+        self._server.engine = engine
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, name="control", daemon=True).start()
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._path and os.path.exists(self._path):
+            os.unlink(self._path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="控制运行中的引擎")
+    parser.add_argument("address", help="引擎的控制地址, 如 unix:///tmp/pentest.sock 或 tcp://127.0.0.1:7071")
+    parser.add_argument("op", choices=['pause', 'resume', 'status', 'cancel'])
+    parser.add_argument("--reason", default="", help="暂停/取消的原因, 记录在引擎日志中")
+    args = parser.parse_args()
+
+    client = CoordinatorClient(args.address)
+    try:
+        response = client.request(args.op, reason=args.reason)
+    except (OSError, RuntimeError) as e:
+        print(f"控制命令失败: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        client.close()
+    print(json.dumps(response, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+# core/coordinator.py
+"""分布式扫描的协调进程
+
+协调进程持有全部目标, 多个引擎进程（worker）通过 TCP 或 Unix socket 领取目标租约、定时心跳并回传结果:
+
+    export PENTEST_COORDINATOR_TOKEN=<共享令牌>
+    python -m core.coordinator --listen tcp://0.0.0.0:7070 --targets targets.txt
+    python main.py --coordinator tcp://<协调进程地址>:7070
+
+- 监听回环以外的地址时必须设置共享令牌（--token 或环境变量 PENTEST_COORDINATOR_TOKEN）, 每个请求都要带上相同的令牌,
+  否则任何能连上端口的人都可以向所有 worker 注入扫描目标; 完成/失败/归还只接受持有该租约的 worker 的请求
+
+- CIDR/地址范围去掉排除项后惰性展开, 领取租约时才取下一个地址, 每个地址一个租约, 与 PortScanner/host_discovery 按地址报告完成一致;
+  协调进程只保存未完成的租约和待重试的目标, 内存与目标范围大小无关（重叠的目标不去重, 会被重复扫描）
+- 租约在 lease_ttl 秒内没有心跳续期就视为 worker 失联, 目标重新入队, 超过 max_attempts 次后记为失败
+- worker 会预取少量租约, 全局队列为空时, 空闲 worker 可以从预取最多的 worker 处窃取尚未开始的租约
+- 协议为每行一个 JSON 的请求/响应: {"op": "...", ...} -> {"ok": true, ...}
+"""
+import argparse
+import hmac
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.line_protocol import create_server, parse_address
+from utils.logger import get_logger
+from utils.targets import ExclusionIndex, iter_target_addresses, iter_target_specs
+
+
+# 共享令牌的环境变量, 协调进程和 worker 都会读取, 避免令牌出现在命令行参数中
+TOKEN_ENV = "PENTEST_COORDINATOR_TOKEN"
+
+
+class Lease:
+    __slots__ = ("lease_id", "target", "worker", "deadline", "attempts", "started")
+
+    def __init__(self, lease_id: str, target: str, worker: str, deadline: float, attempts: int):
+        self.lease_id = lease_id
+        self.target = target
+        self.worker = worker
+        self.deadline = deadline
+        self.attempts = attempts  # 包括本次在内该目标被租出的次数
+        self.started = False
+
+    def to_dict(self) -> Dict:
+        return {'lease_id': self.lease_id, 'target': self.target}
+
+
+class Coordinator:
+    """租约状态, 所有操作在同一把锁内完成, 与网络层无关, 可以直接在进程内使用"""
+
+    def __init__(self,
+                 lease_ttl: float = 120,
+                 max_attempts: int = 3,
+                 steal: bool = True,
+                 store=None,
+                 exclusions: Optional[ExclusionIndex] = None):
+        """
+        :param lease_ttl: 租约有效期（秒）, worker 每次心跳都会续期
+        :param max_attempts: 单个目标最多被租出的次数
+        :param steal: 全局队列为空时是否允许窃取其他 worker 预取但未开始的租约
+        :param store: 可选的 FindingsStore, worker 回传的结果写入其中
+        :param exclusions: 排除范围, 入队时跳过其中的地址
+        """
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self.steal = steal
+        self.store = store
+        self.exclusions = exclusions
+
+        self._sources: deque = deque()  # 尚未展开完的目标生成器, 按加入顺序取地址
+        self._retry: deque = deque()  # (目标, 已租出次数), 租约过期或失败后重新分配
+        self._leases: Dict[str, Lease] = {}
+        self._by_worker: Dict[str, Dict[str, Lease]] = {}
+        self._by_target: Dict[str, Dict[str, Lease]] = {}
+        self._revoked: Dict[str, List[str]] = {}  # worker -> 被收回的租约, 下次心跳时通知
+        self._issued = 0
+        self._done = 0
+        self._failed = 0
+        self._workers: Dict[str, float] = {}
+        self._results = 0
+        self._lock = threading.Lock()
+        self.logger = get_logger("Coordinator")
+
+    # region 目标
+    def add_targets(self, targets: Iterable[str]) -> None:
+        """目标可以是地址、CIDR、地址范围或主机名, 领取租约时才逐个展开
+
+        targets 可以是惰性的生成器（如 iter_target_specs 逐行读取的文件）, 在全部分配前不会被读完
+        """
+        specs = (target.strip() for target in targets if target.strip())
+        with self._lock:
+            self._sources.append(iter_target_addresses(specs, self.exclusions))
+
+    def _next_target(self) -> Optional[Tuple[str, int]]:
+        """下一个待分配的目标和已租出次数, 重新入队的目标优先; 没有剩余目标时返回 None（调用方需持有 self._lock）"""
+        if self._retry:
+            return self._retry.popleft()
+        while self._sources:
+            target = next(self._sources[0], None)
+            if target is None:
+                self._sources.popleft()
+                continue
+            self._issued += 1
+            return target, 0
+        return None
+
+    def _has_pending(self) -> bool:
+        """是否还有待分配的目标, 需要时从生成器预取一个放回重试队列（调用方需持有 self._lock）"""
+        if self._retry:
+            return True
+        item = self._next_target()
+        if item is None:
+            return False
+        self._retry.appendleft(item)
+        return True
+    # endregion
+
+    # region 租约
+    def _grant(self, worker: str, target: str, attempts: int, now: float) -> Lease:
+        lease = Lease(uuid.uuid4().hex, target, worker, now + self.lease_ttl, attempts)
+        self._leases[lease.lease_id] = lease
+        self._by_worker.setdefault(worker, {})[lease.lease_id] = lease
+        self._by_target.setdefault(target, {})[lease.lease_id] = lease
+        return lease
+
+    def _drop(self, lease: Lease) -> None:
+        self._leases.pop(lease.lease_id, None)
+        for index, key in ((self._by_worker, lease.worker), (self._by_target, lease.target)):
+            held = index.get(key)
+            if held is not None:
+                held.pop(lease.lease_id, None)
+                if not held:
+                    del index[key]
+
+    def _requeue(self, lease: Lease, reason: str, attempts: Optional[int] = None) -> None:
+        self._drop(lease)
+        attempts = lease.attempts if attempts is None else attempts
+        if attempts >= self.max_attempts:
+            self._failed += 1
+            self.logger.warning("目标 %s 已租出 %d 次仍未完成, 放弃: %s", lease.target, self.max_attempts, reason)
+            return
+        # 重新入队的目标放在队首, 尽快再次分配
+        self._retry.appendleft((lease.target, attempts))
+
+    def _steal(self, thief: str, count: int, now: float) -> List[Lease]:
+        """从尚未开始的租约最多的 worker 处收回一半, 转给空闲的 worker"""
+        if any(not lease.started for lease in self._by_worker.get(thief, {}).values()):
+            # 自己还有没开始的租约时不窃取, 避免两个 worker 来回窃取同一批目标
+            return []
+        victims = [
+            (worker, [lease for lease in held.values() if not lease.started])
+            for worker, held in self._by_worker.items() if worker != thief
+        ]
+        victims = [(worker, idle) for worker, idle in victims if len(idle) > 1]
+        if not victims:
+            return []
+        worker, idle = max(victims, key=lambda item: len(item[1]))
+        stolen = []
+        for lease in idle[:max(1, min(count, len(idle) // 2))]:
+            self._drop(lease)
+            self._revoked.setdefault(worker, []).append(lease.lease_id)
+            # 窃取不算一次新的尝试
+            stolen.append(self._grant(thief, lease.target, lease.attempts, now))
+        self.logger.info("%s 从 %s 窃取了 %d 个租约", thief, worker, len(stolen))
+        return stolen
+
+    def lease(self, worker: str, count: int = 1) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            self._workers[worker] = now
+            granted = []
+            while len(granted) < count:
+                item = self._next_target()
+                if item is None:
+                    break
+                target, attempts = item
+                granted.append(self._grant(worker, target, attempts + 1, now))
+            if not granted and self.steal:
+                granted = self._steal(worker, count, now)
+            return {'leases': [lease.to_dict() for lease in granted], 'finished': self._finished()}
+
+    def heartbeat(self, worker: str, held: Iterable[str] = (), started: Iterable[str] = ()) -> Dict:
+        """续期 worker 持有的租约, 返回被收回或已失效的租约"""
+        now = time.monotonic()
+        with self._lock:
+            self._workers[worker] = now
+            lost = []
+            for lease_id in held:
+                lease = self._leases.get(lease_id)
+                if lease is None or lease.worker != worker:
+                    lost.append(lease_id)
+                    continue
+                lease.deadline = now + self.lease_ttl
+            for lease_id in started:
+                lease = self._leases.get(lease_id)
+                if lease is not None and lease.worker == worker:
+                    lease.started = True
+            revoked = self._revoked.pop(worker, [])
+            return {'revoked': revoked, 'lost': lost, 'finished': self._finished()}
+
+    def complete(self, worker: str, lease_id: str, target: Optional[str] = None) -> Dict:
+        with self._lock:
+            lease = self._leases.get(lease_id)
+            if lease is None or lease.worker != worker:
+                # 租约已过期或被收回, 目标已重新分配, 以新租约的结果为准; 其他 worker 不能代为完成
+                return {'accepted': False}
+            self._drop(lease)
+            self._done += 1
+            # 同一目标被窃取/重新分配后可能同时在其他 worker 上, 通知它们不必再扫描
+            for other in list(self._by_target.get(lease.target, {}).values()):
+                self._drop(other)
+                self._revoked.setdefault(other.worker, []).append(other.lease_id)
+            return {'accepted': True}
+
+    def fail(self, worker: str, lease_id: str, error: str = "") -> Dict:
+        with self._lock:
+            lease = self._leases.get(lease_id)
+            if lease is not None and lease.worker == worker:
+                self._requeue(lease, error)
+            return {}
+
+    def release(self, worker: str, lease_ids: Iterable[str]) -> Dict:
+        """worker 退出时归还尚未开始的租约, 不计入尝试次数"""
+        with self._lock:
+            for lease_id in lease_ids:
+                lease = self._leases.get(lease_id)
+                if lease is not None and lease.worker == worker:
+                    self._requeue(lease, "worker 归还", lease.attempts - 1)
+            return {}
+
+    def expire(self) -> int:
+        """把超过有效期的租约重新入队, 由后台线程定时调用"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [lease for lease in self._leases.values() if lease.deadline < now]
+            for lease in expired:
+                self.logger.warning("租约过期: %s (%s)", lease.target, lease.worker)
+                self._requeue(lease, "租约过期")
+            return len(expired)
+    # endregion
+
+    def results(self, worker: str, records: List[Dict]) -> Dict:
+        """worker 回传的扫描结果, 带 check 字段的记为漏洞"""
+        if self.store is not None:
+            self.store.add_ports(record for record in records if 'check' not in record)
+            self.store.add_vulns(record for record in records if 'check' in record)
+        with self._lock:
+            self._results += len(records)
+        return {}
+
+    def _finished(self) -> bool:
+        return not self._leases and not self._has_pending()
+
+    def status(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'issued': self._issued,
+                'retry': len(self._retry),
+                'leased': len(self._leases),
+                'done': self._done,
+                'failed': self._failed,
+                'results': self._results,
+                'workers': {worker: round(now - seen, 1) for worker, seen in self._workers.items()},
+                'finished': self._finished(),
+            }
+
+    def handle(self, request: Dict) -> Dict:
+        op = request.pop('op', None)
+        handler = {
+            'lease': self.lease,
+            'heartbeat': self.heartbeat,
+            'complete': self.complete,
+            'fail': self.fail,
+            'release': self.release,
+            'results': self.results,
+            'add_targets': lambda targets: self.add_targets(targets) or {'added': len(targets)},
+            'status': self.status,
+        }.get(op)
+        if handler is None:
+            return {'ok': False, 'error': f"未知操作: {op}"}
+        response = handler(**request)
+        response['ok'] = True
+        return response
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coordinator: Coordinator = self.server.coordinator
+        token = self.server.token
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                supplied = str(request.pop('token', None) or "")
+                if token and not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+                    response = {'ok': False, 'error': "令牌错误"}
+                else:
+                    response = coordinator.handle(request)
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+
+class CoordinatorServer:
+    """在 TCP 或 Unix socket 上提供 Coordinator, 并定时回收过期租约"""
+
+    def __init__(self, coordinator: Coordinator, address: str, expire_interval: float = 1.0,
+                 token: Optional[str] = None):
+        """
+        :param token: 共享令牌, 设置后每个请求都要带上; 没有令牌时只能监听回环地址或 Unix socket
+        :raises ValueError: 没有令牌却监听了回环以外的地址
+        """
+        self.coordinator = coordinator
+        self.address = address
+        self.expire_interval = expire_interval
+        try:
+            self._server, _ = create_server(address, _RequestHandler, allow_remote=bool(token))
+        except ValueError as e:
+            raise ValueError(f"{e}, 监听其他地址需要设置共享令牌 (--token 或 {TOKEN_ENV})") from None
+        self._server.coordinator = coordinator
+        self._server.token = token
+        self._stop = threading.Event()
+
+    @property
+    def server_address(self):
+        return self._server.server_address
+
+    def _expire_loop(self) -> None:
+        while not self._stop.wait(self.expire_interval):
+            self.coordinator.expire()
+
+    def start(self) -> None:
+        """在后台线程中运行"""
+        threading.Thread(target=self._server.serve_forever, name="coordinator", daemon=True).start()
+        threading.Thread(target=self._expire_loop, name="coordinator_expire", daemon=True).start()
+
+    def serve_forever(self) -> None:
+        threading.Thread(target=self._expire_loop, name="coordinator_expire", daemon=True).start()
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class CoordinatorClient:
+    """worker 端的客户端, 单个长连接, 断开后下次请求时自动重连"""
+
+    def __init__(self, address: str, timeout: float = 10, token: Optional[str] = None):
+        self.address = address
+        self.timeout = timeout
+        self.token = token
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+
+    def request(self, op: str, **kwargs) -> Dict:
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    request = {'op': op, **kwargs}
+                    if self.token:
+                        request['token'] = self.token
+                    self._file.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b"\n")
+                    self._file.flush()
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("协调进程关闭了连接")
+                    response = json.loads(line)
+                    break
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+        if not response.pop('ok', False):
+            raise RuntimeError(response.get('error', "协调进程返回错误"))
+        return response
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._file = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分布式扫描协调进程")
+    parser.add_argument("--listen", default="tcp://127.0.0.1:7070", help="监听地址, tcp://host:port 或 unix:///path")
+    parser.add_argument("--targets", action="append", default=[], help="目标文件, 每行一个, 可重复")
+    parser.add_argument("--exclude", action="append", default=[], help="排除的地址/CIDR/范围, 逗号分隔, 可重复")
+    parser.add_argument("--exclude-file", action="append", default=[], help="排除列表文件, 可重复")
+    parser.add_argument("--lease-ttl", type=float, default=120, help="租约有效期(秒)")
+    parser.add_argument("--max-attempts", type=int, default=3, help="单个目标最多尝试次数")
+    parser.add_argument("--no-steal", action="store_true", help="禁止空闲 worker 窃取租约")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help=f"共享令牌, 监听回环以外的地址时必须设置, 默认读取环境变量 {TOKEN_ENV}")
+    parser.add_argument("--db", default="./data/coordinator.db", help="worker 回传结果的存储位置, 为空时不保存")
+    args = parser.parse_args()
+
+    store = None
+    if args.db:
+        from utils.findings_store import FindingsStore
+        store = FindingsStore(args.db)
+
+    exclusions = ExclusionIndex(iter_target_specs(args.exclude + ['@' + path for path in args.exclude_file]))
+    coordinator = Coordinator(args.lease_ttl, args.max_attempts, not args.no_steal, store, exclusions)
+    coordinator.add_targets(iter_target_specs('@' + path for path in args.targets))
+
+    try:
+        server = CoordinatorServer(coordinator, args.listen, token=args.token)
+    except ValueError as e:
+        parser.error(str(e))
+    logger = get_logger("Coordinator")
+    logger.info("协调进程监听 %s", args.listen)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        if store is not None:
+            store.finish_run()
+            store.close()
+        logger.info("协调进程已退出: %s", coordinator.status())
+
+
+if __name__ == "__main__":
+    main()
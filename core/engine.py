@@ -1,29 +1,87 @@
 # core/engine.py
 import importlib
+import os
+import threading
 import time
 
 import yaml
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
+from core.cancellation import CancellationToken
+from core.context import SharedContext
+from core.control import ControlServer
 from core.message_bus import MessageBus
+from core.profiler import create_profiler
+from core.rate_limiter import get_rate_limiter
+from core.resources import get_accounting
 from core.state import StateMachine, EngineState, ModuleState
 from core.thread_manager import ThreadManager
+from core.tracer import get_tracer
 from modules.base_module import BaseModule
+from utils.logger import get_logger
 
 
 class PentestEngine:
-    def __init__(self, config_path="config/config.yaml"):
+    def __init__(self, config_path="config/config.yaml", trace=None, profiler=None, coordinator=None, rescan=None,
+                 control=None):
+        """
+        :param trace: 是否记录 span 并导出 Chrome trace, None 时使用配置文件 diagnostics.trace
+        :param profiler: none/cprofile/sampling, None 时使用配置文件 diagnostics.profiler
+        :param coordinator: 协调进程地址, 设置后以分布式 worker 运行, 目标从协调进程领取
+        :param rescan: 增量复扫的基线运行标识, 空字符串表示使用结果库中最近一次运行, None 时不复扫
+        :param control: 控制接口的监听地址（如 unix:///tmp/pentest.sock）, None 时使用配置文件 control.listen
+        """
         self.config_path = config_path
+        self._trace = trace
+        self._profiler_kind = profiler
+        self.coordinator = coordinator
+        self.rescan = rescan
+        self._control_address = control
+        self._control_server = None
+        self.tracer = get_tracer()
+        self.accounting = get_accounting()
+        self.profiler = None
+        self._resource_output = None
+        self.config: Dict = {}
         self.modules: List[BaseModule] = []
         self.message_bus = MessageBus()
-        self.current_context: Dict = {}
+        self.current_context = SharedContext()  # 所有模块共享的上下文
         self._state = StateMachine()
-        self.thread_manager = ThreadManager()
+        # 取消令牌经 ThreadManager 传给所有模块和适配器, cancel() 后主循环、子进程和事件循环都会尽快结束
+        self.cancel_token = CancellationToken()
+        self.thread_manager = ThreadManager(self.cancel_token)
+        # 暂停由主循环在模块之间响应; 限速器同时挡住新的请求和子进程
+        self.rate_limiter = get_rate_limiter()
+        self._pause_requested = threading.Event()
+        # 模块不在总线上阻塞, 一轮中没有模块推进状态时, 主循环最多等待这么久再检查异步任务（nmap 线程等）
+        self.idle_wait = 0.1
+        self.cancel_token.register(self.message_bus.wake)
+        self._cleaned_up = False
+        # 读取初始目标的线程, 取消后它把还没读取的目标交给 defer_targets, 与其他未完成的目标一起保存
+        self._feeder = None
+        self._deferred: List[Iterable[str]] = []
+        self.logger = get_logger("Engine")
 
     def _load_config(self, config_path):
         with open(config_path, encoding='utf-8') as f:
             self.config = yaml.safe_load(f)
 
+        self._start_diagnostics(self.config.get('diagnostics', {}) or {})
+        self.rate_limiter.configure(self.config.get('rate_limit', {}) or {}, self.cancel_token)
+        self._start_control((self.config.get('control', {}) or {}).get('listen'))
+
+        if self.coordinator:
+            # worker 模块从共享上下文读取协调进程地址
+            self.current_context.set('coordinator', self.coordinator)
+            modules = self.config["modules"]
+            modules['distributed'] = modules.get('distributed') or {}
+            modules['distributed'].setdefault('worker', {})['enable'] = True
+
+        if self.rescan is not None:
+            # PortScanner 看到上下文中的 rescan 后把结果交给 rescan_gate, 只有变化的主机进入后续检测
+            self.current_context.set('rescan', {'base_run': self.rescan or None})
+            self.config["modules"]['scanner'].setdefault('rescan_gate', {})['enable'] = True
+
         # 动态加载模块
         for module_dir, module_contents in self.config["modules"].items():
             for module_name, module_config in module_contents.items():
@@ -37,7 +95,9 @@ class PentestEngine:
             # 动态导入模块（例如：modules.scanner）
             module = importlib.import_module(f"modules.{module_dir}.{module_name}")
             # 调用模块的工厂方法
-            return module.create(self.message_bus, self.thread_manager)
+            instance = module.create(self.message_bus, self.thread_manager)
+            instance.bind_context(self.current_context)
+            return instance
         except (ImportError, AttributeError) as e:
             self._handle_error(f"模块加载失败: {module_name} - {str(e)}")
 
@@ -59,21 +119,40 @@ class PentestEngine:
                 self._load_config(self.config_path)
                 self._state.transition(EngineState.RUNNING)
             elif current_state == EngineState.RUNNING:
+                if self._pause_requested.is_set() and not self.cancel_token.cancelled:
+                    self._state.transition(EngineState.PAUSED)
+                    self.logger.info("引擎已暂停")
+                    continue
 
+                delivered = self.message_bus.delivered
+                progressed = False
                 for module in self.modules:
+                    if self.cancel_token.cancelled or self._pause_requested.is_set():
+                        break
                     module_state = module.state.current
 
+                    # waitMessage 只是在等待输入, 不计入模块的资源占用, 墙钟只统计 execute/waitOutput
                     if module_state == ModuleState.WAITING:
-                        if module.waitMessage():
+                        with self.tracer.span("waitMessage", "module", module=module.name) as span:
+                            ready = module.waitMessage()
+                            span.tag(ready=ready)
+                        if ready:
                             module.state.transition(ModuleState.READY)
                     elif module_state == ModuleState.READY:
-                        if module.execute():
+                        with self.accounting.track(module.name), \
+                                self.tracer.span("execute", "module", module=module.name, target=module.current_target()):
+                            done = module.execute()
+                        if done:
                             module.state.transition(ModuleState.RUNNING)
                     elif module_state == ModuleState.RUNNING:
-                        if module.waitOutput():
+                        with self.accounting.track(module.name), \
+                                self.tracer.span("waitOutput", "module", module=module.name, target=module.current_target()):
+                            done = module.waitOutput()
+                        if done:
                             module.state.transition(ModuleState.WAITING)
                     elif module_state == ModuleState.ERROR:
                         self._state.transition(EngineState.ERROR)
+                    progressed = progressed or module.state.current != module_state
 
                     # if module.ready():
                     #     # 通过消息总线获取输入
@@ -88,12 +167,24 @@ class PentestEngine:
                 # 检查终止条件
                 if self._check_termination():
                     self._state.transition(EngineState.COMPLETED)
+                elif not progressed:
+                    self.message_bus.wait_activity(delivered, self.idle_wait)
 
 
 
+            elif current_state == EngineState.PAUSED:
+                # 模块保持各自的状态, 恢复后从暂停前的位置继续
+                if self.cancel_token.cancelled:
+                    self._state.transition(EngineState.COMPLETED)
+                elif not self._pause_requested.is_set():
+                    self._state.transition(EngineState.RUNNING)
+                    self.logger.info("引擎已恢复运行")
+                else:
+                    self.cancel_token.wait(0.2)
+
             elif current_state == EngineState.ERROR:
                 error_message = self.message_bus.subscribe("system_errors")['data']
-                print(f"{error_message['type']}: {error_message['message']}")
+                self.logger.error("%s: %s", error_message['type'], error_message['message'])
                 self._cleanup()
                 return
 
@@ -110,15 +201,182 @@ class PentestEngine:
         }
         self.message_bus.publish(channel_map.get(module_name, "default"), data)
 
+    def pause(self, reason: str = "") -> None:
+        """暂停: 不再调度模块, 新的请求和子进程在限速器入口等待; 进行中的请求和子进程继续完成, 结果留在通道中"""
+        self.rate_limiter.pause()
+        self.message_bus.wake()
+        if not self._pause_requested.is_set():
+            self._pause_requested.set()
+            self.logger.info("请求暂停: %s", reason or "未说明原因")
+
+    def resume(self) -> None:
+        self._pause_requested.clear()
+        self.rate_limiter.resume()
+
+    def status(self) -> Dict:
+        return {
+            'state': self._state.current.name,
+            'paused': self._pause_requested.is_set(),
+            'cancelled': self.cancel_token.cancelled,
+            'modules': {module.name: module.state.current.name for module in self.modules},
+            'rate_limit': dict(self.rate_limiter.stats),
+        }
+
+    def _start_control(self, address) -> None:
+        address = self._control_address or address
+        if not address:
+            return
+        try:
+            self._control_server = ControlServer(self, address)
+        except (OSError, ValueError) as e:
+            self.logger.error("控制接口 %s 启动失败: %s", address, e)
+            return
+        self._control_server.start()
+        self.logger.info("控制接口监听 %s", address)
+
+    def start_feeder(self, feed, *args) -> None:
+        """在后台线程中运行 feed(engine, *args) 发布初始目标"""
+        self._feeder = threading.Thread(target=feed, args=(self, *args), name="Target feeder", daemon=True)
+        self._feeder.start()
+
+    def defer_targets(self, targets: Iterable[str]) -> None:
+        """取消后不再发布的目标, 保存时排在最后, 可以是还没读完的生成器"""
+        self._deferred.append(targets)
+
+    def cancel(self, reason: str = "") -> None:
+        """请求引擎尽快结束, 可以从信号处理函数或其他线程调用; 主循环在当前模块处理完后退出并清理"""
+        self.cancel_token.cancel(reason)
+
     def _check_termination(self):
         # 实现自定义的终止条件判断逻辑
 
+        if self.cancel_token.cancelled:
+            return True
         # 如果都跑完了就完成了
         if len(self.modules) == 0:
             return True
+        if all(module.state.current == ModuleState.COMPLETED for module in self.modules):
+            return True
+        # 模块可以通过上下文请求结束整个引擎（例如分布式 worker 已没有剩余目标）
+        if self.current_context.get('stop_requested'):
+            return True
 
         return False
 
+    def _start_diagnostics(self, diagnostics: Dict):
+        """按配置开启 span 追踪和 profiler"""
+        trace = diagnostics.get('trace', False) if self._trace is None else self._trace
+        if trace:
+            self.tracer.configure(enabled=True, max_events=diagnostics.get('trace_max_events'))
+        self._trace_output = diagnostics.get('trace_output', "./tmp/trace.json")
+        self.accounting.enabled = diagnostics.get('resources', True)
+        self._resource_output = diagnostics.get('resource_output')
+
+        kind = diagnostics.get('profiler') if self._profiler_kind is None else self._profiler_kind
+        self.profiler = create_profiler(kind,
+                                        diagnostics.get('profile_output', "./tmp/profile"),
+                                        diagnostics.get('sample_interval', 0.005))
+        if self.profiler is not None:
+            self.profiler.start()
+
+    def _stop_diagnostics(self):
+        if self.accounting.enabled:
+            self.logger.info(self.accounting.format_summary())
+            if self._resource_output:
+                self.accounting.export(self._resource_output)
+        if self.profiler is not None:
+            self.logger.info("profile 已保存到 %s", self.profiler.stop())
+            self.profiler = None
+        if self.tracer.enabled:
+            count = self.tracer.export_chrome_trace(self._trace_output)
+            self.logger.info("trace 已保存到 %s (%d 个span)", self._trace_output, count)
+
     def _cleanup(self):
-        for module in reversed(self.modules):
-            module.cleanup()
+        """结束引擎: 取消子进程和后台任务, 按加载顺序清理模块, 保存未处理的目标, 在期限内等待线程退出
+
+        可以重复调用, 只有第一次生效; 正常结束时同样经过这里
+        """
+        if self._cleaned_up:
+            return
+        self._cleaned_up = True
+        shutdown = self.config.get('shutdown', {}) or {}
+        # 先记录正在处理的目标, 模块清理后这些状态就不存在了
+        pending = self._interrupted_targets() if self.cancel_token.cancelled else []
+
+        # 先结束正在运行的子进程、事件循环和读取目标的线程, 再按加载顺序清理: 生产者先停止, 存储模块最后把通道中剩余的结果写入
+        self.cancel_token.cancel(self.cancel_token.reason or "引擎结束")
+        pending += self._stop_feeder(shutdown.get('join_timeout', 10))
+        pending += self._drain_targets()
+
+        # 模块清理时据此区分完整的运行和中途中止的运行, 例如结果库只把完整的运行标记为完成;
+        # 引擎没有自然结束的条件, 所有目标都扫描完后再取消的运行仍然是完整的
+        if self._state.current == EngineState.ERROR:
+            outcome = 'error'
+        elif pending or self._deferred:
+            outcome = 'cancelled'
+        else:
+            outcome = 'completed'
+        self.current_context.set('outcome', outcome)
+
+        for module in self.modules:
+            try:
+                module.cleanup()
+            except Exception as e:
+                self.logger.error("模块 %s 清理失败: %s", module.name, e)
+        pending += self._drain_targets()
+        # 分布式模式下未完成的租约由协调进程重新分配, 不需要保存
+        if (pending or self._deferred) and not self.coordinator:
+            self._save_pending_targets(pending, shutdown.get('pending_targets', "./tmp/pending_targets.txt"))
+        self.thread_manager.cleanup(shutdown.get('join_timeout', 10))
+        if self._control_server is not None:
+            self._control_server.shutdown()
+            self._control_server = None
+        if self.rate_limiter.enabled:
+            self.logger.info(self.rate_limiter.format_summary())
+        self._stop_diagnostics()
+
+    def _interrupted_targets(self) -> List[str]:
+        """取消时正在扫描或已取到还没开始扫描的目标"""
+        targets = []
+        for module in self.modules:
+            if set(module.inputChannel) & {"scan_target", "live_targets"}:
+                targets += module.pending_targets()
+        return targets
+
+    def _stop_feeder(self, timeout: float) -> List[str]:
+        """等待读取目标的线程交回剩余目标后结束; 它可能阻塞在已满的 scan_target 上, 等待期间不断取走通道中的目标"""
+        targets = []
+        deadline = time.monotonic() + timeout
+        while self._feeder is not None and self._feeder.is_alive() and time.monotonic() < deadline:
+            targets += self._drain_targets()
+            self._feeder.join(0.1)
+        return targets
+
+    def _drain_targets(self) -> List[str]:
+        """取走目标通道中还没有被处理的目标"""
+        targets = []
+        for channel in ("scan_target", "live_targets"):
+            for message in self.message_bus.drain(channel):
+                data = message.get('data', {})
+                target = data.get('data', data).get('ip')
+                if target:
+                    targets.append(target)
+        return targets
+
+    def _save_pending_targets(self, targets: List[str], path: str) -> None:
+        """未扫描的目标写入文件, 之后可以用 -iL 继续扫描; 交回的目标源边读边写, 不载入内存"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for target in dict.fromkeys(targets):
+                f.write(target + "\n")
+                count += 1
+            for source in self._deferred:
+                try:
+                    for target in source:
+                        f.write(target + "\n")
+                        count += 1
+                except (OSError, ValueError) as e:
+                    self.logger.error("读取剩余目标失败, 保存的目标不完整: %s", e)
+        self._deferred = []
+        self.logger.warning("%d 个目标未完成扫描, 已保存到 %s (可用 -iL 继续)", count, path)
@@ -0,0 +1,57 @@
+# core/line_protocol.py
+"""协调进程与控制接口共用的 socket 服务: 每行一个 JSON 的请求/响应, 监听 TCP 端口或 Unix socket
+
+地址格式为 tcp://host:port 或 unix:///path; 服务本身没有加密, TCP 默认只允许监听本机回环地址
+"""
+import ipaddress
+import os
+import socketserver
+from typing import Optional, Tuple
+
+
+def parse_address(address: str) -> Tuple[str, object]:
+    """'tcp://host:port' -> ('tcp', (host, port)), 'unix:///path' -> ('unix', path)"""
+    if address.startswith("unix://"):
+        return "unix", address[len("unix://"):]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    host, _, port = address.rpartition(':')
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    UnixServer = None
+
+
+def create_server(address: str, handler, allow_remote: bool = False) -> Tuple[socketserver.BaseServer, Optional[str]]:
+    """按地址创建服务, 返回 (server, Unix socket 路径); TCP 监听非回环地址需要 allow_remote
+
+    :raises ValueError: 平台不支持 Unix socket, 或未允许时监听了非回环地址
+    """
+    kind, bind = parse_address(address)
+    if kind == "unix":
+        if UnixServer is None:
+            raise ValueError("当前平台不支持 Unix socket")
+        if os.path.exists(bind):
+            os.unlink(bind)
+        return UnixServer(bind, handler), bind
+    if not allow_remote and not is_loopback(bind[0]):
+        raise ValueError(f"只能监听本机回环地址: {bind[0]}")
+    return TCPServer(bind, handler), None
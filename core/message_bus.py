@@ -1,15 +1,22 @@
 # core/message_bus.py
 import queue
 import threading
+import time
 import json
 from datetime import datetime
 
+from core.tracer import get_tracer
+
 
 class MessageBus:
     def __init__(self):
         self._channels = {}
         self._lock = threading.RLock()
         self._message_counter = 0
+        self._tracer = get_tracer()
+        # 每次发布后递增并唤醒 wait_activity, 引擎在一轮没有进展时用它等待新消息, 不必逐个通道阻塞
+        self._activity = threading.Condition()
+        self._delivered = 0
         self._setup_default_channels()
         # self._channel_caller = {}
         # self._channels_callee = {}
@@ -19,7 +26,13 @@ class MessageBus:
         # self.create_channel("vuln_alerts", priority=True)
         # self.create_channel("llm_commands", persistent=True)
         self.create_channel("scan_target")
+        self.create_channel("live_targets")
         self.create_channel("scan_results")
+        self.create_channel("scan_status")
+        self.create_channel("port_results")
+        self.create_channel("vuln_alerts")
+        self.create_channel("service_results")
+        self.create_channel("web_fingerprints")
         self.create_channel("module_errors")
         self.create_channel("system_errors")
 
@@ -31,7 +44,26 @@ class MessageBus:
                 else:
                     self._channels[name] = Channel(maxsize, persistent)
 
-    def publish(self, channel, message, priority=0):
+    def register_subscriber(self, channel, subscriber):
+        """注册具名订阅者, 之后发布到该channel的每条消息都会复制给每个订阅者各一份
+        未注册时channel中的消息由所有订阅方竞争消费
+        """
+        with self._lock:
+            if channel not in self._channels:
+                self.create_channel(channel)
+            self._channels[channel].add_subscriber(subscriber)
+
+    def has_subscribers(self, channel):
+        """channel 是否有具名订阅者, 可选的通知类消息（如 scan_status）没有订阅者时不必发布"""
+        with self._lock:
+            return channel in self._channels and bool(self._channels[channel].subscribers)
+
+    def publish(self, channel, message, priority=0, block=True, timeout=None):
+        """发布消息, 返回是否已投递
+
+        block 为 False 时任一订阅者的队列已满就不投递并返回 False, 超过 timeout 秒仍没有空位时同样返回 False;
+        引擎主线程上的发布方应以非阻塞方式发布, 未投递的消息留到下一轮重试, 以免等待一个同样由主线程驱动的订阅者
+        """
         with self._lock:
             if channel not in self._channels:
                 raise ValueError(f"Channel {channel} not exists")
@@ -42,18 +74,50 @@ class MessageBus:
                 "priority": priority,
                 "data": message
             }
-            self._channels[channel].put(msg_obj)
             self._message_counter += 1
-
-    def subscribe(self, channel, timeout=5):
+            target = self._channels[channel]
+
+        # 队列满时在锁外阻塞, 只对该channel的发布方形成背压
+        with self._tracer.span("publish", "bus", channel=channel) as span:
+            delivered = target.put(msg_obj, block=block, timeout=timeout)
+            span.tag(delivered=delivered)
+        if delivered:
+            self.wake()
+        return delivered
+
+    @property
+    def delivered(self):
+        """已投递的消息数, 与 wait_activity 配合使用"""
+        return self._delivered
+
+    def wake(self):
+        """唤醒等待中的 wait_activity, 发布消息时自动调用, 取消/暂停等事件也可以调用"""
+        with self._activity:
+            self._delivered += 1
+            self._activity.notify_all()
+
+    def wait_activity(self, since, timeout):
+        """等待 delivered 相对 since 发生变化（有新消息投递）, 最多等待 timeout 秒"""
+        with self._activity:
+            return self._activity.wait_for(lambda: self._delivered != since, timeout)
+
+    def subscribe(self, channel, timeout=5, subscriber=None):
         with self._lock:
             if channel not in self._channels:
                 self.create_channel(channel)
+            target = self._channels[channel]
+
+        # 阻塞等待放在锁外, 否则等待期间其他线程无法publish
+        with self._tracer.span("subscribe", "bus", channel=channel, subscriber=subscriber) as span:
+            msg = target.get(timeout=timeout, subscriber=subscriber)
+            span.tag(hit=msg is not None)
+        return msg
 
-            try:
-                return self._channels[channel].get(timeout=timeout)
-            except queue.Empty:
-                return None
+    def drain(self, channel):
+        """不阻塞地取走 channel 中剩余的全部消息（包括各订阅者队列）, 同一条消息只返回一次, 用于结束时保存未处理的消息"""
+        with self._lock:
+            target = self._channels.get(channel)
+        return target.drain() if target is not None else []
 
     def get_module_input(self, module_name):
         """智能消息路由"""
@@ -76,27 +140,88 @@ class MessageBus:
 
 class Channel:
     def __init__(self, maxsize, persistent):
-        self.queue = queue.Queue(maxsize=maxsize)
+        self.maxsize = maxsize
+        self.queue = self._new_queue()
+        self.subscribers = {}  # 具名订阅者各自的队列
         self.persistent = persistent
         self._storage = [] if persistent else None
-
-    def put(self, item):
-        if self.persistent:
-            self._storage.append(item)
-        self.queue.put(item)
-
-    def get(self, timeout=None):
+        # 所有写入都在该条件变量的锁内进行, 取出消息时通知等待空位的发布方
+        self._space = threading.Condition()
+
+    def _new_queue(self):
+        return queue.Queue(maxsize=self.maxsize)
+
+    def _wrap(self, item):
+        return item
+
+    def _unwrap(self, item):
+        return item
+
+    def add_subscriber(self, subscriber):
+        with self._space:
+            if subscriber in self.subscribers:
+                return
+            if not self.subscribers:
+                # 第一个订阅者接管注册前已经发布的消息
+                self.subscribers[subscriber] = self.queue
+                self.queue = self._new_queue()
+            else:
+                self.subscribers[subscriber] = self._new_queue()
+
+    def put(self, item, block=True, timeout=None):
+        """复制到每个订阅者的队列（没有订阅者时放入共享队列）, 所有队列都有空位时才一起写入, 不会只送达部分订阅者
+
+        等待空位时释放锁, 不影响其他发布方; block 为 False 或等待超过 timeout 秒时返回 False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._space:
+            while True:
+                targets = list(self.subscribers.values()) or [self.queue]
+                if not any(target.full() for target in targets):
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    return False
+                self._space.wait(remaining)
+            if self.persistent:
+                self._storage.append(item)
+            for target in targets:
+                target.put_nowait(self._wrap(item))
+        return True
+
+    def _notify_space(self):
+        with self._space:
+            self._space.notify_all()
+
+    def get(self, timeout=None, subscriber=None):
+        target = self.subscribers.get(subscriber, self.queue)
         try:
-            return self.queue.get(timeout=timeout)
+            item = target.get(timeout=timeout)
         except queue.Empty:
             return None
+        self._notify_space()
+        return self._unwrap(item)
+
+    def drain(self):
+        messages = {}
+        for target in [self.queue] + list(self.subscribers.values()):
+            while True:
+                try:
+                    item = self._unwrap(target.get_nowait())
+                except queue.Empty:
+                    break
+                messages.setdefault(item.get('id'), item)
+        self._notify_space()
+        return sorted(messages.values(), key=lambda item: item.get('id', 0))
 
 
 class PriorityChannel(Channel):
-    def __init__(self, maxsize, persistent):
-        super().__init__(maxsize, persistent)
-        self.queue = queue.PriorityQueue(maxsize=maxsize)
+    def _new_queue(self):
+        return queue.PriorityQueue(maxsize=self.maxsize)
+
+    def _wrap(self, item):
+        # 使用负数实现降序排列, 同优先级按消息id先进先出
+        return -item.get('priority', 0), item.get('id', 0), item
 
-    def put(self, item):
-        priority = item.get('priority', 0)
-        super().put((-priority, item))  # 使用负数实现降序排列
\ No newline at end of file
+    def _unwrap(self, item):
+        return item[2]
\ No newline at end of file
@@ -0,0 +1,87 @@
+# core/profiler.py
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+
+
+class CProfileProfiler:
+    """对引擎主循环所在线程做确定性 profile, 结果保存为 .prof（可用 snakeviz 等工具查看）并输出前 30 项"""
+
+    def __init__(self, output: str):
+        self.output = output if output.endswith(".prof") else output + ".prof"
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> str:
+        self._profile.disable()
+        os.makedirs(os.path.dirname(self.output) or ".", exist_ok=True)
+        self._profile.dump_stats(self.output)
+        with open(os.path.splitext(self.output)[0] + ".txt", 'w', encoding='utf-8') as f:
+            pstats.Stats(self._profile, stream=f).sort_stats("cumulative").print_stats(30)
+        return self.output
+
+
+class SamplingProfiler:
+    """定时采样所有线程的调用栈, 开销与程序本身的调用次数无关, 适合长时间运行的扫描
+
+    输出为 flamegraph 的折叠栈格式（每行 “线程;函数;函数 次数”）, 可直接交给 flamegraph.pl 或 speedscope
+    """
+
+    def __init__(self, output: str, interval: float = 0.005):
+        self.output = output if output.endswith(".folded") else output + ".folded"
+        self.interval = interval
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling_profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        os.makedirs(os.path.dirname(self.output) or ".", exist_ok=True)
+        with open(self.output, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return self.output
+
+
+PROFILERS = {
+    'cprofile': CProfileProfiler,
+    'sampling': SamplingProfiler,
+}
+
+
+def create_profiler(kind: Optional[str], output: str, interval: float = 0.005):
+    """kind 为 none/空 时返回 None"""
+    if not kind or kind == 'none':
+        return None
+    if kind not in PROFILERS:
+        raise ValueError(f"不支持的profiler类型: {kind}")
+    if kind == 'sampling':
+        return SamplingProfiler(output, interval)
+    return CProfileProfiler(output)
@@ -0,0 +1,257 @@
+# core/rate_limiter.py
+"""全局分层令牌桶限速与暂停
+
+所有向目标发出流量的地方（存活探测、横幅抓取、HTTP 检测、nmap）都从同一个 RateLimiter 取令牌,
+一个请求/连接需要同时从三层令牌桶各取一个令牌:
+- campaign: 整次扫描的总速率
+- network: 同一网段（IPv4 默认 /24, IPv6 默认 /64）的速率
+- host: 单个主机的速率
+
+令牌不足时按缺口最大的一层计算等待时间, 到时再重新检查, 不会提前占用其他层的令牌, 各层都能跑满到上限;
+nmap 这类自行发包的工具无法逐包取令牌, 改为按主机预留一部分速率（reserve_rate）作为 --max-rate,
+预留期间各层令牌的补充速率相应减少, 总流量仍不超过上限
+
+暂停（pause）时所有取令牌和启动子进程的操作都在入口处等待, 已经在进行中的请求和子进程不受影响
+"""
+import asyncio
+import ipaddress
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from core.cancellation import CancellationToken, CancelledError
+
+
+class TokenBucket:
+    """rate 为每秒补充的令牌数, burst 为桶容量; reserved 是被 reserve_rate 占用的补充速率"""
+
+    __slots__ = ("rate", "burst", "tokens", "reserved", "updated")
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.tokens = self.burst
+        self.reserved = 0.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * max(self.rate - self.reserved, 0.0))
+        self.updated = now
+
+    def deficit_time(self, n: float) -> float:
+        """令牌足够 n 个还需要等待的秒数; n 超过桶容量时等到桶满即可, 超出部分记为欠账"""
+        n = min(n, self.burst)
+        if self.tokens >= n:
+            return 0.0
+        rate = self.rate - self.reserved
+        return (n - self.tokens) / rate if rate > 0 else float('inf')
+
+    @property
+    def idle(self) -> bool:
+        return self.tokens >= self.burst and not self.reserved
+
+
+class RateLimiter:
+    """进程内共享的分层令牌桶, 由引擎按 config.yaml 的 rate_limit 段配置, 未开启时只提供暂停功能"""
+
+    # 暂停或某一层的令牌补充速率被预留占满时, 重新检查的间隔
+    POLL_INTERVAL = 0.2
+
+    def __init__(self):
+        self.enabled = False
+        self._levels: Dict[str, Dict] = {}
+        self._campaign: Optional[TokenBucket] = None
+        self._networks: Dict[str, TokenBucket] = {}
+        self._hosts: Dict[str, TokenBucket] = {}
+        self.reserve_share = 0.8
+        self.max_buckets = 65536
+        self.ipv4_prefix = 24
+        self.ipv6_prefix = 64
+        self.cancel_token = CancellationToken()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._lock = threading.Lock()
+        self.stats = {'acquired': 0, 'throttled': 0, 'wait_s': 0.0, 'reserved': 0}
+
+    def configure(self, config: Dict, cancel_token: Optional[CancellationToken] = None) -> None:
+        """
+        :param config: rate_limit 配置, campaign/network/host 各层的 rate 为每秒请求（nmap 为发包）数, 为空表示不限制
+        :param cancel_token: 引擎的取消令牌, 取消后等待中的调用抛出 CancelledError
+        """
+        with self._lock:
+            self.enabled = bool(config.get('enable', False))
+            self._levels = {level: config.get(level) or {} for level in ('campaign', 'network', 'host')}
+            self._levels = {level: value for level, value in self._levels.items() if value.get('rate')}
+            campaign = self._levels.get('campaign')
+            self._campaign = TokenBucket(campaign['rate'], campaign.get('burst')) if campaign else None
+            self._networks.clear()
+            self._hosts.clear()
+            self.ipv4_prefix = self._levels.get('network', {}).get('prefix', 24)
+            self.ipv6_prefix = self._levels.get('network', {}).get('ipv6_prefix', 64)
+            self.reserve_share = config.get('reserve_share', 0.8)
+            self.max_buckets = config.get('max_buckets', 65536)
+            if cancel_token is not None:
+                self.cancel_token = cancel_token
+        self.resume()
+
+    # region 暂停
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    def pause(self) -> None:
+        self._resumed.clear()
+
+    def resume(self) -> None:
+        self._resumed.set()
+
+    def wait_resumed(self) -> None:
+        """暂停期间阻塞, 取消时抛出 CancelledError"""
+        while not self._resumed.wait(self.POLL_INTERVAL):
+            self.cancel_token.raise_if_cancelled()
+        self.cancel_token.raise_if_cancelled()
+    # endregion
+
+    # region 令牌桶
+    def _network_key(self, host: str) -> str:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            # 主机名不解析, 单独作为一个网段
+            return host
+        prefix = self.ipv4_prefix if address.version == 4 else self.ipv6_prefix
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+    def _bucket(self, table: Dict[str, TokenBucket], level: str, key: str) -> TokenBucket:
+        bucket = table.get(key)
+        if bucket is None:
+            if len(table) >= self.max_buckets:
+                self._prune(table)
+            config = self._levels[level]
+            bucket = table[key] = TokenBucket(config['rate'], config.get('burst'))
+        return bucket
+
+    @staticmethod
+    def _prune(table: Dict[str, TokenBucket]) -> None:
+        """已经补满且没有预留的桶与新建的桶等价, 可以丢弃"""
+        now = time.monotonic()
+        for key, bucket in list(table.items()):
+            bucket.refill(now)
+            if bucket.idle:
+                del table[key]
+
+    def _buckets_for(self, host: str) -> List[TokenBucket]:
+        buckets = []
+        if self._campaign is not None:
+            buckets.append(self._campaign)
+        if 'network' in self._levels:
+            buckets.append(self._bucket(self._networks, 'network', self._network_key(host)))
+        if 'host' in self._levels:
+            buckets.append(self._bucket(self._hosts, 'host', host))
+        return buckets
+
+    def try_acquire(self, host: str, n: float = 1) -> float:
+        """各层令牌都足够时一起取走并返回 0, 否则不取任何令牌, 返回需要等待的秒数"""
+        with self._lock:
+            buckets = self._buckets_for(host)
+            now = time.monotonic()
+            wait = 0.0
+            for bucket in buckets:
+                bucket.refill(now)
+                wait = max(wait, bucket.deficit_time(n))
+            if wait > 0:
+                # 补充速率被预留占满时无法预计等待时间, 定时重新检查
+                return self.POLL_INTERVAL if wait == float('inf') else wait
+            for bucket in buckets:
+                bucket.tokens -= n
+            self.stats['acquired'] += 1
+            return 0.0
+
+    def acquire(self, host: str, n: float = 1) -> None:
+        """阻塞直到可以向 host 发出 n 个请求, 供线程中的同步调用使用"""
+        throttled = False
+        while True:
+            self.wait_resumed()
+            if not self.enabled:
+                return
+            wait = self.try_acquire(host, n)
+            if wait <= 0:
+                return
+            if not throttled:
+                throttled = True
+                self.stats['throttled'] += 1
+            self.stats['wait_s'] += wait
+            if self.cancel_token.wait(wait):
+                raise CancelledError(self.cancel_token.reason)
+
+    async def acquire_async(self, host: str, n: float = 1) -> None:
+        """acquire 的 asyncio 版本, 等待期间不占用事件循环"""
+        throttled = False
+        while True:
+            while self.paused:
+                await asyncio.sleep(self.POLL_INTERVAL)
+            if not self.enabled:
+                return
+            wait = self.try_acquire(host, n)
+            if wait <= 0:
+                return
+            if not throttled:
+                throttled = True
+                self.stats['throttled'] += 1
+            self.stats['wait_s'] += wait
+            await asyncio.sleep(wait)
+
+    @contextmanager
+    def reserve_rate(self, host: str, rate: Optional[float] = None) -> Iterator[Optional[float]]:
+        """为自行控制发包速率的工具预留 host 所在各层的一部分补充速率, 返回实际分配的速率
+
+        每层所有预留之和不超过该层速率的 reserve_share, 剩余部分留给逐个取令牌的请求;
+        没有可分配的速率时等待其他预留释放. 限速未开启时原样返回 rate
+        """
+        self.wait_resumed()
+        if not self.enabled:
+            yield rate
+            return
+
+        while True:
+            with self._lock:
+                buckets = self._buckets_for(host)
+                free = min((bucket.rate * self.reserve_share - bucket.reserved for bucket in buckets), default=None)
+                granted = rate if free is None else free if rate is None else min(rate, free)
+                if granted is None or granted >= 1:
+                    now = time.monotonic()
+                    if granted is not None:
+                        granted = int(granted)
+                        for bucket in buckets:
+                            bucket.refill(now)
+                            bucket.reserved += granted
+                    self.stats['reserved'] += 1
+                    break
+            if self.cancel_token.wait(self.POLL_INTERVAL):
+                raise CancelledError(self.cancel_token.reason)
+            self.wait_resumed()
+
+        try:
+            yield granted
+        finally:
+            if granted is not None:
+                with self._lock:
+                    now = time.monotonic()
+                    for bucket in buckets:
+                        bucket.refill(now)
+                        bucket.reserved -= granted
+
+    # endregion
+
+    def format_summary(self) -> str:
+        return ("限速: 取令牌 %(acquired)d 次, 其中 %(throttled)d 次需要等待(累计 %(wait_s).1f 秒), "
+                "速率预留 %(reserved)d 次") % self.stats
+
+
+_rate_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """进程内共享的限速器"""
+    return _rate_limiter
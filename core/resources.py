@@ -0,0 +1,234 @@
+# core/resources.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块, 只统计墙钟时间和管道字节数
+    resource = None
+
+_PROC_ROOT = "/proc"
+
+
+class ResourceUsage:
+    """一组调用或子进程累计的资源占用"""
+
+    __slots__ = ("calls", "wall_s", "cpu_user_s", "cpu_sys_s", "peak_rss_kb", "max_fds", "pipe_bytes")
+
+    def __init__(self, calls=0, wall_s=0.0, cpu_user_s=0.0, cpu_sys_s=0.0, peak_rss_kb=0, max_fds=0, pipe_bytes=0):
+        self.calls = calls
+        self.wall_s = wall_s
+        self.cpu_user_s = cpu_user_s
+        self.cpu_sys_s = cpu_sys_s
+        self.peak_rss_kb = peak_rss_kb
+        self.max_fds = max_fds
+        self.pipe_bytes = pipe_bytes
+
+    def add(self, other: "ResourceUsage") -> None:
+        self.calls += other.calls
+        self.wall_s += other.wall_s
+        self.cpu_user_s += other.cpu_user_s
+        self.cpu_sys_s += other.cpu_sys_s
+        self.peak_rss_kb = max(self.peak_rss_kb, other.peak_rss_kb)
+        self.max_fds = max(self.max_fds, other.max_fds)
+        self.pipe_bytes += other.pipe_bytes
+
+    def to_dict(self) -> Dict:
+        return {slot: round(getattr(self, slot), 6) if isinstance(getattr(self, slot), float) else getattr(self, slot)
+                for slot in self.__slots__}
+
+
+def count_fds(pid: Optional[int] = None) -> int:
+    """进程当前打开的文件描述符数量, 无法读取 /proc 时返回 0"""
+    try:
+        return len(os.listdir(f"{_PROC_ROOT}/{pid or 'self'}/fd"))
+    except OSError:
+        return 0
+
+
+def read_peak_rss(pid: int) -> int:
+    """从 /proc/<pid>/status 读取 VmHWM（exec 之后的峰值内存, KB）, 读取失败返回 0"""
+    try:
+        with open(f"{_PROC_ROOT}/{pid}/status", 'rb') as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def wait_child(process) -> Tuple[int, Optional[object]]:
+    """回收子进程并取得它自己的 rusage（os.wait4）, 不支持时退回 Popen.wait
+
+    :return: (返回码, rusage 或 None)
+    """
+    if hasattr(os, "wait4") and process.returncode is None:
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            return process.wait(), None
+        # 进程已被回收, 把返回码写回 Popen, 之后的 wait/poll 直接使用它
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return process.returncode, usage
+    return process.wait(), None
+
+
+class ChildProbe:
+    """跟踪单个子进程: 运行期间按需采样文件描述符和峰值内存, 回收时取得 CPU 时间
+
+    wait4 的 ru_maxrss 会把 fork 后、exec 前继承的父进程内存也算进去, 所以峰值内存优先使用
+    /proc 中采样到的 VmHWM, 进程太短没有采样到时才使用 ru_maxrss
+    """
+
+    def __init__(self, process, started: Optional[float] = None, sample_interval: float = 1.0):
+        self.process = process
+        self.sample_interval = sample_interval
+        self.started = started or time.perf_counter()
+        self.usage = ResourceUsage(calls=1)
+        self._next_sample = 0.0
+
+    def on_output(self, size: int) -> None:
+        """每读到一段输出时调用, 累计管道字节数, 并按间隔采样文件描述符和峰值内存"""
+        self.usage.pipe_bytes += size
+        now = time.perf_counter()
+        if now >= self._next_sample:
+            self._next_sample = now + self.sample_interval
+            self._sample()
+
+    def _sample(self) -> None:
+        self.usage.max_fds = max(self.usage.max_fds, count_fds(self.process.pid))
+        self.usage.peak_rss_kb = max(self.usage.peak_rss_kb, read_peak_rss(self.process.pid))
+
+    def reap(self) -> int:
+        self._sample()
+        returncode, rusage = wait_child(self.process)
+        self.usage.wall_s = time.perf_counter() - self.started
+        if rusage is not None:
+            self.usage.cpu_user_s = rusage.ru_utime
+            self.usage.cpu_sys_s = rusage.ru_stime
+            if not self.usage.peak_rss_kb:
+                self.usage.peak_rss_kb = rusage.ru_maxrss
+        return returncode
+
+
+class ResourceAccounting:
+    """按模块和目标汇总资源占用
+
+    - 引擎主循环中每次调用模块的 waitMessage/execute/waitOutput 记为该模块的主线程开销（按模块汇总）
+    - ThreadManager 启动的工作线程结束时记录线程 CPU 时间（按模块汇总）
+    - 适配器子进程回收时记录 CPU/峰值内存/文件描述符/管道字节（按适配器和目标汇总）
+    """
+
+    def __init__(self, enabled: bool = True, max_targets: int = 100000):
+        """
+        :param max_targets: 按目标汇总的条目上限, 超过后新目标只计入模块汇总, 避免长时间运行时无限增长
+        """
+        self.enabled = enabled
+        self.max_targets = max_targets
+        self._modules: Dict[str, ResourceUsage] = {}
+        self._targets: Dict[Tuple[str, str], ResourceUsage] = {}
+        self._running_children = 0
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def record(self, owner: str, usage: ResourceUsage, target: Optional[str] = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._modules.setdefault(owner, ResourceUsage()).add(usage)
+            if target is not None:
+                key = (owner, target)
+                if key in self._targets or len(self._targets) < self.max_targets:
+                    self._targets.setdefault(key, ResourceUsage()).add(usage)
+
+    @contextmanager
+    def track(self, owner: str):
+        """统计代码块在当前线程中的墙钟时间和 CPU 时间"""
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(owner, ResourceUsage(calls=1,
+                                             wall_s=time.perf_counter() - wall,
+                                             cpu_user_s=time.thread_time() - cpu))
+
+    @contextmanager
+    def track_child(self, owner: str, process, target: Optional[str] = None, started: Optional[float] = None):
+        """跟踪一个子进程, 代码块中需要调用 probe.on_output 和 probe.reap
+
+        :param started: 启动子进程前的 time.perf_counter(), 使墙钟时间包含进程创建的开销
+        """
+        probe = ChildProbe(process, started)
+        with self._lock:
+            self._running_children += 1
+        try:
+            yield probe
+        finally:
+            with self._lock:
+                self._running_children -= 1
+            self.record(owner, probe.usage, target)
+
+    def process_usage(self) -> Dict:
+        """引擎进程自身的资源占用, 用于发现长时间运行中的内存或文件描述符泄漏"""
+        usage = {
+            'wall_s': round(time.perf_counter() - self._started, 3),
+            'threads': threading.active_count(),
+            'open_fds': count_fds(),
+            'running_children': self._running_children,
+        }
+        if resource is not None:
+            own = resource.getrusage(resource.RUSAGE_SELF)
+            children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            usage.update({
+                'cpu_user_s': round(own.ru_utime, 3),
+                'cpu_sys_s': round(own.ru_stime, 3),
+                'peak_rss_kb': own.ru_maxrss,
+                'children_cpu_s': round(children.ru_utime + children.ru_stime, 3),
+                'children_peak_rss_kb': children.ru_maxrss,
+            })
+        return usage
+
+    def summary(self) -> Dict:
+        with self._lock:
+            modules = {owner: usage.to_dict() for owner, usage in self._modules.items()}
+            targets = {f"{owner} {target}": usage.to_dict() for (owner, target), usage in self._targets.items()}
+        return {'process': self.process_usage(), 'modules': modules, 'targets': targets}
+
+    def format_summary(self, top_targets: int = 10) -> str:
+        """引擎结束时输出的文本汇总"""
+        summary = self.summary()
+        lines = ["资源占用汇总:"]
+        lines.append("  进程: " + ", ".join(f"{key}={value}" for key, value in summary['process'].items()))
+        lines.append(f"  {'模块':24s} {'调用':>8s} {'墙钟(s)':>10s} {'CPU(s)':>10s} {'峰值RSS(KB)':>12s} {'fd':>5s} {'管道字节':>12s}")
+        for owner, usage in sorted(summary['modules'].items(), key=lambda item: -item[1]['wall_s']):
+            lines.append(f"  {owner:24s} {usage['calls']:8d} {usage['wall_s']:10.3f} "
+                         f"{usage['cpu_user_s'] + usage['cpu_sys_s']:10.3f} {usage['peak_rss_kb']:12d} "
+                         f"{usage['max_fds']:5d} {usage['pipe_bytes']:12d}")
+        slowest = sorted(summary['targets'].items(), key=lambda item: -item[1]['wall_s'])[:top_targets]
+        if slowest:
+            lines.append("  耗时最长的目标:")
+            for key, usage in slowest:
+                lines.append(f"    {key:40s} 墙钟 {usage['wall_s']:.3f}s CPU "
+                             f"{usage['cpu_user_s'] + usage['cpu_sys_s']:.3f}s 峰值RSS {usage['peak_rss_kb']}KB")
+        return "\n".join(lines)
+
+    def export(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+
+
+_accounting = ResourceAccounting()
+
+
+def get_accounting() -> ResourceAccounting:
+    """进程内共享的资源统计"""
+    return _accounting
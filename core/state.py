@@ -14,7 +14,7 @@ class StateMachine:
     _transitions = {
         EngineState.INIT: [EngineState.RUNNING, EngineState.ERROR],
         EngineState.RUNNING: [EngineState.PAUSED, EngineState.ERROR, EngineState.COMPLETED],
-        EngineState.PAUSED: [EngineState.RUNNING, EngineState.ERROR],
+        EngineState.PAUSED: [EngineState.RUNNING, EngineState.ERROR, EngineState.COMPLETED],
         EngineState.ERROR: [EngineState.INIT],
         EngineState.COMPLETED: []
     }
@@ -1,24 +1,65 @@
 import threading
+import time
+from typing import List, Optional
+
+from core.cancellation import CancellationToken, CancelledError
+from core.resources import get_accounting
+from utils.logger import get_logger
 
 
 class ThreadManager:
-    def __init__(self):
+    def __init__(self, cancel_token: Optional[CancellationToken] = None):
+        """
+        :param cancel_token: 引擎的取消令牌, 模块通过 thread_manager.cancel_token 取得并传给适配器
+        """
         self.threadList = []
+        self.cancel_token = cancel_token or CancellationToken()
+        self.logger = get_logger("ThreadManager")
 
-    def addProcess(self, func, threadName, args=(), kwargs=None):
+    def addProcess(self, func, threadName, args=(), kwargs=None, owner=None):
+        """
+        :param owner: 线程所属的模块名, 线程结束时CPU时间计入该模块, 默认使用线程名
+        :return: 线程对象, 线程结束后 thread.error 为 func 抛出的异常（正常结束或被取消时为 None）
+        """
         if kwargs is None:
             kwargs = {}
         # self.checkAlive()
-        thread = threading.Thread(target=func, name=threadName, args=args, kwargs=kwargs)
+        accounting = get_accounting()
+
+        def run(*run_args, **run_kwargs):
+            with accounting.track(owner or threadName):
+                try:
+                    return func(*run_args, **run_kwargs)
+                except CancelledError:
+                    # 取消导致的中止是正常退出
+                    pass
+                except Exception as e:
+                    # 发起线程的模块在线程结束后读取, 据此报告目标失败
+                    thread.error = e
+                    raise
+
+        # 守护线程: 取消后在期限内没有退出的线程不会阻止进程结束
+        thread = threading.Thread(target=run, name=threadName, args=args, kwargs=kwargs, daemon=True)
+        thread.error = None
         thread.start()
         self.threadList.append(thread)
         return thread
 
     def checkAlive(self):
-        for process in self.threadList:
-            if not process.is_alive():
-                self.threadList.remove(process)
+        self.threadList = [process for process in self.threadList if process.is_alive()]
+
+    def cleanup(self, timeout: float = 10.0) -> List[threading.Thread]:
+        """触发取消并在 timeout 秒内等待所有线程结束, 返回仍未结束的线程
 
-    def cleanup(self):
+        Python 线程无法被强制终止, 线程需要响应 cancel_token（或其子进程/事件循环被取消回调释放）后自行退出
+        """
+        self.cancel_token.cancel(self.cancel_token.reason or "线程管理器清理")
+        deadline = time.monotonic() + timeout
         for process in self.threadList:
-            process.terminate()
+            if process is not threading.current_thread():
+                process.join(max(0.0, deadline - time.monotonic()))
+        self.checkAlive()
+        if self.threadList:
+            self.logger.warning("%d 个线程未在 %.1f 秒内结束: %s", len(self.threadList), timeout,
+                                ", ".join(process.name for process in self.threadList))
+        return self.threadList
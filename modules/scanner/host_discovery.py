@@ -0,0 +1,217 @@
+# modules/scanner/host_discovery.py
+import asyncio
+import errno
+import threading
+from typing import Dict, Iterator, List, Optional, Set
+
+from core.message_bus import MessageBus
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+from utils.targets import count_addresses, expand_target, range_after
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块, 不按 fd 上限收紧
+    resource = None
+
+# 本进程或系统的 fd/缓冲区暂时用尽, 说明不了主机是否在线, 等待后重试
+_RESOURCE_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.EAGAIN}
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return HostDiscovery("scanner",
+                         "host_discovery",
+                         ["scan_target"],
+                         message_bus,
+                         thread_manager)
+
+
+class HostDiscovery(BaseModule):
+    """端口扫描前的存活探测, 只把有响应的主机转发到 live_targets, 由 PortScanner 继续扫描
+
+    对每个地址并发向几个常用端口发起 TCP 连接, 任一端口连接成功或被拒绝（RST）即视为在线;
+    目标中的 CIDR 和地址范围在事件循环中边展开边探测, 同时处理的地址不超过 concurrency 个（包括等待发布的在线主机）,
+    同时打开的 socket 不超过 max_sockets 个, 并且不超过 fd 软上限的一半;
+    取消时正在展开的每个网段剩余的地址范围和还没处理完的地址都由 pending_targets 交给引擎保存
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.ports: List[int] = self._config.get("ports", [80, 443, 22, 445, 3389, 8080])
+        self.timeout = self._config.get("timeout", 1.0)
+        self.concurrency = self._config.get("concurrency", 512)
+        self.max_sweeps = self._config.get("max_sweeps", 4)  # 同时展开的目标（网段）数
+        self.max_sockets = self._socket_limit(self._config.get("max_sockets", 1024))
+        self.retries = self._config.get("resource_retries", 5)  # fd/缓冲区不足时的重试次数
+
+        self._sweeps = 0
+        self._active: List[Dict[str, Optional[str]]] = []  # 正在展开的目标及最后取出的地址
+        self._probing: Set[str] = set()  # 已从目标中取出、还没探测并发布完的地址
+        self._lock = threading.Lock()
+        self._semaphore = None
+        self._sockets = None
+        self.stats = {'probed': 0, 'alive': 0, 'errors': 0}
+        self.loop = asyncio.new_event_loop()
+        self.thread = self.thread_manager.addProcess(self._run_loop, "Host discovery loop", owner=self.name)
+
+    @staticmethod
+    def _socket_limit(configured: int) -> int:
+        """同时打开的 socket 数, 另一半 fd 留给总线、结果库、nmap 管道和横幅抓取"""
+        if resource is None:
+            return configured
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft == resource.RLIM_INFINITY:
+            return configured
+        return max(1, min(configured, soft // 2))
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        # 取消时立即停止事件循环, 不必等到引擎清理到本模块
+        handle = self.cancel_token.register(lambda: self.loop.call_soon_threadsafe(self.loop.stop))
+        try:
+            self.loop.run_forever()
+            # 取消未完成的连接, 让它们关闭 socket 后再关闭事件循环
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            self.cancel_token.unregister(handle)
+            self.loop.close()
+
+    def execute(self) -> bool:
+        """把目标交给事件循环展开探测, 正在展开的网段过多时返回 False 等待下一轮"""
+        target = self.data.get('data', self.data).get('ip')
+        if not target:
+            return True
+
+        with self._lock:
+            if self._sweeps >= self.max_sweeps:
+                return False
+            self._sweeps += 1
+            # 在这里登记, 协程还没开始运行就被取消时目标也不会丢失
+            sweep = {'target': target, 'last': None}
+            self._active.append(sweep)
+        self.logger.info("存活探测 %s (%d 个地址)", target, count_addresses(target))
+        asyncio.run_coroutine_threadsafe(self._sweep(sweep, expand_target(target)), self.loop)
+        return True
+
+    def waitOutput(self) -> bool:
+        """探测在事件循环中异步进行, 结果由协程直接发布, 这里立即回到等待状态"""
+        return True
+
+    async def _sweep(self, sweep: Dict[str, Optional[str]], addresses: Iterator[str]) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._sockets = asyncio.Semaphore(self.max_sockets)
+        tasks = set()
+        try:
+            # 先取得信号量再取下一个地址, 未探测的地址始终留在生成器中
+            for address in addresses:
+                with self._lock:
+                    sweep['last'] = address
+                    self._probing.add(address)
+                await self._semaphore.acquire()
+                task = self.loop.create_task(self._check(address))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except Exception as e:
+            self.logger.warning("存活探测 %s 失败: %s", sweep['target'], e)
+        finally:
+            with self._lock:
+                self._sweeps -= 1
+                # 取消时保留进度, 由 pending_targets 交给引擎保存
+                if not self.cancel_token.cancelled:
+                    self._active.remove(sweep)
+
+    async def _check(self, address: str) -> None:
+        # 发布完成后才释放名额: 下游队列已满时探测随之暂停, 等待发布的主机数不会超过 concurrency
+        try:
+            try:
+                alive = await self._is_alive(address)
+            except OSError as e:
+                self.stats['errors'] += 1
+                self.logger.warning("存活探测 %s 失败: %s", address, e)
+                if self._message_bus.has_subscribers("scan_status"):
+                    await self.loop.run_in_executor(None, self.publish_message, "scan_status",
+                                                    {'ip': address, 'status': 'failed', 'ports': 0, 'error': str(e)})
+                return
+            self.stats['probed'] += 1
+            if alive:
+                self.stats['alive'] += 1
+                # 与 main.py 发布初始目标的格式一致; 发布可能因下游队列已满而阻塞, 放到线程池中执行
+                await self.loop.run_in_executor(None, self._message_bus.publish, "live_targets", {'ip': address})
+            elif self._message_bus.has_subscribers("scan_status"):
+                # 不在线的主机不会经过 PortScanner, 由这里通知该目标已处理完（分布式 worker 据此归还租约）
+                await self.loop.run_in_executor(None, self.publish_message, "scan_status",
+                                                {'ip': address, 'status': 'down', 'ports': 0})
+        finally:
+            self._semaphore.release()
+            if not self.cancel_token.cancelled:
+                with self._lock:
+                    self._probing.discard(address)
+
+    async def _is_alive(self, address: str) -> bool:
+        """并发连接各探测端口, 第一个有响应的端口返回后取消其余连接"""
+        probes = [self.loop.create_task(self._ping(address, port)) for port in self.ports]
+        error = None
+        try:
+            for probe in asyncio.as_completed(probes):
+                try:
+                    if await probe:
+                        return True
+                except OSError as e:
+                    error = e
+            # 有端口因资源不足没能探测时无法断定主机不在线
+            if error is not None:
+                raise error
+            return False
+        finally:
+            for probe in probes:
+                probe.cancel()
+
+    async def _ping(self, address: str, port: int) -> bool:
+        """连接一个端口; fd 或缓冲区不足时退避重试, 重试用尽后抛出 OSError, 不把主机当作不在线"""
+        for attempt in range(self.retries + 1):
+            await self.rate_limiter.acquire_async(address)
+            async with self._sockets:
+                try:
+                    _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), self.timeout)
+                except (ConnectionRefusedError, ConnectionResetError):
+                    # 连接被拒绝/重置说明主机在线, 只是端口没有开放
+                    return True
+                except asyncio.TimeoutError:
+                    return False
+                except OSError as e:
+                    if e.errno not in _RESOURCE_ERRNOS:
+                        return False
+                    if attempt == self.retries:
+                        raise
+                else:
+                    writer.close()
+                    return True
+            await asyncio.sleep(min(0.1 * 2 ** attempt, 2))
+        return False
+
+    def pending_targets(self) -> List[str]:
+        """除了还没开始展开的目标, 还包括每个正在展开的目标剩余的地址范围和取出后没有处理完的地址"""
+        targets = super().pending_targets()
+        with self._lock:
+            targets += sorted(self._probing)
+            for sweep in self._active:
+                rest = range_after(sweep['target'], sweep['last'])
+                if rest:
+                    targets.append(rest)
+        return targets
+
+    def cleanup(self) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        except RuntimeError:
+            # 取消时事件循环已经停止并关闭
+            pass
+        self.thread = None
+        self.logger.info("存活探测: 探测 %(probed)d 个地址, 在线 %(alive)d 个, 资源不足未能探测 %(errors)d 个", self.stats)
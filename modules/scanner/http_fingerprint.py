@@ -0,0 +1,201 @@
+# modules/scanner/http_fingerprint.py
+import base64
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import urljoin
+
+import yaml
+
+from core.message_bus import MessageBus
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+from utils.http_client import get_http_client
+from utils.multi_pattern import MultiPatternMatcher
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return HttpFingerprint("scanner",
+                           "http_fingerprint",
+                           ["scan_results"],
+                           message_bus,
+                           thread_manager)
+
+
+WEB_PORTS = {80, 81, 443, 8000, 8008, 8080, 8081, 8443, 8888}
+
+_TITLE_PATTERN = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_ICON_PATTERN = re.compile(rb"<link[^>]+rel=[\"']?[^\"'>]*icon[^>]*>", re.IGNORECASE)
+_HREF_PATTERN = re.compile(rb"href=[\"']?([^\"' >]+)", re.IGNORECASE)
+
+
+def favicon_hash(content: bytes) -> int:
+    """favicon 哈希, 与 shodan 的 http.favicon.hash 一致: mmh3(base64.encodebytes(content))"""
+    return _murmur3_32(base64.encodebytes(content))
+
+
+def _murmur3_32(data: bytes, seed: int = 0) -> int:
+    """MurmurHash3 x86 32位, 返回有符号整数（与 mmh3.hash 相同）"""
+    c1, c2, mask = 0xcc9e2d51, 0x1b873593, 0xffffffff
+    length = len(data)
+    h = seed
+    rounded_end = length & ~3
+
+    for i in range(0, rounded_end, 4):
+        k = int.from_bytes(data[i:i + 4], 'little')
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
+        h = ((h << 13) | (h >> 19)) & mask
+        h = (h * 5 + 0xe6546b64) & mask
+
+    k = 0
+    tail = length & 3
+    if tail == 3:
+        k ^= data[rounded_end + 2] << 16
+    if tail >= 2:
+        k ^= data[rounded_end + 1] << 8
+    if tail >= 1:
+        k ^= data[rounded_end]
+        k = (k * c1) & mask
+        k = ((k << 15) | (k >> 17)) & mask
+        k = (k * c2) & mask
+        h ^= k
+
+    h ^= length
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & mask
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & mask
+    h ^= h >> 16
+    return h - 0x100000000 if h & 0x80000000 else h
+
+
+class HttpFingerprint(BaseModule):
+    """对 http(s) 端口批量抓取首页、标题、响应头和 favicon, 计算指纹后发布到 web_fingerprints
+
+    请求都经过共享 HttpClient 的 get_cached, 后续检测请求相同页面时直接复用缓存
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.timeout = self._config.get("timeout", 5)
+        self.max_workers = self._config.get("max_workers", 32)
+        self.max_queued = self._config.get("max_queued", 1000)
+        self.max_body = self._config.get("max_body", 65536)  # 参与指纹匹配的正文长度
+
+        with open(self._config.get("signatures", "config/web_signatures.yaml"), encoding='utf-8') as f:
+            signatures = yaml.safe_load(f) or {}
+        self.tech_matcher = MultiPatternMatcher(
+            (item['keyword'], item['tech']) for item in signatures.get('technologies', [])
+        )
+        self.favicons: Dict[int, str] = {int(k): v for k, v in (signatures.get('favicons') or {}).items()}
+
+        self.client = get_http_client()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="http_fingerprint")
+        # 每个主机已提交的端口和未完成的任务数, 该主机的任务全部完成后清除去重记录, 内存不随扫描的主机数增长
+        self._seen: Dict[str, set] = {}
+        self._active: Dict[str, int] = {}
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_web(finding: Dict) -> bool:
+        port = str(finding.get('port', '')).split('/')[0]
+        return 'http' in finding.get('service', '') or (port.isdigit() and int(port) in WEB_PORTS)
+
+    @staticmethod
+    def _build_url(finding: Dict) -> str:
+        port = finding['port'].split('/')[0]
+        scheme = "https" if "https" in finding['service'] or port in ("443", "8443") else "http"
+        return f"{scheme}://{finding['ip']}:{port}/"
+
+    def execute(self) -> bool:
+        """提交指纹任务, 主机的任务完成前重复的端口不再提交, 排队任务过多时返回 False 等待下一轮"""
+        finding = self.data.get('data', self.data)
+        if finding.get('state') != 'open' or not self._is_web(finding):
+            return True
+
+        host = finding.get('ip')
+        with self._lock:
+            if finding.get('port') in self._seen.get(host, ()):
+                return True
+            if self._queued >= self.max_queued:
+                return False
+            self._seen.setdefault(host, set()).add(finding.get('port'))
+            self._active[host] = self._active.get(host, 0) + 1
+            self._queued += 1
+        self.executor.submit(self._fingerprint, finding)
+        return True
+
+    def waitOutput(self) -> bool:
+        """指纹任务在线程池中执行, 结果由工作线程直接发布, 这里立即回到等待状态"""
+        return True
+
+    def _fingerprint(self, finding: Dict) -> None:
+        url = self._build_url(finding)
+        try:
+            response = self.client.get_cached(url, max_body=self.max_body, timeout=self.timeout,
+                                              allow_redirects=True)
+            body = response.content[:self.max_body]
+            header_text = "\n".join(f"{k}: {v}" for k, v in response.headers.items())
+
+            match = _TITLE_PATTERN.search(body)
+            title = match.group(1).decode(response.encoding or 'utf-8', errors='replace').strip() if match else ""
+
+            icon_hash = self._favicon_hash(response.url, body)
+            tech = self.tech_matcher.find(header_text + "\n" + body.decode('utf-8', errors='replace'))
+            if icon_hash in self.favicons:
+                tech.add(self.favicons[icon_hash])
+
+            self.publish_message(
+                channel="web_fingerprints",
+                data={
+                    'ip': finding['ip'],
+                    'port': finding['port'],
+                    'service': finding['service'],
+                    'scan_service': finding.get('scan_service', finding['service']),
+                    'url': response.url,
+                    'status': response.status_code,
+                    'title': title,
+                    'server': response.headers.get('Server', ''),
+                    'favicon_hash': icon_hash,
+                    'tech': sorted(tech),
+                    'banner': header_text
+                },
+                priority=1
+            )
+        except Exception as e:
+            self.logger.warning("http指纹识别失败 %s: %s", url, e)
+        finally:
+            with self._lock:
+                self._queued -= 1
+                host = finding.get('ip')
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+                    self._seen.pop(host, None)
+
+    def _favicon_hash(self, page_url: str, body: bytes) -> Optional[int]:
+        """优先使用页面中 <link rel="icon"> 声明的地址, 否则取 /favicon.ico"""
+        icon_url = urljoin(page_url, "/favicon.ico")
+        link = _ICON_PATTERN.search(body)
+        if link:
+            href = _HREF_PATTERN.search(link.group(0))
+            if href:
+                icon_url = urljoin(page_url, href.group(1).decode('utf-8', errors='replace'))
+        try:
+            response = self.client.get_cached(icon_url, max_body=self.max_body, timeout=self.timeout)
+        except Exception:
+            return None
+        # 超过 max_body 的图标只读取了一部分, 哈希没有意义
+        if response.status_code != 200 or not response.content or len(response.content) >= self.max_body:
+            return None
+        return favicon_hash(response.content)
+
+    def cleanup(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.logger.info("http指纹识别资源已释放")
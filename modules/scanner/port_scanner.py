@@ -1,16 +1,18 @@
 # modules/scanner/port_scanner.py
-import os
-
 from adapters.nmap_adapter import NmapAdapter
+from adapters.rate_controller import AdaptiveRateController
 from core.message_bus import MessageBus
 from core.thread_manager import ThreadManager
+from core.tracer import get_tracer
 from modules.base_module import BaseModule
 
 
 def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    # 开启存活探测时只扫描 host_discovery 转发的在线主机
+    discovery = BaseModule._load_module_config("scanner", "host_discovery")
     return PortScanner("scanner",
                        "port_scanner",
-                       ["scan_target"],
+                       ["live_targets" if discovery.get("enable", False) else "scan_target"],
                        message_bus,
                        thread_manager)
 
@@ -23,23 +25,25 @@ class PortScanner(BaseModule):
         super().__init__(step, name, inputChannel, message_bus, thread_manager)
 
         self.scanner = None
-        self.tmp_path = None
+        self.output = None
         self.thread = None
 
+        # 速率控制器跨任务保留, 同一主机/网段的后续扫描沿用已学习到的速率
+        rate_config = self._config.get("rate_control", {})
+        self.rate_controller = AdaptiveRateController(rate_config) if rate_config.get("enable", False) else None
+
     def execute(self) -> bool:
         """运行外部程序"""
         # try:
-        self.scanner = NmapAdapter(self._config)
+        self.scanner = NmapAdapter(self._config, self.rate_controller, self.cancel_token)
         # 读取模块特定配置
-        ports = self._config.get("ports", "1-1024")
+        ports = self._config.get("params", {}).get("ports", "1-1024")
         timeout = self._config.get("timeout", 300)
-        tmp_dir = "./tmp/port_scanner/"
-        if not os.path.exists(tmp_dir):
-            os.makedirs(tmp_dir)
-        self.tmp_path = tmp_dir + "nmap_scan.result"
-        self.thread = self.thread_manager.addProcess(self.scanner.scan, "Nmap scanner", (self.data['ip'],self.tmp_path, self._config))
+        # 每个任务独立的输出缓冲, 小结果不落盘, 并发目标之间不再互相覆盖
+        self.output = self.scanner.open_output()
+        self.thread = self.thread_manager.addProcess(self.scanner.scan, "Nmap scanner", (self.data['ip'], self.output, self._config.get("params")), owner=self.name)
 
-        print(f"端口扫描器初始化完成，开始扫描端口范围: {ports}")
+        self.logger.info("端口扫描器初始化完成，开始扫描端口范围: %s", ports)
         return True
 
         # except Exception as e:
@@ -50,33 +54,55 @@ class PortScanner(BaseModule):
     def waitOutput(self, inputs=None):
         """执行端口扫描"""
         # try:
-        if self.thread.is_alive():
-            return
-        else:
-            with open(self.tmp_path, "r") as f:
-                output = f.read()
-            if len(output):
-                scan_results = self.scanner.parse_output(output)
-                # 发布结果到总线
-                for scan_result in scan_results:
-                    self.publish_message(
-                        channel="scan_results",
-                        data=scan_result,
-                        priority=1
-                    )
-                return True
-            else:
-                print(self.tmp_path + "中没有内容")
-                return True
+        if self.thread is not None:
+            if self.thread.is_alive():
+                return
+            self._collect_results()
+            self.thread = None
+        # 结果在主线程上不阻塞地发布, 下游队列已满时留在 RUNNING 状态, 下一轮继续发布
+        return self.flush_messages()
 
         # except Exception as e:
         #     self.handle_error(e)
         #     return False
 
+    def _collect_results(self) -> None:
+        """读取并解析扫描结果, 放入待发布队列"""
+        error = self.thread.error
+        output = self.output.read() if error is None else ""
+        self.output.close()
+        self.output = None
+        scan_results = []
+        if error is not None:
+            self.logger.error("%s 扫描失败: %s", self.data['ip'], error)
+        elif len(output):
+            with get_tracer().span("parse_output", "adapter", adapter="nmap", target=self.data['ip'], size=len(output)):
+                scan_results = self.scanner.parse_output(output)
+            # 发布结果到总线, 增量复扫时先交给 rescan_gate 与基线对比
+            channel = "port_results" if self._context.get("rescan") is not None else "scan_results"
+            for scan_result in scan_results:
+                scan_result['ip'] = self.data['ip']
+                self.queue_message(
+                    channel=channel,
+                    data=scan_result,
+                    priority=1
+                )
+        else:
+            self.logger.warning("%s 的扫描结果中没有内容", self.data['ip'])
+        # 通知该目标已扫描完成或失败（分布式 worker 据此归还租约, rescan_gate 据此对比）, 没有订阅者时不发布, 以免队列积满
+        if self._message_bus.has_subscribers("scan_status"):
+            status = {'ip': self.data['ip'], 'status': 'done', 'ports': len(scan_results)}
+            if error is not None:
+                status.update(status='failed', error=str(error))
+            self.queue_message(channel="scan_status", data=status)
+
     def cleanup(self):
         """释放资源"""
         self.thread = None
+        if self.output is not None:
+            self.output.close()
+            self.output = None
         self.thread_manager.checkAlive()
-        print("端口扫描资源已释放")
+        self.logger.info("端口扫描资源已释放")
 
 
@@ -0,0 +1,131 @@
+# modules/scanner/rescan_gate.py
+import os
+import time
+from typing import Dict, List
+
+from core.message_bus import MessageBus
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+from utils.findings_store import FindingsStore
+from utils.report_exporter import ReportExporter
+from utils.rescan import baseline_ports, diff_ports, port_map
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return RescanGate("scanner",
+                      "rescan_gate",
+                      ["port_results", "scan_status"],
+                      message_bus,
+                      thread_manager)
+
+
+class RescanGate(BaseModule):
+    """增量复扫时位于端口扫描和后续检测之间
+
+    PortScanner 在复扫模式下把结果发布到 port_results, 本模块按主机收齐（收到 scan_status）后与基线运行对比:
+    - 端口或服务有变化、或基线中没有的主机, 结果转发到 scan_results, 照常进行横幅/web指纹/漏洞检测
+    - 没有变化的主机不再转发, 基线中的端口和漏洞记录直接复制到本次运行
+    差异（new/closed/changed）边对比边写入差异报告
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.batch_size = self._config.get("batch_size", 500)
+        self.db_path = self._config.get("db_path", "./data/findings.db")
+        out_dir = os.path.join(self._config.get("out_dir", "./reports"), "diff_" + time.strftime("%Y%m%d-%H%M%S"))
+        self.exporter = ReportExporter(out_dir, self._config.get("formats", ['jsonl', 'csv', 'html']), kinds=('diff',))
+
+        self.store = None
+        self.base_run = None
+        self._owns_run = False
+        self._pending: Dict[str, List[Dict]] = {}  # 还没收到 scan_status 的主机 -> 端口结果
+        self._batch = []
+        self.stats = {'hosts': 0, 'unchanged': 0, 'new': 0, 'closed': 0, 'changed': 0, 'failed': 0}
+
+    def _open_store(self) -> None:
+        # 与 findings_sink 使用同一个运行标识, 复制的基线记录和新的检测结果属于同一次运行
+        run_id = self._context.get("run_id")
+        self._owns_run = run_id is None
+        self.store = FindingsStore(self.db_path, run_id)
+        rescan = self._context.get("rescan") or {}
+        self.base_run = rescan.get("base_run")
+        if self.base_run and not self.store.is_finished(self.base_run):
+            # 中止的运行只扫描了部分主机和端口, 作为基线会把没扫到的主机报为新增、端口报为关闭
+            self.logger.warning("基线运行 %s 没有正常结束, 改用最近一次完整的运行", self.base_run)
+            self.base_run = None
+        self.base_run = self.base_run or self.store.latest_run(exclude=self.store.run_id)
+        if self.base_run is None:
+            self.logger.warning("结果库中没有可用的基线运行, 所有主机都会完整检测")
+        else:
+            self.logger.info("增量复扫, 基线运行 %s", self.base_run)
+
+    def waitMessage(self) -> bool:
+        if self.store is None:
+            self._open_store()
+        self._batch = self.drain_messages(self.inputChannel, self.batch_size)
+        return bool(self._batch)
+
+    def execute(self) -> bool:
+        finished = []
+        for message in self._batch:
+            record = message.get('data', {}).get('data', {})
+            host = record.get('ip')
+            if host is None:
+                continue
+            if 'port' in record:
+                self._pending.setdefault(host, []).append(record)
+            elif record.get('status') in ('done', 'down'):
+                finished.append(host)
+            elif record.get('status') == 'failed':
+                # 扫描失败时结果不完整, 与基线对比会把缺失的端口误报为关闭, 该主机不计入差异
+                self._pending.pop(host, None)
+                self.stats['failed'] += 1
+                self.logger.warning("%s 扫描失败, 跳过对比: %s", host, record.get('error'))
+        self._batch = []
+
+        for host in finished:
+            self._compare(host, self._pending.pop(host, []))
+        self.exporter.flush()
+        return True
+
+    def _compare(self, host: str, records: List[Dict]) -> None:
+        self.stats['hosts'] += 1
+        if self.base_run is None:
+            self._forward(records)
+            return
+
+        old = baseline_ports(self.store, self.base_run, host)
+        changes = diff_ports(host, old, port_map(records))
+        for change in changes:
+            self.exporter.write('diff', change)
+            self.stats[change['change']] += 1
+
+        if changes:
+            self.logger.info("%s 有 %d 处变化, 重新检测", host, len(changes))
+            self._forward(records)
+        else:
+            self.store.carry_forward(host, self.base_run)
+            self.stats['unchanged'] += 1
+
+    def _forward(self, records: List[Dict]) -> None:
+        for record in records:
+            self.queue_message(channel="scan_results", data=record, priority=1)
+
+    def waitOutput(self) -> bool:
+        # 下游队列已满时保留未发布的结果, 下一轮继续
+        return self.flush_messages()
+
+    def cleanup(self) -> None:
+        if self._pending:
+            # 扫描被中止时部分主机没有收到 scan_status, 这些主机不计入差异
+            self.logger.warning("%d 个主机的端口扫描未完成, 未做对比: %s", len(self._pending), ", ".join(self._pending))
+        self.exporter.close()
+        if self.store is not None:
+            # 与 findings_sink 一致, 只有完整的运行才标记结束, 之后才会被选为基线
+            if self._owns_run and self._context.get("outcome", "completed") == "completed":
+                self.store.finish_run()
+            self.store.close()
+        self.logger.info("增量复扫: 主机 %(hosts)d, 未变化 %(unchanged)d, 新增端口 %(new)d, "
+                         "关闭端口 %(closed)d, 服务变化 %(changed)d, 扫描失败 %(failed)d", self.stats)
+        self.logger.info("差异报告已写入 %s", self.exporter.out_dir)
@@ -0,0 +1,166 @@
+# modules/scanner/vul_scanner.py
+import importlib.util
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict
+
+from core.message_bus import MessageBus
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+from utils.check_index import CheckIndex
+from utils.findings_store import split_port
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return VulScanner("scanner",
+                      "vul_scanner",
+                      ["scan_results", "service_results", "web_fingerprints"],
+                      message_bus,
+                      thread_manager)
+
+
+class VulScanner(BaseModule):
+    """根据端口扫描结果匹配 exp/ 下的检测脚本, 在全局和单主机并发上限内并发执行 poc
+
+    匹配通过预编译的 CheckIndex 完成, 只有命中的检测才会被导入;
+    manifest 的 entry 应指向非破坏性的 poc.py, 不会调用 exp.py
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.exp_dir = self._config.get("exp_dir", "exp")
+        self.timeout = self._config.get("timeout", 5)
+        self.max_workers = self._config.get("max_workers", 32)
+        self.per_host = self._config.get("per_host", 4)
+        self.max_queued = self._config.get("max_queued", 1000)
+        self.join_timeout = self._config.get("join_timeout", 10)
+
+        self.index = CheckIndex.load(self.exp_dir, self._config.get("index_cache", "./tmp/check_index.pickle"))
+        self._checks: Dict[str, object] = {}
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="vul_check")
+
+        # 每个主机待执行的任务和正在执行的任务数, 保证单主机并发不超过 per_host
+        self._pending: Dict[str, deque] = {}
+        self._active: Dict[str, int] = {}
+        self._queued = 0
+        # 每个主机已经排队过的 (端口, 检测), 该主机的任务全部完成后清除, 内存不随扫描的主机数增长
+        self._seen: Dict[str, set] = {}
+        # 已提交给线程池的检测, 清理时在期限内等待它们结束; 清理完成后迟到的结果不再发布
+        self._futures = set()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _get_check(self, check_name: str):
+        """按需导入检测脚本, 要求提供 verify(url, timeout=...) 函数
+
+        导入在锁外进行, 不阻塞其他主机的调度; 并发导入同一脚本时以先写入的为准
+        """
+        with self._lock:
+            poc = self._checks.get(check_name)
+        if poc is not None:
+            return poc
+        poc_path = self.index.manifests[check_name]['path']
+        spec = importlib.util.spec_from_file_location(f"exp_checks.{check_name}", poc_path)
+        poc = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(poc)
+        if not callable(getattr(poc, "verify", None)):
+            raise AttributeError(f"{poc_path} 中没有 verify 函数")
+        with self._lock:
+            return self._checks.setdefault(check_name, poc)
+
+    @staticmethod
+    def _build_url(finding: Dict) -> str:
+        port, _ = split_port(finding['port'])
+        scheme = "https" if "https" in finding['service'] or port == 443 else "http"
+        return f"{scheme}://{finding['ip']}:{port}"
+
+    def execute(self) -> bool:
+        """把匹配到的检测放入对应主机的队列, 队列已满时返回 False 等待下一轮"""
+        finding = self.data.get('data', self.data)
+        # web_fingerprints 没有 state 字段, 能取得响应说明端口开放
+        if finding.get('state', 'open') != 'open':
+            return True
+
+        with self._lock:
+            if self._queued >= self.max_queued:
+                return False
+
+            host = finding.get('ip')
+            # scan_results 的端口是 '80/tcp', web_fingerprints 是 80, 统一后再去重
+            port = split_port(finding['port'])
+            for check_name in self.index.lookup(finding):
+                key = (port, check_name)
+                seen = self._seen.setdefault(host, set())
+                if key in seen:
+                    continue
+                seen.add(key)
+                self._pending.setdefault(host, deque()).append((check_name, finding))
+                self._queued += 1
+            self._dispatch(host)
+            self._expire(host)
+        return True
+
+    def _dispatch(self, host: str) -> None:
+        """在单主机并发上限内把任务提交给线程池（调用方需持有 self._lock）"""
+        pending = self._pending.get(host)
+        while pending and self._active.get(host, 0) < self.per_host:
+            check_name, finding = pending.popleft()
+            self._active[host] = self._active.get(host, 0) + 1
+            future = self.executor.submit(self._run_check, host, check_name, finding)
+            self._futures.add(future)
+            future.add_done_callback(self._futures.discard)
+        if not pending:
+            self._pending.pop(host, None)
+
+    def _expire(self, host: str) -> None:
+        """主机没有排队和执行中的任务时清除去重记录（调用方需持有 self._lock）"""
+        if host not in self._pending and host not in self._active:
+            self._seen.pop(host, None)
+
+    def _run_check(self, host: str, check_name: str, finding: Dict) -> None:
+        url = self._build_url(finding)
+        try:
+            check = self._get_check(check_name)
+            if check.verify(url, timeout=self.timeout) and not self._closed:
+                self.logger.info("发现漏洞 %s: %s", check_name, url)
+                self.publish_message(
+                    channel="vuln_alerts",
+                    data={
+                        'ip': host,
+                        'port': finding['port'],
+                        'service': finding['service'],
+                        'check': check_name,
+                        'severity': self.index.manifests[check_name].get('severity', 'unknown'),
+                        'url': url
+                    },
+                    priority=2
+                )
+        except Exception as e:
+            self.logger.warning("%s 检测 %s 失败: %s", check_name, url, e)
+        finally:
+            with self._lock:
+                self._active[host] -= 1
+                self._queued -= 1
+                if not self._active[host]:
+                    del self._active[host]
+                self._dispatch(host)
+                self._expire(host)
+
+    def waitOutput(self) -> bool:
+        """检测在线程池中异步执行, 结果由工作线程直接发布, 这里立即回到等待状态"""
+        return True
+
+    def cleanup(self) -> None:
+        """丢弃排队的检测, 在 join_timeout 秒内等待执行中的检测结束并发布结果, 超时未结束的检测结果不再发布"""
+        with self._lock:
+            self._queued -= sum(len(pending) for pending in self._pending.values())
+            self._pending.clear()
+            futures = list(self._futures)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        _, not_done = wait(futures, timeout=self.join_timeout)
+        self._closed = True
+        if not_done:
+            self.logger.warning("%d 个检测未在 %.1f 秒内结束, 其结果将被丢弃", len(not_done), self.join_timeout)
+        self.logger.info("漏洞扫描资源已释放")
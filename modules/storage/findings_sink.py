@@ -0,0 +1,98 @@
+# modules/storage/findings_sink.py
+import time
+from typing import Dict, List
+
+from core.message_bus import MessageBus
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+from utils.findings_store import FindingsStore
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return FindingsSink("storage",
+                        "findings_sink",
+                        ["scan_results", "service_results", "web_fingerprints", "vuln_alerts"],
+                        message_bus,
+                        thread_manager)
+
+
+class FindingsSink(BaseModule):
+    """把扫描结果和漏洞告警写入 SQLite 结果库
+
+    消息先在内存中缓冲, 达到 batch_size 条或距上次写入超过 flush_interval 秒时在一个事务中批量写入
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.batch_size = self._config.get("batch_size", 500)
+        self.flush_interval = self._config.get("flush_interval", 2)
+        self.store = FindingsStore(self._config.get("db_path", "./data/findings.db"),
+                                   self._config.get("run_id"))
+
+        self._ports: List[Dict] = []
+        self._vulns: List[Dict] = []
+        self._last_flush = time.monotonic()
+        self._batch: List[Dict] = []
+
+    def bind_context(self, context) -> None:
+        super().bind_context(context)
+        # 其他需要写入同一次运行的模块（如 rescan_gate）从上下文读取运行标识
+        self._context.set("run_id", self.store.run_id)
+
+    def waitMessage(self) -> bool:
+        """一次取走通道中已有的全部消息（最多 batch_size 条）, 空闲时顺便把缓冲写入数据库"""
+        batch = self.drain_messages(self.inputChannel, self.batch_size)
+        if not batch:
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+            return False
+
+        self._batch = batch
+        return True
+
+    def execute(self) -> bool:
+        for message in self._batch:
+            record = message.get('data', {}).get('data', {})
+            if 'check' in record:
+                self._vulns.append(record)
+            elif record.get('ip') and record.get('port'):
+                self._ports.append(record)
+        self._batch = []
+
+        if (len(self._ports) + len(self._vulns) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+        return True
+
+    def waitOutput(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        """把缓冲中的记录写入数据库"""
+        self._last_flush = time.monotonic()
+        if not self._ports and not self._vulns:
+            return
+        try:
+            self.store.add_ports(self._ports)
+            self.store.add_vulns(self._vulns)
+        except Exception as e:
+            self.logger.error("结果写入数据库失败: %s", e)
+            return
+        self._ports, self._vulns = [], []
+
+    def cleanup(self) -> None:
+        # 上游模块已经停止, 把通道中还没取走的结果也写入数据库
+        self._batch = self.drain_messages(self.inputChannel, self.batch_size, timeout=0)
+        while self._batch:
+            self.execute()
+            self._batch = self.drain_messages(self.inputChannel, self.batch_size, timeout=0)
+        self.flush()
+        # 取消或出错的运行结果不完整, 不标记结束时间, 不会被选为增量复扫的基线
+        outcome = self._context.get("outcome", "completed")
+        if outcome == "completed":
+            self.store.finish_run()
+        else:
+            self.logger.warning("运行 %s 未正常结束(%s), 不标记为完成", self.store.run_id, outcome)
+        self.store.close()
+        self.logger.info("结果库已关闭")
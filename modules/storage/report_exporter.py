@@ -0,0 +1,62 @@
+# modules/storage/report_exporter.py
+import os
+import time
+
+from core.message_bus import MessageBus
+from core.thread_manager import ThreadManager
+from modules.base_module import BaseModule
+from utils.report_exporter import ReportExporter
+
+
+def create(message_bus: MessageBus, thread_manager: ThreadManager):
+    return ReportExporterModule("storage",
+                                "report_exporter",
+                                ["scan_results", "service_results", "web_fingerprints", "vuln_alerts"],
+                                message_bus,
+                                thread_manager)
+
+
+class ReportExporterModule(BaseModule):
+    """扫描过程中把结果边收边写入报告文件
+
+    各阶段的端口结果按到达顺序逐条写入（同一端口可能出现多行）, 需要合并后的报告时
+    在扫描结束后用 python -m utils.report_exporter 从结果库导出
+    """
+
+    def __init__(self, step, name, inputChannel, message_bus, thread_manager):
+        super().__init__(step, name, inputChannel, message_bus, thread_manager)
+
+        self.batch_size = self._config.get("batch_size", 500)
+        out_dir = os.path.join(self._config.get("out_dir", "./reports"), time.strftime("%Y%m%d-%H%M%S"))
+        self.exporter = ReportExporter(out_dir,
+                                       self._config.get("formats", ['jsonl', 'csv', 'html']),
+                                       self._config.get("page_size", 1000))
+        self._batch = []
+
+    def waitMessage(self) -> bool:
+        self._batch = self.drain_messages(self.inputChannel, self.batch_size)
+        return bool(self._batch)
+
+    def execute(self) -> bool:
+        for message in self._batch:
+            record = message.get('data', {}).get('data', {})
+            if 'check' in record:
+                self.exporter.write('vulns', record)
+            elif record.get('ip') and record.get('port'):
+                self.exporter.write('ports', record)
+        self._batch = []
+        # 每批写完后落盘, 引擎中途退出时已写入的部分仍然可用
+        self.exporter.flush()
+        return True
+
+    def waitOutput(self) -> bool:
+        return True
+
+    def cleanup(self) -> None:
+        # 上游模块已经停止, 把通道中还没取走的结果也写入报告
+        self._batch = self.drain_messages(self.inputChannel, self.batch_size, timeout=0)
+        while self._batch:
+            self.execute()
+            self._batch = self.drain_messages(self.inputChannel, self.batch_size, timeout=0)
+        self.exporter.close()
+        self.logger.info("报告已写入 %s", self.exporter.out_dir)
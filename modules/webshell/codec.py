@@ -0,0 +1,148 @@
+# modules/webshell/codec.py
+import base64
+import zlib
+from typing import List, Union
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class Codec:
+    """字节级编解码器的基类, encode/decode 接受 bytes/bytearray/memoryview, 返回 bytes"""
+
+    name = "raw"
+
+    def encode(self, data: BytesLike) -> bytes:
+        return bytes(data)
+
+    def decode(self, data: BytesLike) -> bytes:
+        return bytes(data)
+
+
+class Base64Codec(Codec):
+    name = "base64"
+
+    def encode(self, data: BytesLike) -> bytes:
+        return base64.b64encode(data)
+
+    def decode(self, data: BytesLike) -> bytes:
+        return base64.b64decode(data)
+
+
+class XorCodec(Codec):
+    """查表实现的单字节异或, 整段数据一次 translate, 不再逐字符处理"""
+
+    name = "xor"
+
+    def __init__(self, key: int = 0xFF):
+        self.key = key
+        self._table = bytes(b ^ key for b in range(256))
+
+    def encode(self, data: BytesLike) -> bytes:
+        return bytes(data).translate(self._table)
+
+    # 异或的编码与解码相同
+    decode = encode
+
+
+class TextCodec(Codec):
+    """每个字节当作一个 latin-1 字符, 以 UTF-8 发送
+
+    旧版 xor 对字符串逐字符异或后交给 requests, 异或结果按 UTF-8 urlencode; 单独使用 xor 时在其后加上本编码,
+    线上格式与旧版一致（ASCII 命令逐字节相同）, 已部署的 webshell 不需要修改
+    """
+
+    name = "text"
+
+    def encode(self, data: BytesLike) -> bytes:
+        return bytes(data).decode('latin-1').encode('utf-8')
+
+    def decode(self, data: BytesLike) -> bytes:
+        return bytes(data).decode('utf-8').encode('latin-1')
+
+
+class ZlibCodec(Codec):
+    """带 1 字节帧头的 zlib 压缩: 0x01 表示压缩数据, 0x00 表示原样数据
+
+    小于 min_size 或压缩后没有变小的数据不压缩, 避免小包反而变大;
+    解压后超过 max_size 的数据直接拒绝, 不会被构造的压缩包耗尽内存
+    """
+
+    name = "zlib"
+    RAW = b"\x00"
+    COMPRESSED = b"\x01"
+
+    def __init__(self, level: int = 6, min_size: int = 256, max_size: int = 64 * 1024 * 1024):
+        self.level = level
+        self.min_size = min_size
+        self.max_size = max_size
+
+    def encode(self, data: BytesLike) -> bytes:
+        data = memoryview(data)
+        if len(data) >= self.min_size:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return self.COMPRESSED + compressed
+        return self.RAW + data.tobytes()
+
+    def decode(self, data: BytesLike) -> bytes:
+        data = memoryview(data)
+        if not len(data):
+            return b""
+        flag, body = data[:1].tobytes(), data[1:]
+        if flag == self.COMPRESSED:
+            decompressor = zlib.decompressobj()
+            result = decompressor.decompress(body, self.max_size)
+            if decompressor.unconsumed_tail:
+                raise ValueError(f"zlib frame exceeds {self.max_size} bytes")
+            if not decompressor.eof:
+                raise ValueError("truncated zlib frame")
+            return result
+        if flag == self.RAW:
+            return body.tobytes()
+        raise ValueError(f"unknown zlib frame flag: {flag!r}")
+
+
+CODECS = {
+    "raw": Codec,
+    "base64": Base64Codec,
+    "xor": XorCodec,
+    "text": TextCodec,
+    "zlib": ZlibCodec,
+}
+
+
+class CodecPipeline:
+    """按顺序组合多个编解码器, 编码时从左到右, 解码时从右到左
+
+    例如 'zlib+xor+base64' 表示先压缩, 再异或, 最后 base64
+    """
+
+    def __init__(self, codecs: List[Codec]):
+        self.codecs = codecs
+
+    @classmethod
+    def from_spec(cls, spec: str) -> "CodecPipeline":
+        if spec.strip().lower() == "xor":
+            # 兼容旧版 xor 的线上格式, 组合使用时 xor 输出原始字节
+            return cls([XorCodec(), TextCodec()])
+        codecs = []
+        for name in spec.split('+'):
+            name = name.strip().lower()
+            if name not in CODECS:
+                raise ValueError(f"不支持的编码类型: {name}")
+            codecs.append(CODECS[name]())
+        return cls(codecs)
+
+    def encode(self, data: Union[str, BytesLike]) -> bytes:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        for codec in self.codecs:
+            data = codec.encode(data)
+        return bytes(data)
+
+    def decode(self, data: Union[str, BytesLike]) -> bytes:
+        if isinstance(data, str):
+            data = data.encode('latin-1')
+        for codec in reversed(self.codecs):
+            data = codec.decode(data)
+        return bytes(data)
@@ -0,0 +1,78 @@
+# modules/webshell/session_pool.py
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from modules.webshell.webshell import WebshellManager
+
+
+class WebshellSessionPool:
+    """同时持有多个 WebshellManager 会话, 把同一组命令并发下发到多个会话
+
+    支持批量执行的会话每个主机只需要一次请求, 结果按会话完成的顺序以生成器形式返回
+    """
+
+    def __init__(self, max_workers: int = 16):
+        """
+        :param max_workers: 同时进行请求的会话数上限
+        """
+        self.max_workers = max_workers
+        self._sessions: Dict[str, WebshellManager] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, session: WebshellManager) -> None:
+        with self._lock:
+            self._sessions[name] = session
+
+    def connect(self, name: str, url: str, password: str, **kwargs) -> WebshellManager:
+        """新建会话并加入会话池, kwargs 透传给 WebshellManager"""
+        session = WebshellManager(url, password, **kwargs)
+        self.add(name, session)
+        return session
+
+    def remove(self, name: str) -> Optional[WebshellManager]:
+        with self._lock:
+            return self._sessions.pop(name, None)
+
+    def get(self, name: str) -> Optional[WebshellManager]:
+        return self._sessions.get(name)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def broadcast(self,
+                  commands: List[str],
+                  names: Optional[Iterable[str]] = None,
+                  batch: bool = True) -> Iterator[Tuple[str, str, str]]:
+        """把 commands 并发下发到多个会话
+
+        :param names: 目标会话名称, 默认全部会话
+        :param batch: 会话支持时把全部命令合并为一次请求
+        :return: 生成器, 依次产出 (会话名称, 命令, 输出)
+        """
+        with self._lock:
+            targets = {name: self._sessions[name] for name in (names or self._sessions) if name in self._sessions}
+
+        def run(session: WebshellManager) -> List[str]:
+            if batch:
+                return session.execute_batch(commands)
+            return [session.execute(command) for command in commands]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="webshell_pool") as executor:
+            futures = {executor.submit(run, session): name for name, session in targets.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    outputs = [f"Error: {str(e)}"] * len(commands)
+                for command, output in zip(commands, outputs):
+                    yield name, command, output
+
+    def execute_all(self, command: str, names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """在多个会话上执行单条命令, 返回 {会话名称: 输出}"""
+        return {name: output for name, _, output in self.broadcast([command], names)}
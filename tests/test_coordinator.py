@@ -0,0 +1,157 @@
+# tests/test_coordinator.py
+"""Coordinator 租约状态的测试: 惰性展开、过期重新分配、窃取和完成去重"""
+import time
+import unittest
+
+from core.coordinator import Coordinator, CoordinatorClient, CoordinatorServer
+from utils.targets import ExclusionIndex
+
+
+def targets(response):
+    return [lease['target'] for lease in response['leases']]
+
+
+class CoordinatorLeaseTest(unittest.TestCase):
+    def test_large_scope_is_expanded_lazily(self):
+        coordinator = Coordinator()
+        coordinator.add_targets(["10.0.0.0/8"])
+
+        self.assertEqual(targets(coordinator.lease("w1", 3)), ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        status = coordinator.status()
+        # 只取出了已分配的地址和判断是否还有剩余时预取的一个
+        self.assertLessEqual(status['issued'], 4)
+        self.assertEqual(status['leased'], 3)
+        self.assertFalse(status['finished'])
+
+    def test_exclusions_are_skipped(self):
+        coordinator = Coordinator(exclusions=ExclusionIndex(["10.0.0.2-10.0.0.3"]))
+        coordinator.add_targets(["10.0.0.1-5"])
+
+        self.assertEqual(targets(coordinator.lease("w1", 10)), ["10.0.0.1", "10.0.0.4", "10.0.0.5"])
+
+    def test_finished_after_all_completed(self):
+        coordinator = Coordinator()
+        coordinator.add_targets(["10.0.0.1", "10.0.0.2"])
+        response = coordinator.lease("w1", 5)
+        self.assertFalse(response['finished'])
+
+        for lease in response['leases']:
+            self.assertTrue(coordinator.complete("w1", lease['lease_id'])['accepted'])
+
+        status = coordinator.status()
+        self.assertTrue(status['finished'])
+        self.assertEqual(status['done'], 2)
+
+    def test_expired_lease_is_reassigned_until_max_attempts(self):
+        coordinator = Coordinator(lease_ttl=0.01, max_attempts=2)
+        coordinator.add_targets(["10.0.0.1"])
+
+        first = coordinator.lease("w1")['leases'][0]
+        time.sleep(0.02)
+        self.assertEqual(coordinator.expire(), 1)
+        second = coordinator.lease("w2")['leases'][0]
+        self.assertEqual(second['target'], first['target'])
+        # 旧租约已失效, 迟到的完成不被接受
+        self.assertFalse(coordinator.complete("w1", first['lease_id'])['accepted'])
+
+        time.sleep(0.02)
+        coordinator.expire()
+        status = coordinator.status()
+        self.assertEqual(status['failed'], 1)
+        self.assertEqual(coordinator.lease("w3")['leases'], [])
+        self.assertTrue(status['finished'])
+
+    def test_heartbeat_renews_lease(self):
+        coordinator = Coordinator(lease_ttl=0.3)
+        coordinator.add_targets(["10.0.0.1"])
+        lease = coordinator.lease("w1")['leases'][0]
+
+        # 总时长超过 lease_ttl, 每次心跳都续期
+        for _ in range(3):
+            time.sleep(0.12)
+            self.assertEqual(coordinator.heartbeat("w1", held=[lease['lease_id']])['lost'], [])
+            self.assertEqual(coordinator.expire(), 0)
+
+    def test_idle_worker_steals_unstarted_leases(self):
+        coordinator = Coordinator()
+        coordinator.add_targets(["10.0.0.1-4"])
+        held = coordinator.lease("w1", 4)['leases']
+        coordinator.heartbeat("w1", held=[lease['lease_id'] for lease in held], started=[held[0]['lease_id']])
+
+        stolen = coordinator.lease("w2", 2)['leases']
+
+        self.assertTrue(stolen)
+        self.assertNotIn(held[0]['target'], targets({'leases': stolen}))
+        revoked = coordinator.heartbeat("w1", held=[lease['lease_id'] for lease in held])['revoked']
+        self.assertEqual(len(revoked), len(stolen))
+
+    def test_release_does_not_count_as_attempt(self):
+        coordinator = Coordinator(max_attempts=1)
+        coordinator.add_targets(["10.0.0.1"])
+        lease = coordinator.lease("w1")['leases'][0]
+
+        coordinator.release("w1", [lease['lease_id']])
+
+        self.assertEqual(targets(coordinator.lease("w2")), ["10.0.0.1"])
+        self.assertEqual(coordinator.status()['failed'], 0)
+
+    def test_only_lease_holder_can_complete(self):
+        coordinator = Coordinator()
+        coordinator.add_targets(["10.0.0.1"])
+        lease = coordinator.lease("w1")['leases'][0]
+
+        self.assertFalse(coordinator.complete("w2", lease['lease_id'])['accepted'])
+        self.assertEqual(coordinator.status()['leased'], 1)
+        self.assertTrue(coordinator.complete("w1", lease['lease_id'])['accepted'])
+
+    def test_failed_lease_is_retried(self):
+        coordinator = Coordinator(max_attempts=2)
+        coordinator.add_targets(["10.0.0.1"])
+        lease = coordinator.lease("w1")['leases'][0]
+
+        coordinator.fail("w1", lease['lease_id'], "nmap 退出码 1")
+
+        self.assertEqual(targets(coordinator.lease("w2")), ["10.0.0.1"])
+
+
+class CoordinatorServerTest(unittest.TestCase):
+    def test_client_round_trip(self):
+        coordinator = Coordinator()
+        coordinator.add_targets(["10.0.0.1"])
+        server = CoordinatorServer(coordinator, "tcp://127.0.0.1:0")
+        server.start()
+        self.addCleanup(server.shutdown)
+        client = CoordinatorClient("tcp://%s:%d" % server.server_address)
+        self.addCleanup(client.close)
+
+        lease = client.request("lease", worker="w1", count=1)['leases'][0]
+        self.assertTrue(client.request("complete", worker="w1", lease_id=lease['lease_id'])['accepted'])
+        self.assertTrue(client.request("status")['finished'])
+        with self.assertRaises(RuntimeError):
+            client.request("unknown")
+
+    def test_remote_listen_requires_token(self):
+        with self.assertRaises(ValueError):
+            CoordinatorServer(Coordinator(), "tcp://0.0.0.0:0")
+
+    def test_requests_without_token_are_rejected(self):
+        coordinator = Coordinator()
+        coordinator.add_targets(["10.0.0.1"])
+        server = CoordinatorServer(coordinator, "tcp://127.0.0.1:0", token="secret")
+        server.start()
+        self.addCleanup(server.shutdown)
+        address = "tcp://%s:%d" % server.server_address
+
+        for token in (None, "wrong"):
+            client = CoordinatorClient(address, token=token)
+            self.addCleanup(client.close)
+            with self.assertRaises(RuntimeError):
+                client.request("add_targets", targets=["10.9.9.9"])
+        client = CoordinatorClient(address, token="secret")
+        self.addCleanup(client.close)
+        self.assertEqual(client.request("lease", worker="w1", count=5)['leases'][0]['target'], "10.0.0.1")
+        self.assertEqual(coordinator.status()['issued'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
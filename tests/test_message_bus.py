@@ -0,0 +1,61 @@
+# tests/test_message_bus.py
+"""MessageBus 的订阅者复制和队列已满时的背压"""
+import threading
+import time
+import unittest
+
+from core.message_bus import MessageBus
+
+
+class ChannelBackpressureTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = MessageBus()
+        self.bus.create_channel("results", maxsize=2)
+        self.bus.register_subscriber("results", "fast")
+        self.bus.register_subscriber("results", "slow")
+
+    def test_every_subscriber_gets_a_copy(self):
+        self.assertTrue(self.bus.publish("results", {'n': 1}))
+
+        self.assertEqual(self.bus.subscribe("results", 0, subscriber="fast")['data'], {'n': 1})
+        self.assertEqual(self.bus.subscribe("results", 0, subscriber="slow")['data'], {'n': 1})
+
+    def test_non_blocking_publish_is_all_or_nothing(self):
+        for n in range(2):
+            self.bus.publish("results", {'n': n})
+        # fast 取走后有空位, slow 仍是满的, 消息不能只送达 fast
+        self.bus.subscribe("results", 0, subscriber="fast")
+
+        self.assertFalse(self.bus.publish("results", {'n': 2}, block=False))
+        self.assertEqual(self.bus.subscribe("results", 0, subscriber="fast")['data'], {'n': 1})
+        self.assertIsNone(self.bus.subscribe("results", 0, subscriber="fast"))
+
+        self.bus.subscribe("results", 0, subscriber="slow")
+        self.assertTrue(self.bus.publish("results", {'n': 2}, block=False))
+
+    def test_publish_timeout(self):
+        for n in range(2):
+            self.bus.publish("results", {'n': n})
+
+        started = time.monotonic()
+        self.assertFalse(self.bus.publish("results", {'n': 2}, timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_blocking_publish_resumes_when_space_frees(self):
+        for n in range(2):
+            self.bus.publish("results", {'n': n})
+        publisher = threading.Thread(target=self.bus.publish, args=("results", {'n': 2}))
+        publisher.start()
+        time.sleep(0.05)
+        self.assertTrue(publisher.is_alive())
+
+        self.bus.subscribe("results", 0, subscriber="fast")
+        self.bus.subscribe("results", 0, subscriber="slow")
+        publisher.join(1)
+
+        self.assertFalse(publisher.is_alive())
+        self.assertEqual([m['data']['n'] for m in self.bus.drain("results")], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+# tests/test_rate_controller.py
+"""AdaptiveRateController 的测试, 由本机上模拟延迟和丢包的目标驱动
+
+模拟目标对每个连接先等待 latency 秒再回应一个字节, 按 loss 的比例不回应（相当于探测包丢失）;
+simulate_scan 按控制器给出的参数发一轮探测, 把 RTT 和丢包反馈给控制器, 与 NmapAdapter 解析扫描输出的方式一致
+"""
+import random
+import socket
+import socketserver
+import threading
+import time
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from adapters.nmap_adapter import NmapAdapter
+from adapters.rate_controller import AdaptiveRateController
+
+CONFIG = {
+    'min_parallelism': 2,
+    'max_parallelism': 32,
+    'initial_parallelism': 8,
+    'min_rate': 50,
+    'max_rate': 800,
+    'initial_rate': 200,
+    'loss_threshold': 0.05,
+}
+
+
+class SimulatedTarget:
+    """本机 TCP 服务, 模拟固定延迟和随机丢包的扫描目标"""
+
+    def __init__(self, latency: float, loss: float = 0.0, seed: int = 1):
+        self.latency = latency
+        self.loss = loss
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._closed = threading.Event()
+        target = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                with target._random_lock:
+                    dropped = target._random.random() < target.loss
+                if dropped:
+                    # 不回应, 探测方等到超时
+                    target._closed.wait(1)
+                    return
+                time.sleep(target.latency)
+                self.request.sendall(b"x")
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+            # 默认的 backlog 只有 5, 并发探测时连接会排队超时, 模拟目标的丢包只由 loss 决定
+            request_queue_size = 256
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        self.address = self._server.server_address
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def probe(address, timeout: float):
+    """发一个探测, 返回 RTT（秒）, 超时返回 None"""
+    started = time.monotonic()
+    try:
+        with socket.create_connection(address, timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            if not sock.recv(1):
+                return None
+    except OSError:
+        return None
+    return time.monotonic() - started
+
+
+def simulate_scan(controller: AdaptiveRateController, host: str, target: SimulatedTarget, probes: int = 40) -> dict:
+    """按控制器当前的参数扫描一轮, 返回本轮使用的参数"""
+    params = controller.params_for(host)
+    # nmap 在 max_rtt_timeout 内仍会重传, 超过后才记为丢失
+    timeout = params.get('max_rtt_timeout', 0.3)
+    with ThreadPoolExecutor(max_workers=min(params['max_parallelism'], probes)) as pool:
+        rtts = list(pool.map(lambda _: probe(target.address, timeout), range(probes)))
+    for rtt in rtts:
+        if rtt is not None:
+            controller.observe_rtt(host, rtt)
+    controller.observe_probes(host, sent=probes, dropped=sum(rtt is None for rtt in rtts))
+    controller.finish(host)
+    return params
+
+
+class AdaptiveRateControllerTest(unittest.TestCase):
+    def test_fast_lossless_target_ramps_up_to_max(self):
+        target = SimulatedTarget(latency=0.005)
+        self.addCleanup(target.close)
+        controller = AdaptiveRateController(CONFIG)
+
+        rates = [simulate_scan(controller, "10.0.0.1", target)['max_rate'] for _ in range(12)]
+
+        self.assertEqual(rates, sorted(rates))
+        self.assertEqual(controller.params_for("10.0.0.1")['max_rate'], CONFIG['max_rate'])
+        self.assertEqual(controller.params_for("10.0.0.1")['max_parallelism'], CONFIG['max_parallelism'])
+
+    def test_lossy_target_backs_off_to_min(self):
+        target = SimulatedTarget(latency=0.005, loss=0.3)
+        self.addCleanup(target.close)
+        controller = AdaptiveRateController(CONFIG)
+
+        for _ in range(6):
+            simulate_scan(controller, "10.0.0.2", target)
+
+        params = controller.params_for("10.0.0.2")
+        self.assertEqual(params['max_rate'], CONFIG['min_rate'])
+        self.assertEqual(params['max_parallelism'], CONFIG['min_parallelism'])
+
+    def test_rtt_timeouts_follow_target_latency(self):
+        slow = SimulatedTarget(latency=0.08)
+        fast = SimulatedTarget(latency=0.002)
+        self.addCleanup(slow.close)
+        self.addCleanup(fast.close)
+        controller = AdaptiveRateController(CONFIG)
+
+        simulate_scan(controller, "10.0.1.1", slow, probes=10)
+        simulate_scan(controller, "10.0.2.1", fast, probes=10)
+
+        slow_params, fast_params = controller.params_for("10.0.1.1"), controller.params_for("10.0.2.1")
+        # 超时至少覆盖一个 RTT, 慢目标的超时明显更长
+        self.assertGreaterEqual(slow_params['initial_rtt_timeout'], 0.08)
+        self.assertGreater(slow_params['initial_rtt_timeout'], fast_params['initial_rtt_timeout'])
+        self.assertGreaterEqual(slow_params['max_rtt_timeout'], slow_params['initial_rtt_timeout'])
+
+    def test_new_host_starts_from_network_peer(self):
+        target = SimulatedTarget(latency=0.005)
+        self.addCleanup(target.close)
+        controller = AdaptiveRateController(CONFIG)
+        for _ in range(3):
+            simulate_scan(controller, "10.0.3.1", target)
+
+        self.assertEqual(controller.params_for("10.0.3.2")['max_rate'], controller.params_for("10.0.3.1")['max_rate'])
+        self.assertEqual(controller.params_for("10.0.4.1")['max_rate'], CONFIG['initial_rate'])
+
+
+class NmapOutputFeedbackTest(unittest.TestCase):
+    """丢包率是 nmap 丢包行中 "X out of Y" 的累计 X/Y"""
+
+    def feed(self, lines):
+        controller = AdaptiveRateController(CONFIG)
+        adapter = types.SimpleNamespace(rate_controller=controller)
+        for line in lines:
+            NmapAdapter._observe_line(adapter, "10.0.5.1", line)
+        controller.finish("10.0.5.1")
+        return controller.params_for("10.0.5.1")
+
+    def test_lossless_scan_increases_rate(self):
+        params = self.feed([
+            "Host is up (0.0020s latency).",
+            "Completed SYN Stealth Scan at 12:00, 1.20s elapsed (1000 total ports)",
+        ])
+        self.assertGreater(params['max_rate'], CONFIG['initial_rate'])
+
+    def test_occasional_drops_still_increase_rate(self):
+        params = self.feed([
+            "Increasing send delay for 10.0.5.1 from 0 to 5 due to 3 out of 120 dropped probes since last increase.",
+            "Increasing send delay for 10.0.5.1 from 5 to 10 due to 2 out of 150 dropped probes since last increase.",
+            "Completed SYN Stealth Scan at 12:00, 1.20s elapsed (1000 total ports)",
+        ])
+        self.assertGreater(params['max_rate'], CONFIG['initial_rate'])
+
+    def test_heavy_drops_decrease_rate(self):
+        # 11/36 约 30% 的丢包
+        params = self.feed([
+            "Increasing send delay for 10.0.5.1 from 0 to 5 due to 11 out of 36 dropped probes since last increase.",
+            "Completed SYN Stealth Scan at 12:00, 9.80s elapsed (1000 total ports)",
+        ])
+        self.assertLess(params['max_rate'], CONFIG['initial_rate'])
+
+    def test_drop_ratio_accumulates_across_lines(self):
+        # 单独看第二行丢包率很低, 累计后 (40+1)/(100+100) 仍超过阈值
+        params = self.feed([
+            "Increasing send delay for 10.0.5.1 from 0 to 5 due to 40 out of 100 dropped probes since last increase.",
+            "Increasing send delay for 10.0.5.1 from 5 to 10 due to 1 out of 100 dropped probes since last increase.",
+        ])
+        self.assertLess(params['max_rate'], CONFIG['initial_rate'])
+
+    def test_retransmission_give_up_decreases_rate(self):
+        params = self.feed(["Warning: 10.0.5.1 giving up on port because retransmission cap hit (6)."])
+        self.assertLess(params['max_rate'], CONFIG['initial_rate'])
+
+
+if __name__ == "__main__":
+    unittest.main()
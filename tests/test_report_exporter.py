@@ -0,0 +1,50 @@
+# tests/test_report_exporter.py
+"""ReportExporter 的测试: 重复导出到同一目录时覆盖而不是追加"""
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from utils.report_exporter import ReportExporter
+
+PORTS = [
+    {'ip': "10.0.0.1", 'port': "22/tcp", 'state': "open", 'service': "ssh"},
+    {'ip': "10.0.0.1", 'port': "80/tcp", 'state': "open", 'service': "http", 'tech': ["nginx", "php"]},
+]
+
+
+class ReportExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def export(self):
+        with ReportExporter(self.tmp.name, page_size=1) as exporter:
+            for record in PORTS:
+                exporter.write('ports', record)
+
+    def test_records_are_normalized(self):
+        self.export()
+        with open(os.path.join(self.tmp.name, "ports.jsonl"), encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows[1]['port'], 80)
+        self.assertEqual(rows[1]['protocol'], "tcp")
+        self.assertEqual(rows[1]['tech'], "nginx,php")
+
+    def test_rerun_overwrites_previous_export(self):
+        self.export()
+        self.export()
+
+        with open(os.path.join(self.tmp.name, "ports.jsonl"), encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), len(PORTS))
+        with open(os.path.join(self.tmp.name, "ports.csv"), encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0][:2], ['ip', 'port'])
+        self.assertEqual(len(rows), len(PORTS) + 1)
+        with open(os.path.join(self.tmp.name, "index.html"), encoding='utf-8') as f:
+            self.assertIn(f"（{len(PORTS)} 条）", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+# tests/test_rescan.py
+"""增量复扫的测试: 端口差异的计算和基线运行的选择"""
+import os
+import tempfile
+import unittest
+
+from utils.findings_store import FindingsStore
+from utils.rescan import baseline_ports, diff_ports, diff_runs, port_map
+
+
+def ports(*specs):
+    return [{'ip': "10.0.0.1", 'port': port, 'state': "open", 'service': service} for port, service in specs]
+
+
+class PortDiffTest(unittest.TestCase):
+    def test_port_map_skips_closed_and_splits_protocol(self):
+        records = ports(("22/tcp", "ssh"), ("53/udp", "domain")) + [{'port': "80/tcp", 'state': "closed"}]
+        self.assertEqual(port_map(records), {(22, 'tcp'): "ssh", (53, 'udp'): "domain"})
+
+    def test_port_map_prefers_scan_service(self):
+        # 横幅识别改写了 service, 对比时使用端口扫描报告的服务名
+        record = {'port': 22, 'protocol': "tcp", 'service': "OpenSSH 8.9", 'scan_service': "ssh"}
+        self.assertEqual(port_map([record]), {(22, 'tcp'): "ssh"})
+
+    def test_diff_ports(self):
+        old = {(22, 'tcp'): "ssh", (80, 'tcp'): "http", (443, 'tcp'): "https"}
+        new = {(22, 'tcp'): "ssh", (80, 'tcp'): "http-proxy", (8080, 'tcp'): "http"}
+
+        changes = {(change['port'], change['change']) for change in diff_ports("10.0.0.1", old, new)}
+
+        self.assertEqual(changes, {(80, 'changed'), (443, 'closed'), (8080, 'new')})
+
+    def test_unchanged_host_has_no_diff(self):
+        same = {(22, 'tcp'): "ssh"}
+        self.assertEqual(diff_ports("10.0.0.1", same, dict(same)), [])
+
+
+class BaselineTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "findings.db")
+
+    def store(self, run_id):
+        store = FindingsStore(self.path, run_id)
+        self.addCleanup(store.close)
+        return store
+
+    def test_only_finished_runs_are_baselines(self):
+        finished = self.store("run-1")
+        finished.add_ports(ports(("22/tcp", "ssh")))
+        finished.finish_run()
+        # 中止的运行有结果但没有结束时间
+        store = self.store("run-2")
+        store.add_ports(ports(("80/tcp", "http")))
+
+        self.assertTrue(store.is_finished("run-1"))
+        self.assertFalse(store.is_finished("run-2"))
+        self.assertFalse(store.is_finished("missing"))
+        self.assertEqual(store.latest_run(exclude="run-3"), "run-1")
+
+    def test_diff_runs(self):
+        self.store("run-1").add_ports(ports(("22/tcp", "ssh"), ("80/tcp", "http")))
+        store = self.store("run-2")
+        store.add_ports(ports(("22/tcp", "ssh"), ("443/tcp", "https")))
+
+        self.assertEqual(baseline_ports(store, "run-1", "10.0.0.1"), {(22, 'tcp'): "ssh", (80, 'tcp'): "http"})
+        changes = {(change['port'], change['change']) for change in diff_runs(store, "run-1", "run-2")}
+        self.assertEqual(changes, {(80, 'closed'), (443, 'new')})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# tests/test_targets.py
+"""目标展开、排除区间索引和中止时剩余范围的测试"""
+import ipaddress
+import os
+import tempfile
+import unittest
+
+from utils.targets import (ExclusionIndex, count_addresses, expand_target, iter_target_addresses,
+                           iter_target_ranges, iter_target_specs, parse_range, range_after)
+
+
+def ip(address):
+    return ipaddress.ip_address(address)
+
+
+class ExpandTargetTest(unittest.TestCase):
+    def test_cidr_skips_network_and_broadcast(self):
+        self.assertEqual(list(expand_target("10.0.0.0/30")), ["10.0.0.1", "10.0.0.2"])
+        self.assertEqual(list(expand_target("10.0.0.0/31")), ["10.0.0.0", "10.0.0.1"])
+        self.assertEqual(list(expand_target("10.0.0.7/32")), ["10.0.0.7"])
+
+    def test_ranges_and_hostnames(self):
+        self.assertEqual(list(expand_target("10.0.0.254-10.0.1.1")),
+                         ["10.0.0.254", "10.0.0.255", "10.0.1.0", "10.0.1.1"])
+        self.assertEqual(list(expand_target("10.0.0.1-3")), ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertEqual(list(expand_target("example.com")), ["example.com"])
+        self.assertEqual(list(expand_target("  ")), [])
+
+    def test_ipv6(self):
+        self.assertEqual(list(expand_target("::1-::3")), ["::1", "::2", "::3"])
+
+    def test_reversed_range_is_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_range("10.0.0.5-10.0.0.1")
+
+    def test_count_addresses(self):
+        self.assertEqual(count_addresses("10.0.0.0/16"), 65536)
+        self.assertEqual(count_addresses("10.0.0.1-50"), 50)
+        self.assertEqual(count_addresses("example.com"), 1)
+
+
+class RangeAfterTest(unittest.TestCase):
+    def test_remaining_part_of_range(self):
+        self.assertEqual(range_after("10.0.0.1-10", None), "10.0.0.1-10")
+        self.assertEqual(range_after("10.0.0.1-10", "10.0.0.4"), "10.0.0.5-10.0.0.10")
+        self.assertEqual(range_after("10.0.0.1-10", "10.0.0.9"), "10.0.0.10")
+        self.assertIsNone(range_after("10.0.0.1-10", "10.0.0.10"))
+
+    def test_cidr_excludes_broadcast(self):
+        self.assertEqual(range_after("10.0.0.0/29", "10.0.0.5"), "10.0.0.6")
+        self.assertIsNone(range_after("10.0.0.0/29", "10.0.0.6"))
+
+    def test_hostname_has_no_remainder(self):
+        self.assertIsNone(range_after("example.com", "example.com"))
+
+
+class ExclusionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ExclusionIndex(["10.0.0.0/30", "10.0.0.3-10.0.0.5", "# 注释", "10.0.0.20", "Gateway.local"])
+
+    def test_overlapping_and_adjacent_intervals_are_merged(self):
+        # 10.0.0.0-3 与 10.0.0.3-5 合并, 另有 10.0.0.20 和一个主机名
+        self.assertEqual(len(self.index), 3)
+
+    def test_contains(self):
+        for address in ("10.0.0.0", "10.0.0.4", "10.0.0.5", "10.0.0.20", "gateway.local"):
+            self.assertTrue(self.index.contains(address), address)
+        for address in ("10.0.0.6", "10.0.0.19", "10.0.0.21", "::1", "other.local"):
+            self.assertFalse(self.index.contains(address), address)
+
+    def test_add_after_query_rebuilds(self):
+        self.assertFalse(self.index.contains("10.0.0.7"))
+        self.index.add("10.0.0.6-10.0.0.8")
+        self.assertTrue(self.index.contains("10.0.0.7"))
+        self.assertEqual(len(self.index), 3)
+
+    def test_allowed_subranges(self):
+        allowed = list(self.index.allowed(ip("10.0.0.2"), ip("10.0.0.25")))
+        self.assertEqual(allowed, [(ip("10.0.0.6"), ip("10.0.0.19")), (ip("10.0.0.21"), ip("10.0.0.25"))])
+
+        self.assertEqual(list(self.index.allowed(ip("10.0.0.1"), ip("10.0.0.5"))), [])
+        self.assertEqual(list(self.index.allowed(ip("10.0.1.0"), ip("10.0.1.1"))),
+                         [(ip("10.0.1.0"), ip("10.0.1.1"))])
+
+    def test_versions_are_separate(self):
+        index = ExclusionIndex(["::1"])
+        self.assertFalse(index.contains("0.0.0.1"))
+        self.assertEqual(list(index.allowed(ip("::"), ip("::2"))), [(ip("::"), ip("::")), (ip("::2"), ip("::2"))])
+
+
+class IterTargetsTest(unittest.TestCase):
+    def test_ranges_with_exclusions(self):
+        exclusions = ExclusionIndex(["10.0.0.2-10.0.0.3", "skip.local"])
+        ranges = list(iter_target_ranges(["10.0.0.0/29", "skip.local", "keep.local", "10.0.0.3"], exclusions))
+        # /29 去掉网络地址和广播地址后是 .1-.6
+        self.assertEqual(ranges, ["10.0.0.1", "10.0.0.4-10.0.0.6", "keep.local"])
+
+    def test_addresses_without_exclusions(self):
+        self.assertEqual(list(iter_target_addresses(["10.0.0.0/30", "10.0.0.9"])),
+                         ["10.0.0.1", "10.0.0.2", "10.0.0.9"])
+
+    def test_specs_from_arguments_and_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "targets.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("10.0.0.1, 10.0.0.2  # 注释\n\n# 整行注释\nexample.com\n")
+            self.assertEqual(list(iter_target_specs(["10.0.1.0/24", "@" + path])),
+                             ["10.0.1.0/24", "10.0.0.1", "10.0.0.2", "example.com"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+# tests/test_webshell.py
+"""WebshellManager 分块上传/下载的测试, 由内存中模拟的 webshell 服务端驱动"""
+import base64
+import hashlib
+import os
+import tempfile
+import unittest
+
+from modules.webshell.codec import CodecPipeline
+from modules.webshell.webshell import WebshellManager
+
+
+class FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.text = content.decode('latin-1')
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeShell:
+    """模拟服务端的分块传输操作, 文件保存在 files 中; fail_chunks 中的偏移量上传失败"""
+
+    def __init__(self, codec: str = 'base64'):
+        self.codec = CodecPipeline.from_spec(codec)
+        self.files = {}
+        self.fail_chunks = set()
+        self.actions = []
+
+    def post(self, url, data, headers=None, timeout=None):
+        action = data.get('action')
+        self.actions.append(action)
+        path = data.get('path')
+        if action == 'stat':
+            return FakeResponse(str(len(self.files[path]) if path in self.files else -1).encode())
+        if action == 'upload_chunk':
+            offset = int(data['offset'])
+            if offset in self.fail_chunks:
+                raise ConnectionError("分块上传失败")
+            chunk = self.codec.decode(data['data'])
+            assert hashlib.md5(chunk).hexdigest() == data['md5']
+            content = bytearray(self.files.get(path, b""))
+            content[offset:offset + len(chunk)] = chunk
+            self.files[path] = bytes(content)
+            return FakeResponse(b"OK")
+        if action == 'truncate':
+            self.files[path] = self.files.get(path, b"")[:int(data['size'])]
+            return FakeResponse(b"")
+        if action == 'md5':
+            return FakeResponse(hashlib.md5(self.files.get(path, b"")).hexdigest().encode())
+        if action == 'download_chunk':
+            offset, length = int(data['offset']), int(data['length'])
+            chunk = self.files[path][offset:offset + length]
+            return FakeResponse(hashlib.md5(chunk).hexdigest().encode() + b":" + self.codec.encode(chunk))
+        raise AssertionError(f"unexpected action {action}")
+
+
+class WebshellTransferTest(unittest.TestCase):
+    def setUp(self):
+        self.shell = FakeShell()
+        self.manager = WebshellManager("http://shell.test/x.php", "pass", chunk_size=4, parallel=2, retries=0)
+        self.manager.http = self.shell
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def local(self, content: bytes) -> str:
+        path = os.path.join(self.tmp.name, "local.bin")
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_upload_new_file(self):
+        self.assertEqual(self.manager.upload(self.local(b"0123456789"), "/r"), "Upload success")
+        self.assertEqual(self.shell.files["/r"], b"0123456789")
+
+    def test_upload_resumes_from_last_full_chunk(self):
+        self.shell.files["/r"] = b"012345"
+        self.assertEqual(self.manager.upload(self.local(b"0123456789"), "/r"), "Upload success")
+        self.assertEqual(self.shell.files["/r"], b"0123456789")
+        uploaded = [action for action in self.shell.actions if action == 'upload_chunk']
+        # 第一个分块已经在远程, 只发送后两个
+        self.assertEqual(len(uploaded), 2)
+
+    def test_upload_over_larger_remote_file(self):
+        self.shell.files["/r"] = b"stale content that is much longer"
+        self.assertEqual(self.manager.upload(self.local(b"new"), "/r"), "Upload success")
+        self.assertEqual(self.shell.files["/r"], b"new")
+
+    def test_upload_empty_file_truncates_remote(self):
+        self.shell.files["/r"] = b"old"
+        self.assertEqual(self.manager.upload(self.local(b""), "/r"), "Upload success")
+        self.assertEqual(self.shell.files["/r"], b"")
+
+    def test_failed_chunk_truncates_to_contiguous_prefix(self):
+        self.shell.fail_chunks = {4}
+        result = self.manager.upload(self.local(b"0123456789"), "/r")
+        self.assertTrue(result.startswith("Upload failed at offset 4"), result)
+        self.assertEqual(self.shell.files["/r"], b"0123")
+
+        self.shell.fail_chunks = set()
+        self.assertEqual(self.manager.upload(self.local(b"0123456789"), "/r"), "Upload success")
+        self.assertEqual(self.shell.files["/r"], b"0123456789")
+
+    def test_download(self):
+        self.shell.files["/r"] = b"remote file content"
+        target = os.path.join(self.tmp.name, "out.bin")
+        self.assertEqual(self.manager.download("/r", target), "Download success")
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b"remote file content")
+
+
+class LegacyShell:
+    """旧版 webshell: 只支持整文件的 upload/download 操作, 其他操作返回空响应"""
+
+    def __init__(self):
+        self.files = {}
+
+    def post(self, url, data, headers=None, timeout=None):
+        action = data.get('action')
+        if action == 'upload':
+            self.files[data['path']] = base64.b64decode(data['data'])
+            return FakeResponse(b"Upload success")
+        if action == 'download':
+            if data['path'] not in self.files:
+                return FakeResponse(b"ERROR: file not found")
+            return FakeResponse(base64.b64encode(self.files[data['path']]))
+        return FakeResponse(b"")
+
+
+class LegacyWebshellTest(unittest.TestCase):
+    def setUp(self):
+        self.shell = LegacyShell()
+        self.manager = WebshellManager("http://shell.test/x.php", "pass", chunk_size=4)
+        self.manager.http = self.shell
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_falls_back_to_single_shot_transfer(self):
+        local = os.path.join(self.tmp.name, "local.bin")
+        with open(local, 'wb') as f:
+            f.write(b"legacy content")
+        self.assertEqual(self.manager.upload(local, "/r"), "Upload success")
+        self.assertEqual(self.shell.files["/r"], b"legacy content")
+
+        target = os.path.join(self.tmp.name, "out.bin")
+        self.assertEqual(self.manager.download("/r", target), "Download success")
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b"legacy content")
+        self.assertTrue(self.manager.download("/missing", target).startswith("ERROR:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
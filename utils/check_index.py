@@ -0,0 +1,195 @@
+# utils/check_index.py
+"""exp/ 目录检测脚本的指纹索引
+
+每个检测目录下放置一个 manifest.yaml 描述适用范围, 例如:
+
+    name: thinkphp5.0.23-rce
+    severity: critical
+    entry: poc.py
+    match:
+      services: [http, http-proxy]
+      ports: [80, 8080]
+      banners: [thinkphp]        # 横幅/响应头中的关键字（不区分大小写）
+      titles: [thinkphp]         # 网页标题中的关键字
+      product: thinkphp
+      versions: ">=5.0.0,<=5.0.23"
+
+所有 manifest 编译成一个 CheckIndex 并缓存到磁盘, 只有 exp/ 目录发生变化时才重新构建.
+用法: python -m utils.check_index [exp_dir]
+"""
+import operator
+import os
+import pickle
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from utils.multi_pattern import MultiPatternMatcher
+
+MANIFEST_NAME = "manifest.yaml"
+DEFAULT_CACHE_PATH = "./tmp/check_index.pickle"
+
+_VERSION_OPERATORS = [
+    (">=", operator.ge),
+    ("<=", operator.le),
+    ("==", operator.eq),
+    ("!=", operator.ne),
+    (">", operator.gt),
+    ("<", operator.lt),
+]
+
+
+def parse_version(version: str) -> Tuple[int, ...]:
+    """把 '5.0.23' 这样的版本号转换为可比较的元组, 非数字部分忽略"""
+    parts = []
+    for part in str(version).strip().split('.'):
+        digits = ''.join(c for c in part if c.isdigit())
+        if not digits:
+            break
+        parts.append(int(digits))
+    return tuple(parts)
+
+
+def parse_version_range(spec: str) -> List[Tuple]:
+    """把 '>=5.0.0,<=5.0.23' 解析为 [(op, version), ...]"""
+    constraints = []
+    for item in str(spec).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        for symbol, op in _VERSION_OPERATORS:
+            if item.startswith(symbol):
+                constraints.append((op, parse_version(item[len(symbol):])))
+                break
+        else:
+            constraints.append((operator.eq, parse_version(item)))
+    return constraints
+
+
+class CheckIndex:
+    """端口/服务名到检测的 O(1) 映射, 以及横幅与标题关键字的多模式匹配器"""
+
+    def __init__(self, manifests: Dict[str, Dict], signature=None):
+        self.manifests = manifests
+        self.signature = signature
+
+        self.by_port: Dict[int, frozenset] = {}
+        self.by_service: Dict[str, frozenset] = {}
+        self.version_ranges: Dict[str, Tuple[str, List[Tuple]]] = {}
+
+        by_port, by_service = {}, {}
+        banners, titles = [], []
+        for name, manifest in manifests.items():
+            match = manifest.get('match', {})
+            for port in match.get('ports', []):
+                by_port.setdefault(int(port), set()).add(name)
+            for service in match.get('services', []):
+                by_service.setdefault(service.lower(), set()).add(name)
+            banners += [(keyword, name) for keyword in match.get('banners', [])]
+            titles += [(keyword, name) for keyword in match.get('titles', [])]
+            if match.get('product') and match.get('versions'):
+                self.version_ranges[name] = (match['product'].lower(), parse_version_range(match['versions']))
+
+        self.by_port = {port: frozenset(names) for port, names in by_port.items()}
+        self.by_service = {service: frozenset(names) for service, names in by_service.items()}
+        self.banner_matcher = MultiPatternMatcher(banners)
+        self.title_matcher = MultiPatternMatcher(titles)
+
+    def lookup(self, finding: Dict) -> List[str]:
+        """返回适用于该发现的检测名称
+
+        :param finding: 端口扫描或指纹识别结果, 可包含 port/service/banner/title/product/version
+        """
+        candidates = set()
+
+        port = str(finding.get('port', '')).split('/')[0]
+        if port.isdigit():
+            candidates |= self.by_port.get(int(port), frozenset())
+        service = finding.get('service')
+        if service:
+            candidates |= self.by_service.get(service.lower(), frozenset())
+        # 限定了版本范围的检测仅凭端口/服务名无法判断是否适用, 只根据横幅、标题或已识别的产品匹配
+        candidates = {name for name in candidates if name not in self.version_ranges}
+
+        product = (finding.get('product') or '').lower()
+        if product:
+            candidates |= {name for name, (check_product, _) in self.version_ranges.items() if check_product == product}
+        if finding.get('banner'):
+            candidates |= self.banner_matcher.find(finding['banner'])
+        if finding.get('title'):
+            candidates |= self.title_matcher.find(finding['title'])
+
+        version = finding.get('version')
+        if product and version:
+            parsed = parse_version(version)
+            candidates = {name for name in candidates if self._version_applies(name, product, parsed)}
+
+        return sorted(candidates)
+
+    def _version_applies(self, name: str, product: str, version: Tuple[int, ...]) -> bool:
+        """已识别出产品和版本时, 排除版本范围不匹配的检测"""
+        if name not in self.version_ranges:
+            return True
+        check_product, constraints = self.version_ranges[name]
+        if check_product != product:
+            return True
+        return all(op(version, bound) for op, bound in constraints)
+
+    # region 构建与缓存
+    @staticmethod
+    def directory_signature(exp_dir: str) -> Tuple:
+        """exp/ 下所有文件的路径、大小和修改时间, 任何变化都会导致索引重建"""
+        entries = []
+        for root, dirs, files in os.walk(exp_dir):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for file_name in sorted(files):
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                entries.append((os.path.relpath(path, exp_dir), stat.st_size, stat.st_mtime_ns))
+        return tuple(entries)
+
+    @classmethod
+    def build(cls, exp_dir: str) -> "CheckIndex":
+        """读取 exp_dir 下所有检测目录的 manifest.yaml"""
+        manifests = {}
+        for check_dir in sorted(os.listdir(exp_dir)):
+            manifest_path = os.path.join(exp_dir, check_dir, MANIFEST_NAME)
+            if not os.path.isfile(manifest_path):
+                continue
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = yaml.safe_load(f) or {}
+            manifest.setdefault('name', check_dir)
+            manifest.setdefault('entry', "poc.py")
+            manifest['path'] = os.path.join(exp_dir, check_dir, manifest['entry'])
+            manifests[manifest['name']] = manifest
+        return cls(manifests, cls.directory_signature(exp_dir))
+
+    @classmethod
+    def load(cls, exp_dir: str = "exp", cache_path: Optional[str] = DEFAULT_CACHE_PATH) -> "CheckIndex":
+        """优先读取缓存, exp/ 有变化或缓存不可用时重新构建并写回缓存"""
+        signature = cls.directory_signature(exp_dir)
+        if cache_path and os.path.isfile(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    index = pickle.load(f)
+                if isinstance(index, cls) and index.signature == signature:
+                    return index
+            except Exception:
+                pass
+
+        index = cls.build(exp_dir)
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(index, f)
+            os.replace(tmp_path, cache_path)
+        return index
+    # endregion
+
+
+if __name__ == '__main__':
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else "exp"
+    built = CheckIndex.load(target_dir)
+    print(f"已索引 {len(built.manifests)} 个检测, 端口 {len(built.by_port)} 个, 服务 {len(built.by_service)} 个")
@@ -0,0 +1,272 @@
+# utils/findings_store.py
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS ports (
+    run_id    TEXT NOT NULL,
+    host      TEXT NOT NULL,
+    port      INTEGER NOT NULL,
+    protocol  TEXT NOT NULL DEFAULT 'tcp',
+    state     TEXT,
+    service   TEXT,
+    scan_service TEXT,
+    product   TEXT,
+    version   TEXT,
+    banner    TEXT,
+    title     TEXT,
+    tech      TEXT,
+    seen_at   REAL,
+    PRIMARY KEY (run_id, host, port, protocol)
+);
+CREATE INDEX IF NOT EXISTS idx_ports_host ON ports (host);
+CREATE INDEX IF NOT EXISTS idx_ports_port_service ON ports (port, service);
+CREATE INDEX IF NOT EXISTS idx_ports_service ON ports (service);
+CREATE INDEX IF NOT EXISTS idx_ports_product ON ports (product);
+CREATE TABLE IF NOT EXISTS vulns (
+    run_id     TEXT NOT NULL,
+    host       TEXT NOT NULL,
+    port       INTEGER,
+    protocol   TEXT,
+    service    TEXT,
+    check_name TEXT NOT NULL,
+    severity   TEXT,
+    url        TEXT,
+    found_at   REAL,
+    PRIMARY KEY (run_id, host, port, protocol, check_name)
+);
+CREATE INDEX IF NOT EXISTS idx_vulns_host ON vulns (host);
+CREATE INDEX IF NOT EXISTS idx_vulns_severity ON vulns (severity);
+CREATE INDEX IF NOT EXISTS idx_vulns_check ON vulns (check_name);
+"""
+
+# 多个阶段（端口扫描/横幅/web指纹）的结果合并到同一行, 新值为空时保留旧值;
+# service 会被横幅识别改写, scan_service 保存端口扫描报告的原始服务名, 增量复扫按它对比
+_UPSERT_PORT = """
+INSERT INTO ports (run_id, host, port, protocol, state, service, scan_service, product, version, banner, title, tech,
+                   seen_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (run_id, host, port, protocol) DO UPDATE SET
+    state   = COALESCE(excluded.state, state),
+    service = COALESCE(excluded.service, service),
+    scan_service = COALESCE(excluded.scan_service, scan_service),
+    product = COALESCE(excluded.product, product),
+    version = COALESCE(excluded.version, version),
+    banner  = COALESCE(excluded.banner, banner),
+    title   = COALESCE(excluded.title, title),
+    tech    = COALESCE(excluded.tech, tech),
+    seen_at = excluded.seen_at
+"""
+
+_INSERT_VULN = """
+INSERT OR REPLACE INTO vulns (run_id, host, port, protocol, service, check_name, severity, url, found_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def split_port(port) -> Tuple[Optional[int], str]:
+    """'80/tcp' -> (80, 'tcp')"""
+    number, _, protocol = str(port).partition('/')
+    return (int(number) if number.isdigit() else None), (protocol or 'tcp')
+
+
+class FindingsStore:
+    """基于 SQLite 的结果存储, 批量事务写入, host/port/service/severity 均有索引
+
+    写入和查询共用一个连接并由锁串行化; 查询结果以生成器返回, 不会一次性载入内存
+    """
+
+    def __init__(self, path: str = "./data/findings.db", run_id: Optional[str] = None):
+        """
+        :param path: 数据库文件路径, ':memory:' 表示内存数据库
+        :param run_id: 本次运行的标识, 默认使用启动时间
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._run_recorded = False
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+
+    def _migrate(self) -> None:
+        """旧版本创建的结果库缺少的列在这里补上"""
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(ports)")}
+        if 'scan_service' not in columns:
+            self._conn.execute("ALTER TABLE ports ADD COLUMN scan_service TEXT")
+
+    # region 写入
+    def _record_run(self) -> None:
+        """第一次写入时登记本次运行, 只做查询时不会产生空的运行记录"""
+        if not self._run_recorded:
+            self._conn.execute("INSERT OR IGNORE INTO runs (run_id, started_at) VALUES (?, ?)",
+                               (self.run_id, time.time()))
+            self._run_recorded = True
+
+    def add_ports(self, records: Iterable[Dict]) -> int:
+        """在一个事务中批量写入端口/服务记录, 返回写入条数"""
+        now = time.time()
+        rows = []
+        for record in records:
+            port, protocol = split_port(record.get('port'))
+            if port is None or not record.get('ip'):
+                continue
+            tech = record.get('tech')
+            rows.append((
+                self.run_id, record['ip'], port, protocol,
+                record.get('state'), record.get('service'), record.get('scan_service') or record.get('service'),
+                record.get('product'), record.get('version'),
+                record.get('banner'), record.get('title'),
+                ",".join(tech) if tech else None,
+                now
+            ))
+        if rows:
+            with self._lock, self._conn:
+                self._record_run()
+                self._conn.executemany(_UPSERT_PORT, rows)
+        return len(rows)
+
+    def add_vulns(self, records: Iterable[Dict]) -> int:
+        """在一个事务中批量写入漏洞记录, 返回写入条数"""
+        now = time.time()
+        rows = []
+        for record in records:
+            port, protocol = split_port(record.get('port'))
+            rows.append((
+                self.run_id, record.get('ip'), port, protocol, record.get('service'),
+                record.get('check'), record.get('severity'), record.get('url'), now
+            ))
+        if rows:
+            with self._lock, self._conn:
+                self._record_run()
+                self._conn.executemany(_INSERT_VULN, rows)
+        return len(rows)
+
+    def carry_forward(self, host: str, from_run: str) -> int:
+        """把某主机在 from_run 中的端口和漏洞记录复制到本次运行, 增量复扫时未变化的主机不再重新检测
+
+        :return: 复制的端口记录数
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._record_run()
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO ports (run_id, host, port, protocol, state, service, scan_service, product, "
+                "version, banner, title, tech, seen_at) "
+                "SELECT ?, host, port, protocol, state, service, scan_service, product, version, banner, title, tech, ? "
+                "FROM ports WHERE run_id = ? AND host = ?",
+                (self.run_id, now, from_run, host))
+            self._conn.execute(
+                "INSERT OR IGNORE INTO vulns (run_id, host, port, protocol, service, check_name, severity, url, found_at) "
+                "SELECT ?, host, port, protocol, service, check_name, severity, url, found_at "
+                "FROM vulns WHERE run_id = ? AND host = ?",
+                (self.run_id, from_run, host))
+        return cursor.rowcount
+
+    def finish_run(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), self.run_id))
+    # endregion
+
+    # region 查询
+    def _iter_query(self, sql: str, params: List, batch_size: int = 1000) -> Iterator[Dict]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchmany(batch_size)
+        while rows:
+            for row in rows:
+                yield dict(row)
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+
+    @staticmethod
+    def _where(conditions: Dict) -> Tuple[str, List]:
+        clauses, params = [], []
+        for column, value in conditions.items():
+            if value is None:
+                continue
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_ports(self,
+                    host: Optional[str] = None,
+                    port: Optional[int] = None,
+                    service: Optional[str] = None,
+                    product: Optional[str] = None,
+                    state: Optional[str] = 'open',
+                    run_id: Optional[str] = None,
+                    limit: Optional[int] = None) -> Iterator[Dict]:
+        """按条件查询端口记录, 例如 query_ports(port=8080, product='ThinkPHP')"""
+        where, params = self._where({
+            'host': host, 'port': port, 'service': service,
+            'product': product, 'state': state, 'run_id': run_id
+        })
+        sql = f"SELECT * FROM ports{where} ORDER BY host, port"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._iter_query(sql, params)
+
+    def hosts_with(self,
+                   port: Optional[int] = None,
+                   service: Optional[str] = None,
+                   product: Optional[str] = None,
+                   run_id: Optional[str] = None) -> List[str]:
+        """返回满足条件的开放端口所在主机, 例如 8080 端口运行某产品的所有主机"""
+        where, params = self._where({
+            'port': port, 'service': service, 'product': product, 'state': 'open', 'run_id': run_id
+        })
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT DISTINCT host FROM ports{where}", params)]
+
+    def query_vulns(self,
+                    host: Optional[str] = None,
+                    severity: Optional[str] = None,
+                    check: Optional[str] = None,
+                    run_id: Optional[str] = None,
+                    limit: Optional[int] = None) -> Iterator[Dict]:
+        where, params = self._where({
+            'host': host, 'severity': severity, 'check_name': check, 'run_id': run_id
+        })
+        sql = f"SELECT * FROM vulns{where} ORDER BY host, port"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self._iter_query(sql, params)
+
+    def runs(self) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM runs ORDER BY started_at")]
+
+    def latest_run(self, exclude: Optional[str] = None) -> Optional[str]:
+        """最近一次正常结束的运行, 用作增量复扫的基线"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id FROM runs WHERE finished_at IS NOT NULL AND run_id != ? "
+                "ORDER BY started_at DESC LIMIT 1", (exclude or "",)).fetchone()
+        return row[0] if row else None
+
+    def is_finished(self, run_id: str) -> bool:
+        """运行是否正常结束; 中止或出错的运行没有结束时间, 结果不完整"""
+        with self._lock:
+            row = self._conn.execute("SELECT finished_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row is not None and row[0] is not None
+    # endregion
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
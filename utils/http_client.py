@@ -0,0 +1,261 @@
+# utils/http_client.py
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.rate_limiter import get_rate_limiter
+
+requests.packages.urllib3.disable_warnings()
+
+
+class ResponseCache:
+    """GET 响应的 LRU 缓存, 过期后带 ETag 做条件请求, 304 时直接复用缓存
+
+    缓存键包含 URL 和会影响响应内容的请求参数（显式传入的请求头、cookies、params、是否跟随跳转）,
+    同一 URL 按不同 Cookie/Accept 请求得到的页面不会互相覆盖; 条目数和响应体总字节数都有上限, 超出时淘汰最久未使用的条目
+    """
+
+    # 这些请求参数会改变服务端返回的内容, 作为缓存键的一部分
+    KEY_ARGS = ('headers', 'cookies', 'params', 'allow_redirects')
+    # 条件请求头由 get_cached 自己添加, 不参与缓存键
+    IGNORED_HEADERS = {'if-none-match', 'if-modified-since'}
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 600, max_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def make_key(cls, url: str, kwargs: Dict[str, Any]) -> tuple:
+        key = [url]
+        for name in cls.KEY_ARGS:
+            value = kwargs.get(name)
+            if isinstance(value, dict):
+                if name == 'headers':
+                    value = {k.lower(): v for k, v in value.items() if k.lower() not in cls.IGNORED_HEADERS}
+                value = tuple(sorted((str(k), str(v)) for k, v in value.items()))
+            elif isinstance(value, list):
+                value = tuple(value)
+            key.append(value)
+        return tuple(key)
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        """返回 (response, 缓存时间, 读取上限), 读取上限为 None 表示响应体是完整的; 不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            response, cached_at, _, limit = entry
+            return response, cached_at, limit
+
+    def put(self, key: tuple, response: requests.Response, limit: Optional[int] = None) -> None:
+        size = len(response.content or b"")
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            if size > self.max_bytes:
+                # 单个响应超过总上限, 不缓存
+                return
+            self._entries[key] = (response, time.monotonic(), size, limit)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted[2]
+
+    def is_fresh(self, cached_at: float) -> bool:
+        return time.monotonic() - cached_at < self.ttl
+
+    @staticmethod
+    def covers(response: requests.Response, limit: Optional[int], max_body: Optional[int]) -> bool:
+        """缓存的响应体是否满足本次读取: 完整的响应, 或截断的长度不小于本次的读取上限"""
+        if limit is None or len(response.content) < limit:
+            return True
+        return max_body is not None and max_body <= limit
+
+
+class HttpClient:
+    """共享的 HTTP 客户端
+
+    每个主机维护一个 keep-alive 连接池, 同一主机的多次请求复用 TCP/TLS 连接;
+    连接失败和 502/503/504 按指数退避重试, 非幂等请求只在连接阶段失败时重试, 避免重复提交
+    """
+
+    def __init__(self,
+                 pool_connections: int = 64,
+                 pool_maxsize: int = 16,
+                 retries: int = 2,
+                 backoff_factor: float = 0.3,
+                 timeout: float = 10,
+                 verify: bool = False,
+                 headers: Optional[Dict[str, str]] = None,
+                 cache_size: int = 4096,
+                 cache_ttl: float = 600,
+                 cache_max_bytes: int = 256 * 1024 * 1024):
+        """
+        :param pool_connections: 缓存连接池的主机数量上限
+        :param pool_maxsize: 单个主机连接池的最大连接数, 用满后请求会等待空闲连接
+        :param retries: 最大重试次数
+        :param backoff_factor: 重试退避系数, 第 n 次重试前等待 backoff_factor * 2^(n-1) 秒
+        :param timeout: 默认超时时间（秒）
+        :param verify: 是否校验证书
+        :param cache_size: get_cached 缓存的响应数量上限
+        :param cache_ttl: 缓存的响应在该时间（秒）内直接复用, 过期后按 ETag 重新校验
+        :param cache_max_bytes: get_cached 缓存的响应体总字节数上限
+        """
+        self.timeout = timeout
+        self.verify = verify
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+            pool_block=True
+        )
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self.cache = ResponseCache(cache_size, cache_ttl, cache_max_bytes)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        # 每个请求从全局限速器取令牌（urllib3 内部的重试不再计入）, 暂停时在这里等待
+        get_rate_limiter().acquire(urlsplit(url).hostname or "")
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('verify', self.verify)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_limited(self, url: str, max_body: Optional[int] = None, **kwargs) -> requests.Response:
+        """GET 时最多读取 max_body 字节的响应体, 超出部分不下载, 连接直接关闭"""
+        if max_body is None:
+            return self.get(url, **kwargs)
+        response = self.get(url, stream=True, **kwargs)
+        try:
+            chunks, size = [], 0
+            for chunk in response.iter_content(chunk_size=min(max_body, 65536) or 1):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= max_body:
+                    break
+            response._content = b"".join(chunks)[:max_body]
+        finally:
+            # 没有读完的连接不能放回连接池, close 会直接断开
+            response.close()
+        return response
+
+    def get_cached(self, url: str, max_body: Optional[int] = None, **kwargs) -> requests.Response:
+        """带缓存的 GET, 指纹识别阶段抓取过的页面可以被后续检测直接复用
+
+        :param max_body: 响应体最多读取的字节数, None 表示完整读取; 截断的缓存只复用给读取上限不更大的调用
+        """
+        key = self.cache.make_key(url, kwargs)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.covers(entry[0], entry[2], max_body):
+            cached, cached_at, limit = entry
+            if self.cache.is_fresh(cached_at):
+                return cached
+            etag = cached.headers.get('ETag')
+            if etag:
+                headers = dict(kwargs.pop('headers', None) or {})
+                headers['If-None-Match'] = etag
+                response = self.get_limited(url, max_body, headers=headers, **kwargs)
+                if response.status_code == 304:
+                    self.cache.put(key, cached, limit)
+                    return cached
+                self.cache.put(key, response, max_body)
+                return response
+
+        response = self.get_limited(url, max_body, **kwargs)
+        self.cache.put(key, response, max_body)
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncHttpClient:
+    """HttpClient 的 asyncio 版本
+
+    请求在默认线程池中执行, 与同步客户端共享同一组连接池,
+    并发量由信号量限制, 默认等于单个主机的连接池容量, 多出的请求在事件循环中等待, 不占用线程池
+    """
+
+    def __init__(self, client: Optional[HttpClient] = None, concurrency: Optional[int] = None):
+        self._client = client or get_http_client()
+        self._semaphore = asyncio.Semaphore(concurrency or self._client.pool_maxsize)
+
+    async def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        async with self._semaphore:
+            return await asyncio.to_thread(self._client.request, method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> requests.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> requests.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def get_cached(self, url: str, **kwargs) -> requests.Response:
+        async with self._semaphore:
+            return await asyncio.to_thread(self._client.get_cached, url, **kwargs)
+
+
+_shared_client: Optional[HttpClient] = None
+_shared_lock = threading.Lock()
+
+
+def _load_http_config(config_path: str = "config/config.yaml") -> Dict[str, Any]:
+    """读取 config.yaml 中的 http 配置, 配置文件不存在时使用默认值"""
+    if not os.path.exists(config_path):
+        return {}
+    with open(config_path, encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    return config.get('http', {}) or {}
+
+
+def get_http_client() -> HttpClient:
+    """获取进程内共享的 HttpClient, 检测脚本、web模块和webshell都应使用它"""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = HttpClient(**_load_http_config())
+    return _shared_client
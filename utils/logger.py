@@ -1,15 +1,60 @@
 # utils/logger.py
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from typing import Optional, Dict, Any
 from pathlib import Path
 
+import yaml
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON, 便于日志平台采集"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# 不可变的参数可以留到后台线程再格式化
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """进程内队列不需要序列化, 直接把原始记录放入队列
+
+    参数都是不可变的基本类型时, 消息的格式化在后台线程完成; 含有列表、字典、对象等参数时,
+    它们在入队后可能被调用方修改, 所以在当前线程先格式化出消息, 后台线程只负责输出
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
 
-# todo:补充一下logger逻辑
 class LogManager:
     _initialized = False
     _loggers = {}  # 缓存已创建的logger
+    _listener: Optional[QueueListener] = None
+    _lock = threading.Lock()
 
     @classmethod
     def initialize(cls,
@@ -18,67 +63,77 @@ class LogManager:
                    file_level: str = "DEBUG",
                    max_bytes: int = 10 * 1024 * 1024,  # 10MB
                    backup_count: int = 5,
-                   enable_file_log: bool = True):
+                   enable_file_log: bool = True,
+                   json_format: bool = False):
         """
         初始化全局日志配置
+        调用线程只把日志记录放入队列, 格式化和写控制台/文件都由后台的 QueueListener 线程完成
         :param log_dir: 日志存储目录
         :param console_level: 控制台日志级别
         :param file_level: 文件日志级别
         :param max_bytes: 单个日志文件最大大小（字节）
         :param backup_count: 保留的备份文件数量
         :param enable_file_log: 是否启用文件日志
+        :param json_format: 文件日志是否输出为每行一个 JSON
         """
-        if cls._initialized:
-            return
-
-        # 创建日志目录
-        log_path = Path(log_dir)
-        log_path.mkdir(parents=True, exist_ok=True)
-
-        # 基础日志格式
-        formatter = logging.Formatter(
-            '[%(asctime)s] [%(levelname)s] [%(module)s:%(lineno)d] - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+        with cls._lock:
+            if cls._initialized:
+                return
 
-        # 控制台Handler
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(formatter)
-        console_handler.setLevel(console_level)
-
-        # 文件Handler（按大小轮转）
-        handlers = [console_handler]
-
-        if enable_file_log:
-            # 主日志文件
-            file_handler = RotatingFileHandler(
-                filename=log_path / "app.log",
-                maxBytes=max_bytes,
-                backupCount=backup_count,
-                encoding='utf-8'
-            )
-            file_handler.setFormatter(formatter)
-            file_handler.setLevel(file_level)
-            handlers.append(file_handler)
-
-            # 错误日志单独记录
-            error_handler = RotatingFileHandler(
-                filename=log_path / "error.log",
-                maxBytes=max_bytes,
-                backupCount=backup_count,
-                encoding='utf-8'
+            # 基础日志格式
+            formatter = logging.Formatter(
+                '[%(asctime)s] [%(levelname)s] [%(module)s:%(lineno)d] - %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
             )
-            error_handler.setFormatter(formatter)
-            error_handler.setLevel(logging.WARNING)
-            handlers.append(error_handler)
-
-        # 配置根logger
-        root_logger = logging.getLogger()
-        root_logger.setLevel(logging.DEBUG)
-        for handler in handlers:
-            root_logger.addHandler(handler)
-
-        cls._initialized = True
+            file_formatter = JsonFormatter(datefmt='%Y-%m-%d %H:%M:%S') if json_format else formatter
+
+            # 控制台Handler
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(formatter)
+            console_handler.setLevel(console_level)
+
+            # 文件Handler（按大小轮转）
+            handlers = [console_handler]
+
+            if enable_file_log:
+                # 创建日志目录
+                log_path = Path(log_dir)
+                log_path.mkdir(parents=True, exist_ok=True)
+
+                # 主日志文件
+                file_handler = RotatingFileHandler(
+                    filename=log_path / "app.log",
+                    maxBytes=max_bytes,
+                    backupCount=backup_count,
+                    encoding='utf-8'
+                )
+                file_handler.setFormatter(file_formatter)
+                file_handler.setLevel(file_level)
+                handlers.append(file_handler)
+
+                # 错误日志单独记录
+                error_handler = RotatingFileHandler(
+                    filename=log_path / "error.log",
+                    maxBytes=max_bytes,
+                    backupCount=backup_count,
+                    encoding='utf-8'
+                )
+                error_handler.setFormatter(file_formatter)
+                error_handler.setLevel(logging.WARNING)
+                handlers.append(error_handler)
+
+            # 所有handler挂在后台监听线程上, 根logger只挂一个入队的handler
+            log_queue = queue.SimpleQueue()
+            cls._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            cls._listener.start()
+            atexit.register(cls.shutdown)
+
+            # 根logger的级别取各handler中最低的级别, 低于该级别的调用在调用方直接返回, 不会创建日志记录
+            root_logger = logging.getLogger()
+            root_logger.setLevel(min(handler.level for handler in handlers))
+            root_logger.addHandler(_DeferredQueueHandler(log_queue))
+
+            cls._initialized = True
 
         # 添加未捕获异常处理
         def handle_exception(exc_type, exc_value, exc_traceback):
@@ -94,6 +149,30 @@ class LogManager:
 
         sys.excepthook = handle_exception
 
+    @classmethod
+    def shutdown(cls) -> None:
+        """停止后台监听线程, 队列中剩余的日志会先全部写出"""
+        with cls._lock:
+            if cls._listener is not None:
+                cls._listener.stop()
+                cls._listener = None
+
+    @staticmethod
+    def _load_global_config(config_path: str = "config/config.yaml") -> Dict[str, Any]:
+        """从 config.yaml 的 global 段读取日志配置, 配置文件不存在时使用默认值"""
+        if not os.path.exists(config_path):
+            return {}
+        with open(config_path, encoding='utf-8') as f:
+            config = (yaml.safe_load(f) or {}).get('global', {}) or {}
+        options = {
+            'log_dir': config.get('log_dir'),
+            'console_level': config.get('log_level'),
+            'file_level': config.get('log_file_level'),
+            'json_format': config.get('log_format') == 'json',
+            'enable_file_log': config.get('log_to_file'),
+        }
+        return {key: value for key, value in options.items() if value is not None}
+
     @classmethod
     def get_logger(cls,
                    name: Optional[str] = None,
@@ -103,8 +182,9 @@ class LogManager:
         :param name: logger名称（通常使用__name__）
         :param extra_handlers: 额外的处理器配置
         """
+        # 第一次获取logger时才初始化, 只导入本模块不会创建日志目录和后台线程
         if not cls._initialized:
-            cls.initialize()
+            cls.initialize(**cls._load_global_config())
 
         logger = logging.getLogger(name)
 
@@ -154,15 +234,5 @@ class LogManager:
         return handler
 
 
-# 初始化日志配置（在项目启动时调用）
-LogManager.initialize(
-    log_dir="logs",
-    console_level="INFO",
-    file_level="DEBUG",
-    max_bytes=10 * 1024 * 1024,  # 10MB
-    backup_count=7,
-    enable_file_log=True
-)
-
 # 快捷访问方式
 get_logger = LogManager.get_logger
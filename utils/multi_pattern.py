@@ -0,0 +1,68 @@
+# utils/multi_pattern.py
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+
+class MultiPatternMatcher:
+    """基于 Aho-Corasick 自动机的多关键字匹配器
+
+    所有关键字一次编译, 匹配时只扫描一遍文本, 耗时与关键字数量无关.
+    关键字统一按小写匹配, 每个关键字可以关联多个值（例如检测名称）.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Hashable]] = ()):
+        # 状态转移表: goto[state][char] -> state, 状态 0 为根节点
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[Hashable]] = [set()]
+
+        for keyword, value in patterns:
+            self._add(keyword.lower(), value)
+        self._build()
+
+    def _add(self, keyword: str, value: Hashable) -> None:
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].add(value)
+
+    def _build(self) -> None:
+        """按层次计算失败指针, 并把失败链上的输出合并到当前状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def find(self, text: str) -> Set[Hashable]:
+        """返回在 text 中出现过的所有关键字对应的值"""
+        found = set()
+        if not text or not self:
+            return found
+
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
@@ -0,0 +1,243 @@
+# utils/report_exporter.py
+"""流式报告导出
+
+结果逐条写入 JSONL / CSV / 分页 HTML, 任何时候内存中最多只有一页 HTML 的内容,
+既可以在引擎运行时由 modules/storage/report_exporter.py 边扫边写,
+也可以在扫描结束后从结果库导出:
+
+    python -m utils.report_exporter --db ./data/findings.db --run 20250101-120000 --out ./reports
+"""
+import argparse
+import csv
+import html
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from utils.findings_store import FindingsStore, split_port
+
+PORT_FIELDS = ['ip', 'port', 'protocol', 'state', 'service', 'product', 'version', 'title', 'tech']
+VULN_FIELDS = ['ip', 'port', 'service', 'check', 'severity', 'url']
+DIFF_FIELDS = ['change', 'ip', 'port', 'protocol', 'old_service', 'new_service']
+FIELDS = {'ports': PORT_FIELDS, 'vulns': VULN_FIELDS, 'diff': DIFF_FIELDS}
+
+_TITLES = {'ports': "端口与服务", 'vulns': "漏洞", 'diff': "与上次扫描的差异"}
+
+
+def normalize(kind: str, record: Dict) -> Dict:
+    """把总线消息或结果库中的记录统一成导出的字段"""
+    record = dict(record)
+    if 'host' in record and 'ip' not in record:
+        record['ip'] = record['host']
+    if 'check_name' in record and 'check' not in record:
+        record['check'] = record['check_name']
+    if kind == 'ports' and '/' in str(record.get('port', '')):
+        record['port'], record['protocol'] = split_port(record['port'])
+    if isinstance(record.get('tech'), (list, tuple, set)):
+        record['tech'] = ",".join(record['tech'])
+    return {field: record.get(field) for field in FIELDS[kind]}
+
+
+class JsonlWriter:
+    def __init__(self, path: str, fields: List[str]):
+        # 与 HtmlWriter 一致覆盖已有文件, 重复导出同一次运行不会产生重复的行
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CsvWriter:
+    def __init__(self, path: str, fields: List[str]):
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=fields)
+        self._writer.writeheader()
+
+    def write(self, record: Dict) -> None:
+        self._writer.writerow(record)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class HtmlWriter:
+    """分页的静态 HTML 报告, 每写满 page_size 条生成一页, 关闭时生成带分页链接的 index"""
+
+    def __init__(self, path: str, fields: List[str], page_size: int = 1000, title: str = ""):
+        self.directory = os.path.dirname(path) or "."
+        self.prefix = os.path.splitext(os.path.basename(path))[0]
+        self.fields = fields
+        self.page_size = page_size
+        self.title = title
+        self.pages = 0
+        self.total = 0
+        self._file = None
+        self._rows = 0
+
+    def _page_name(self, page: int) -> str:
+        return f"{self.prefix}_{page:04d}.html"
+
+    def _open_page(self) -> None:
+        self.pages += 1
+        self._rows = 0
+        self._file = open(os.path.join(self.directory, self._page_name(self.pages)), 'w', encoding='utf-8')
+        self._file.write(
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(self.title)} - {self.pages}</title></head><body>"
+            f"<h2>{html.escape(self.title)} 第 {self.pages} 页</h2><table border=\"1\"><tr>"
+            + "".join(f"<th>{html.escape(field)}</th>" for field in self.fields) + "</tr>\n"
+        )
+
+    def _close_page(self) -> None:
+        prev_link = f"<a href=\"{self._page_name(self.pages - 1)}\">上一页</a> " if self.pages > 1 else ""
+        # 下一页此时还不存在, 最后一页的链接在 close 时补上
+        self._file.write(f"</table><p>{prev_link}<a href=\"index.html\">目录</a> "
+                         f"<!--next--></p></body></html>")
+        self._file.close()
+        self._file = None
+
+    def write(self, record: Dict) -> None:
+        if self._file is None:
+            self._open_page()
+        self._file.write("<tr>" + "".join(
+            f"<td>{html.escape('' if record.get(field) is None else str(record.get(field)))}</td>"
+            for field in self.fields
+        ) + "</tr>\n")
+        self._rows += 1
+        self.total += 1
+        if self._rows >= self.page_size:
+            self._close_page()
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._close_page()
+        # 补上每页的“下一页”链接, 每次只读写一页
+        for page in range(1, self.pages):
+            path = os.path.join(self.directory, self._page_name(page))
+            with open(path, encoding='utf-8') as f:
+                content = f.read()
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content.replace("<!--next-->", f"<a href=\"{self._page_name(page + 1)}\">下一页</a>", 1))
+
+    def index_entry(self) -> str:
+        links = " ".join(f"<a href=\"{self._page_name(page)}\">{page}</a>" for page in range(1, self.pages + 1))
+        return f"<h3>{html.escape(self.title)}（{self.total} 条）</h3><p>{links}</p>"
+
+
+WRITERS = {
+    'jsonl': JsonlWriter,
+    'csv': CsvWriter,
+    'html': HtmlWriter,
+}
+
+
+class ReportExporter:
+    """按类型（ports/vulns/diff）和格式分发记录, 每条记录写完即落盘, 不在内存中累积"""
+
+    def __init__(self,
+                 out_dir: str,
+                 formats: Iterable[str] = ('jsonl', 'csv', 'html'),
+                 page_size: int = 1000,
+                 kinds: Iterable[str] = ('ports', 'vulns')):
+        """
+        :param out_dir: 报告输出目录
+        :param formats: 输出格式, 可选 jsonl/csv/html
+        :param page_size: HTML 报告每页的条数
+        :param kinds: 需要输出的记录类型
+        """
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self._writers: Dict[str, list] = {}
+        for kind in kinds:
+            fields = FIELDS[kind]
+            writers = []
+            for fmt in formats:
+                if fmt not in WRITERS:
+                    raise ValueError(f"不支持的报告格式: {fmt}")
+                path = os.path.join(out_dir, f"{kind}.{fmt}")
+                if fmt == 'html':
+                    writers.append(HtmlWriter(path, fields, page_size, _TITLES[kind]))
+                else:
+                    writers.append(WRITERS[fmt](path, fields))
+            self._writers[kind] = writers
+
+    def write(self, kind: str, record: Dict) -> None:
+        record = normalize(kind, record)
+        for writer in self._writers[kind]:
+            writer.write(record)
+
+    def flush(self) -> None:
+        for writers in self._writers.values():
+            for writer in writers:
+                writer.flush()
+
+    def close(self) -> None:
+        entries = []
+        for writers in self._writers.values():
+            for writer in writers:
+                writer.close()
+                if isinstance(writer, HtmlWriter):
+                    entries.append(writer.index_entry())
+        if entries:
+            with open(os.path.join(self.out_dir, "index.html"), 'w', encoding='utf-8') as f:
+                f.write("<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>扫描报告</title></head>"
+                        "<body><h2>扫描报告</h2>" + "".join(entries) + "</body></html>")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def export_run(store: FindingsStore,
+               out_dir: str,
+               run_id: Optional[str] = None,
+               formats: Iterable[str] = ('jsonl', 'csv', 'html'),
+               page_size: int = 1000) -> None:
+    """从结果库导出一次运行的报告, 查询结果逐批读取, 内存占用与结果数量无关"""
+    with ReportExporter(out_dir, formats, page_size) as exporter:
+        for row in store.query_ports(run_id=run_id, state=None):
+            exporter.write('ports', row)
+        for row in store.query_vulns(run_id=run_id):
+            exporter.write('vulns', row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从结果库导出报告")
+    parser.add_argument("--db", default="./data/findings.db", help="结果库路径")
+    parser.add_argument("--run", help="运行标识, 默认最近一次运行")
+    parser.add_argument("--out", default="./reports", help="输出目录")
+    parser.add_argument("--formats", default="jsonl,csv,html", help="输出格式, 逗号分隔")
+    parser.add_argument("--page-size", type=int, default=1000, help="HTML 每页条数")
+    args = parser.parse_args()
+
+    store = FindingsStore(args.db)
+    run_id = args.run
+    if run_id is None:
+        runs = store.runs()
+        if not runs:
+            print("结果库中没有运行记录")
+            return
+        run_id = runs[-1]['run_id']
+    out_dir = os.path.join(args.out, run_id)
+    export_run(store, out_dir, run_id, args.formats.split(','), args.page_size)
+    store.close()
+    print(f"报告已导出到 {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
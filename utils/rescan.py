@@ -0,0 +1,107 @@
+# utils/rescan.py
+"""增量复扫: 把本次端口扫描的结果与结果库中上一次运行对比
+
+引擎以 --rescan 运行时由 modules/scanner/rescan_gate.py 逐个主机对比, 只有端口或服务发生变化的主机
+才会进入横幅识别、web指纹和漏洞检测; 两次运行都已存在结果库中时也可以直接导出差异报告:
+
+    python -m utils.rescan --db ./data/findings.db --base 20250101-120000 --run 20250108-120000
+"""
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.findings_store import FindingsStore, split_port
+from utils.report_exporter import ReportExporter
+
+PortKey = Tuple[int, str]
+
+
+def port_map(records: Iterable[Dict]) -> Dict[PortKey, Optional[str]]:
+    """开放端口 -> 端口扫描报告的服务名, 记录可以是总线上的扫描结果（'80/tcp'）或结果库中的行
+
+    结果库中的 service 可能已被横幅识别改写, 优先使用 scan_service, 否则两次运行总会被判为服务变化
+    """
+    ports = {}
+    for record in records:
+        if record.get('state', 'open') != 'open':
+            continue
+        port, protocol = record.get('port'), record.get('protocol')
+        if protocol is None:
+            port, protocol = split_port(port)
+        if port is None:
+            continue
+        ports[(int(port), protocol)] = record.get('scan_service') or record.get('service')
+    return ports
+
+
+def diff_ports(host: str, old: Dict[PortKey, Optional[str]], new: Dict[PortKey, Optional[str]]) -> List[Dict]:
+    """对比单个主机前后两次的开放端口, 返回 new/closed/changed 三类差异记录"""
+    changes = []
+    for key in sorted(old.keys() | new.keys()):
+        if key not in old:
+            change = 'new'
+        elif key not in new:
+            change = 'closed'
+        elif old[key] != new[key]:
+            change = 'changed'
+        else:
+            continue
+        changes.append({
+            'change': change,
+            'ip': host,
+            'port': key[0],
+            'protocol': key[1],
+            'old_service': old.get(key),
+            'new_service': new.get(key),
+        })
+    return changes
+
+
+def baseline_ports(store: FindingsStore, run_id: str, host: str) -> Dict[PortKey, Optional[str]]:
+    """基线运行中某个主机的开放端口, 按主机查询走索引, 不需要把整个基线载入内存"""
+    return port_map(store.query_ports(host=host, run_id=run_id))
+
+
+def diff_runs(store: FindingsStore, base_run: str, run_id: str) -> Iterable[Dict]:
+    """逐个主机对比两次运行, 只在其中一次出现的主机整体记为 new 或 closed"""
+    hosts = sorted(set(store.hosts_with(run_id=base_run)) | set(store.hosts_with(run_id=run_id)))
+    for host in hosts:
+        yield from diff_ports(host, baseline_ports(store, base_run, host), baseline_ports(store, run_id, host))
+
+
+def write_diff_report(changes: Iterable[Dict],
+                      out_dir: str,
+                      formats: Iterable[str] = ('jsonl', 'csv', 'html')) -> Dict[str, int]:
+    """写出差异报告, 返回各类差异的数量"""
+    counts = {'new': 0, 'closed': 0, 'changed': 0}
+    with ReportExporter(out_dir, formats, kinds=('diff',)) as exporter:
+        for change in changes:
+            exporter.write('diff', change)
+            counts[change['change']] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比结果库中的两次运行, 导出差异报告")
+    parser.add_argument("--db", default="./data/findings.db", help="结果库路径")
+    parser.add_argument("--base", help="基线运行标识, 默认倒数第二次运行")
+    parser.add_argument("--run", help="对比的运行标识, 默认最近一次运行")
+    parser.add_argument("--out", default="./reports", help="输出目录")
+    parser.add_argument("--formats", default="jsonl,csv,html", help="输出格式, 逗号分隔")
+    args = parser.parse_args()
+
+    store = FindingsStore(args.db)
+    runs = [run['run_id'] for run in store.runs()]
+    run_id = args.run or (runs[-1] if runs else None)
+    base_run = args.base or store.latest_run(exclude=run_id)
+    if run_id is None or base_run is None:
+        print("结果库中没有可以对比的两次运行")
+        return
+    out_dir = os.path.join(args.out, f"diff_{base_run}_{run_id}")
+    counts = write_diff_report(diff_runs(store, base_run, run_id), out_dir, args.formats.split(','))
+    store.close()
+    print(f"新增 {counts['new']}, 关闭 {counts['closed']}, 变化 {counts['changed']}, 报告已导出到 {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# utils/targets.py
+"""目标地址的惰性展开
+
+支持单个地址/主机名、CIDR（10.0.0.0/16）和地址范围（10.0.0.1-10.0.0.50 或 10.0.0.1-50）,
+展开结果以生成器逐个返回, /16 这样的大网段也不会生成完整的地址列表
+"""
+import bisect
+import ipaddress
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+def parse_range(spec: str) -> Tuple[IPAddress, IPAddress]:
+    """解析 CIDR 或地址范围, 返回首尾地址; 单个地址返回 (addr, addr), 无法解析（如主机名）时抛出 ValueError"""
+    spec = spec.strip()
+    if '/' in spec:
+        network = ipaddress.ip_network(spec, strict=False)
+        return network.network_address, network.broadcast_address
+    if '-' in spec:
+        start, _, end = spec.partition('-')
+        first = ipaddress.ip_address(start.strip())
+        end = end.strip()
+        if end.isdigit() and first.version == 4:
+            # 10.0.0.1-50: 只替换最后一段
+            last = ipaddress.ip_address(start.strip().rsplit('.', 1)[0] + '.' + end)
+        else:
+            last = ipaddress.ip_address(end)
+        if last < first:
+            raise ValueError(f"地址范围的结束地址小于起始地址: {spec}")
+        return first, last
+    address = ipaddress.ip_address(spec)
+    return address, address
+
+
+def count_addresses(spec: str) -> int:
+    """目标包含的地址数量, 主机名记为 1"""
+    try:
+        first, last = parse_range(spec)
+    except ValueError:
+        return 1
+    return int(last) - int(first) + 1
+
+
+def range_after(spec: str, address: Optional[str]) -> Optional[str]:
+    """spec 展开后排在 address 之后的剩余部分, 以单个地址或 'first-last' 表示, 没有剩余时返回 None
+
+    用于中止时保存展开到一半的目标; address 为 None 表示还没有开始展开, 原样返回 spec
+    """
+    if address is None:
+        return spec
+    try:
+        first, last = parse_range(spec)
+    except ValueError:
+        # 主机名只对应一个目标
+        return None
+    if '/' in spec and first.version == 4 and int(last) - int(first) > 1:
+        # 与 expand_target 一致不包含广播地址
+        last -= 1
+    start = ipaddress.ip_address(address) + 1
+    if start > last:
+        return None
+    return str(start) if start == last else f"{start}-{last}"
+
+
+def _format_ipv4(value: int) -> str:
+    return f"{value >> 24}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+
+def expand_target(spec: str) -> Iterator[str]:
+    """逐个生成目标中的地址; CIDR 跳过网络地址和广播地址（/31、/32 除外）, 主机名原样返回"""
+    spec = spec.strip()
+    if not spec:
+        return
+    try:
+        first, last = parse_range(spec)
+    except ValueError:
+        yield spec
+        return
+    if first.version == 6:
+        addresses = ipaddress.ip_network(spec, strict=False).hosts() if '/' in spec else \
+            (ipaddress.IPv6Address(value) for value in range(int(first), int(last) + 1))
+        for address in addresses:
+            yield str(address)
+        return
+    low, high = int(first), int(last)
+    if '/' in spec and high - low > 1:
+        low, high = low + 1, high - 1
+    # 大网段时逐个构造 IPv4Address 的开销明显, 直接格式化整数
+    for value in range(low, high + 1):
+        yield _format_ipv4(value)
+
+
+class ExclusionIndex:
+    """排除范围的区间索引
+
+    所有排除项（地址、CIDR、地址范围）按 IP 版本合并成有序且互不重叠的区间, 查询一个地址是否被排除为 O(log n);
+    对一个目标范围可以直接求出去掉排除区间后剩余的子范围, 不需要逐个地址检查
+    """
+
+    def __init__(self, specs: Iterable[str] = ()):
+        self._pending: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        self._starts: Dict[int, List[int]] = {4: [], 6: []}
+        self._ends: Dict[int, List[int]] = {4: [], 6: []}
+        self._hostnames = set()
+        for spec in specs:
+            self.add(spec)
+
+    def add(self, spec: str) -> None:
+        spec = spec.strip()
+        if not spec or spec.startswith('#'):
+            return
+        try:
+            first, last = parse_range(spec)
+        except ValueError:
+            self._hostnames.add(spec.lower())
+            return
+        self._pending[first.version].append((int(first), int(last)))
+
+    def _build(self, version: int) -> None:
+        """把新加入的排除项与已有区间一起排序合并, 只在查询前需要时执行"""
+        if not self._pending[version]:
+            return
+        intervals = sorted(list(zip(self._starts[version], self._ends[version])) + self._pending[version])
+        starts, ends = [], []
+        for start, end in intervals:
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self._starts[version], self._ends[version] = starts, ends
+        self._pending[version] = []
+
+    def __len__(self) -> int:
+        for version in (4, 6):
+            self._build(version)
+        return len(self._starts[4]) + len(self._starts[6]) + len(self._hostnames)
+
+    def contains(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return address.lower() in self._hostnames
+        self._build(ip.version)
+        value = int(ip)
+        index = bisect.bisect_right(self._starts[ip.version], value) - 1
+        return index >= 0 and self._ends[ip.version][index] >= value
+
+    def allowed(self, first: IPAddress, last: IPAddress) -> Iterator[Tuple[IPAddress, IPAddress]]:
+        """[first, last] 去掉排除区间后剩余的子范围"""
+        version, cls = first.version, type(first)
+        self._build(version)
+        starts, ends = self._starts[version], self._ends[version]
+        low, high = int(first), int(last)
+        # 从可能与 first 重叠的区间开始, 依次跳过与目标范围重叠的排除区间
+        index = max(bisect.bisect_right(starts, low) - 1, 0)
+        while low <= high and index < len(starts) and starts[index] <= high:
+            if ends[index] >= low:
+                if starts[index] > low:
+                    yield cls(low), cls(starts[index] - 1)
+                low = ends[index] + 1
+            index += 1
+        if low <= high:
+            yield cls(low), cls(high)
+
+
+def iter_target_specs(sources: Iterable[str]) -> Iterator[str]:
+    """逐行读取目标: 以 @ 开头的项视为文件（@- 为标准输入）, 其余为目标本身; 支持 # 注释和逗号/空白分隔"""
+    for source in sources:
+        if source.startswith('@'):
+            path = source[1:]
+            f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+            try:
+                for line in f:
+                    yield from _split_line(line)
+            finally:
+                if f is not sys.stdin:
+                    f.close()
+        else:
+            yield from _split_line(source)
+
+
+def _split_line(line: str) -> Iterator[str]:
+    line = line.split('#', 1)[0]
+    for spec in line.replace(',', ' ').split():
+        yield spec
+
+
+def iter_target_ranges(specs: Iterable[str], exclusions: Optional[ExclusionIndex] = None) -> Iterator[str]:
+    """去掉排除范围后的目标, 每项是单个地址、主机名或 'first-last' 地址范围, 可以直接交给 expand_target 展开
+
+    CIDR 与 expand_target 一致不包含网络地址和广播地址; 目标和排除项都只按区间运算, 与地址数量无关
+    """
+    for spec in specs:
+        try:
+            first, last = parse_range(spec)
+        except ValueError:
+            if exclusions is None or not exclusions.contains(spec):
+                yield spec
+            continue
+        if '/' in spec:
+            network = ipaddress.ip_network(spec, strict=False)
+            if first.version == 4 and network.num_addresses > 2:
+                first, last = first + 1, last - 1
+        ranges = exclusions.allowed(first, last) if exclusions is not None else [(first, last)]
+        for low, high in ranges:
+            yield str(low) if low == high else f"{low}-{high}"
+
+
+def iter_target_addresses(specs: Iterable[str], exclusions: Optional[ExclusionIndex] = None) -> Iterator[str]:
+    """去掉排除范围后逐个生成地址"""
+    for spec in iter_target_ranges(specs, exclusions):
+        yield from expand_target(spec)